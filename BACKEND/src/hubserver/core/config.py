@@ -110,6 +110,26 @@ class ClientSideCacheSettings(BaseSettings):
     CLIENT_CACHE_MAX_AGE: int = 60
 
 
+class ProxyCacheSettings(BaseSettings):
+    PROXY_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # per-worker memory budget for the SWR cache
+    PROXY_CACHE_SHM_DIR: str | None = None  # e.g. /dev/shm/hubserver-proxy — enables the host-wide layer
+    PROXY_CACHE_SHM_MAX_BYTES: int = 1024 * 1024 * 1024
+    PROXY_CACHE_WARM_TOP_N: int = 20  # hottest keys kept fresh in the background; 0 disables warming
+    PROXY_AGENT_TIMEOUT: float = 12.0  # seconds one agent may take before the fan-out answers without it
+    PROXY_HEDGE_DELAY: float = 3.0  # re-send a still-unanswered agent request after this; 0 disables hedging
+    PROXY_BREAKER_FAILURE_RATE: float = 0.5  # failure share of recent requests that opens an agent's breaker
+    PROXY_BREAKER_COOLDOWN: float = 30.0  # seconds an open breaker skips the agent before a probe request
+    PROXY_COOKIE_CHECK_TTL: int = 900  # seconds a verified agent cookie is trusted without a liveness check
+    PROXY_OCR_WORKERS: int = 1  # captcha OCR processes per worker, each keeping the ddddocr model loaded
+    PROXY_AGENT_MAX_ROWS: int = 250_000  # rows paged in per agent and request; newer rows win beyond it
+
+
+class SyncQueueSettings(BaseSettings):
+    SYNC_WORKERS: int = 4  # sync queue workers per process, each pulling one agent-endpoint-day at a time
+    SYNC_TASK_ATTEMPTS: int = 3  # tries per day before it fails and the rest of that agent's endpoint is skipped
+    SYNC_AGENT_TIMEOUT: float = 120.0  # seconds one day's upstream pull may take (per round of pages)
+
+
 class RedisRateLimiterSettings(BaseSettings):
     REDIS_RATE_LIMIT_HOST: str = "localhost"
     REDIS_RATE_LIMIT_PORT: int = 6379
@@ -149,6 +169,8 @@ class Settings(
     TestSettings,
     RedisCacheSettings,
     ClientSideCacheSettings,
+    ProxyCacheSettings,
+    SyncQueueSettings,
     RedisRateLimiterSettings,
     DefaultRateLimitSettings,
     EnvironmentSettings,
@@ -124,6 +124,12 @@ def lifespan_factory(
 
             await cleanup_expired_tokens()
 
+            from ..features.sync.engine.warmer import start_cache_warmer
+            start_cache_warmer()
+
+            from ..features.sync.engine.orchestrator import start_sync_workers
+            start_sync_workers()
+
             initialization_complete.set()
 
             yield
@@ -142,6 +148,15 @@ def lifespan_factory(
 
             try:
                 async with asyncio.timeout(deadline):
+                    from ..features.sync.engine.warmer import stop_cache_warmer
+                    await _close_resource("proxy cache warmer", stop_cache_warmer())
+
+                    from ..features.sync.engine.orchestrator import stop_sync_workers
+                    await _close_resource("sync workers", stop_sync_workers())
+
+                    from ..features.sync.account.captcha import close_ocr_pool
+                    await _close_resource("captcha OCR pool", close_ocr_pool())
+
                     try:
                         from ..features.sync.engine.proxy import close_httpx_client
                         await _close_resource("httpx proxy client", close_httpx_client())
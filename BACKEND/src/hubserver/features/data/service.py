@@ -8,7 +8,7 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Any
 
-from sqlalchemy import Table, func, select
+from sqlalchemy import Integer, Numeric, Table, func, select
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
 from ..sync.bet.model import BetLottery, BetOrder
@@ -68,7 +68,7 @@ _ALLOWED_FILTERS: dict[str, set[str]] = {
     "members": {"username", "status"},
     "invites": {"invite_code", "user_type"},
     "bets": {"username", "serial_no", "lottery_id", "status"},
-    "bet-orders": {"username", "serial_no", "platform_username"},
+    "bet-orders": {"serial_no", "platform_username"},
     "report-lottery": {"username", "lottery_id"},
     "report-funds": {"username"},
     "report-third": {"username", "platform_id"},
@@ -118,7 +118,7 @@ def serialize_row(mapping: Any) -> dict[str, Any]:
 
 def parse_date_range(val: str) -> tuple[str, str] | None:
     """Parse ``'YYYY-MM-DD | YYYY-MM-DD'`` into ``(start, end)`` strings."""
-    for sep in (" | ", " - "):
+    for sep in (" | ", " - ", "|"):
         if sep in val:
             parts = val.split(sep, 1)
             start, end = parts[0].strip(), parts[1].strip()
@@ -127,20 +127,28 @@ def parse_date_range(val: str) -> tuple[str, str] | None:
     return None
 
 
+def filter_fields(endpoint: str) -> set[str]:
+    """Query params *endpoint* can filter on locally (see ``_ALLOWED_FILTERS``)."""
+    return _ALLOWED_FILTERS.get(endpoint, set())
+
+
 def _apply_filters(
     stmt: Any,
     table: Table,
     endpoint: str,
     filters: dict[str, str],
 ) -> Any:
-    """Apply whitelisted equality and ILIKE filters to a SELECT statement."""
+    """Apply whitelisted equality and ILIKE filters to a SELECT statement.
+
+    Raises ``ValueError`` if a whitelisted filter has no column in *table*.
+    """
     allowed = _ALLOWED_FILTERS.get(endpoint, set())
     for key, val in filters.items():
         if not val or key not in allowed:
             continue
         col = table.c.get(key)
         if col is None:
-            continue
+            raise ValueError(f"{endpoint} has no column for filter {key!r}")
         if key in _LIKE_FIELDS:
             escaped = _escape_like(val)
             stmt = stmt.where(col.ilike(f"%{escaped}%", escape="\\"))
@@ -241,3 +249,70 @@ async def query_endpoint(
     rows = [serialize_row(r) for r in result.mappings().all()]
 
     return {"code": 0, "message": "success", "data": {"rows": rows, "count": total}, "errors": []}
+
+
+# ── Bulk queries (proxy local store) ────────────────────────────────
+
+
+def _scope(
+    stmt: Any,
+    table: Table,
+    endpoint: str,
+    agent_ids: list[int],
+    filters: dict[str, str],
+    date_value: str,
+) -> Any:
+    """Restrict *stmt* to *agent_ids*, whitelisted *filters* and the date range."""
+    stmt = stmt.where(table.c.agent_id.in_(agent_ids))
+    stmt = _apply_filters(stmt, table, endpoint, filters)
+    return _apply_date_range(stmt, table, endpoint, date_value)
+
+
+def _table(endpoint: str) -> Table:
+    """The ``Table`` of *endpoint*'s model (``MODELS`` values are typed as plain classes)."""
+    model: Any = MODELS[endpoint]
+    table: Table = model.__table__
+    return table
+
+
+def measure_columns(endpoint: str, group_by: tuple[str, ...]) -> list[str]:
+    """Numeric columns of *endpoint* that ``aggregate_rows`` sums."""
+    return [
+        col.name for col in _table(endpoint).columns
+        if isinstance(col.type, (Integer, Numeric)) and col.name != "agent_id" and col.name not in group_by
+    ]
+
+
+async def query_rows(
+    db: AsyncSession,
+    endpoint: str,
+    agent_ids: list[int],
+    filters: dict[str, str],
+    date_value: str,
+    limit: int,
+) -> list[dict[str, Any]]:
+    """Unpaginated rows of *endpoint* for *agent_ids* in a date range, newest first."""
+    table = _table(endpoint)
+    order_col = table.c.get("id")
+    if order_col is None:
+        order_col = table.c[_DEFAULT_SORT[endpoint]]
+    stmt = _scope(select(table), table, endpoint, agent_ids, filters, date_value)
+    result = await db.execute(stmt.order_by(order_col.desc()).limit(limit))
+    return [serialize_row(r) for r in result.mappings().all()]
+
+
+async def aggregate_rows(
+    db: AsyncSession,
+    endpoint: str,
+    agent_ids: list[int],
+    filters: dict[str, str],
+    date_value: str,
+    group_by: tuple[str, ...],
+) -> list[dict[str, Any]]:
+    """Sum every numeric column of *endpoint* per agent and *group_by* key over a date range."""
+    table = _table(endpoint)
+    keys = [table.c.agent_id, *(table.c[name] for name in group_by)]
+    sums = [func.sum(table.c[name]).label(name) for name in measure_columns(endpoint, group_by)]
+    stmt = _scope(select(*keys, *sums), table, endpoint, agent_ids, filters, date_value)
+    result = await db.execute(stmt.group_by(*keys).order_by(*keys))
+    return [serialize_row(r) for r in result.mappings().all()]
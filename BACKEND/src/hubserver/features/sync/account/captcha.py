@@ -0,0 +1,147 @@
+"""Captcha OCR — ddddocr với model được nạp sẵn.
+
+Loading a ddddocr model is slow and classification is CPU-bound, so async
+callers send images to a dedicated process pool whose workers load the model
+once, when they start, and keep it for their lifetime. Blocking callers use
+one model shared per process (``get_model``).
+
+OCR readings are scored (``score_captcha``) so a login can fetch several
+captchas at once and submit the likeliest first; per-site solve rates are
+kept for ``/proxy/cache-stats``.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ....core.config import settings
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKERS = settings.PROXY_OCR_WORKERS
+CAPTCHA_LENGTH = 4  # upstream captchas are 4 digits
+
+# OCR look-alikes of the digits upstream captchas use
+_CHAR_MAP = {
+    "o": "0", "O": "0", "\u53e3": "0",
+    "l": "1", "I": "1", "i": "1",
+    "z": "2", "Z": "2",
+    "s": "5", "S": "5",
+    "b": "6",
+    "B": "8",
+    "g": "9", "q": "9",
+}
+
+# Confidence of one OCR character: a digit as read, a mapped look-alike,
+# or another ASCII letter / digit kept as is
+_DIGIT_CONFIDENCE = 1.0
+_MAPPED_CONFIDENCE = 0.6
+_OTHER_CONFIDENCE = 0.2
+_LENGTH_PENALTY = 0.3   # factor per character of difference from CAPTCHA_LENGTH
+_NOISE_PENALTY = 0.8    # factor per character OCR read that had to be dropped
+
+_model = None
+_pool: ProcessPoolExecutor | None = None
+_solve_stats: dict[str, dict[str, int]] = {}
+
+
+def get_model():
+    """This process's ddddocr model, loaded on first use."""
+    global _model
+    if _model is None:
+        import ddddocr  # lazy import — nặng, chỉ load khi cần
+
+        _model = ddddocr.DdddOcr(show_ad=False)
+    return _model
+
+
+def _classify(image: bytes) -> str:
+    text: str = get_model().classification(image)
+    return text
+
+
+def _read(raw: str) -> list[tuple[str, float]]:
+    """``(char, confidence)`` per character kept from an OCR reading."""
+    chars = []
+    for c in raw:
+        if c.isdigit() and c.isascii():
+            chars.append((c, _DIGIT_CONFIDENCE))
+        elif c in _CHAR_MAP:
+            chars.append((_CHAR_MAP[c], _MAPPED_CONFIDENCE))
+        elif c.isascii() and c.isalnum():
+            chars.append((c, _OTHER_CONFIDENCE))
+    return chars
+
+
+def clean_captcha(raw: str) -> str:
+    """Map OCR look-alikes to digits and drop anything that isn't ASCII alphanumeric."""
+    return "".join(c for c, _ in _read(raw))
+
+
+def score_captcha(raw: str) -> tuple[str, float]:
+    """``(code, confidence)`` of an OCR reading; confidence is 0..1.
+
+    The mean character confidence, scaled down for a code that is not
+    ``CAPTCHA_LENGTH`` long and for characters that had to be dropped.
+    """
+    chars = _read(raw)
+    if not chars:
+        return "", 0.0
+    code = "".join(c for c, _ in chars)
+    confidence = sum(conf for _, conf in chars) / len(chars)
+    confidence *= _LENGTH_PENALTY ** abs(len(code) - CAPTCHA_LENGTH)
+    confidence *= _NOISE_PENALTY ** (len(raw) - len(chars))
+    return code, round(confidence, 3)
+
+
+def record_solve(site: str, accepted: bool, rank: int) -> None:
+    """Record whether upstream accepted the captcha submitted for *site*.
+
+    *rank* is the candidate's place in confidence order (0 = best).
+    """
+    stats = _solve_stats.setdefault(site, {"submitted": 0, "accepted": 0, "accepted_best": 0})
+    stats["submitted"] += 1
+    if accepted:
+        stats["accepted"] += 1
+        stats["accepted_best"] += int(rank == 0)
+
+
+def get_captcha_stats() -> dict:
+    return {
+        site: {**stats, "solve_rate": round(stats["accepted"] / stats["submitted"], 3)}
+        for site, stats in _solve_stats.items()
+    }
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=OCR_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=get_model,
+        )
+    return _pool
+
+
+async def classify(image: bytes) -> str:
+    """Raw OCR text of *image*, computed in the OCR process pool."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), _classify, image)
+    except BrokenProcessPool:
+        # A worker died (or could not load the model): start a new pool next time
+        logger.warning("Captcha OCR pool broken — restarting on next use")
+        await close_ocr_pool()
+        raise
+
+
+async def close_ocr_pool() -> None:
+    """Stop the OCR workers. Called during application shutdown."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
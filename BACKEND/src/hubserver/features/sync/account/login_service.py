@@ -8,8 +8,14 @@ Login flow (EE88 upstream platform):
 5. POST {base_url}/agent/login  {username, password: encrypted, captcha, scene: "login"}
    → {code: 1}  = success, Set-Cookie = session
 6. Retry tối đa 3 lần nếu captcha sai
+
+AgentLoginService runs this flow blocking (call it via asyncio.to_thread);
+AsyncAgentLoginService runs it on the proxy's pooled httpx.AsyncClient with
+OCR in the captcha process pool (see captcha.py), solving several captchas
+per attempt and submitting them in order of OCR confidence.
 """
 
+import asyncio
 import base64
 import hashlib
 import logging
@@ -21,11 +27,14 @@ from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 
 from ....core.config import settings
+from . import captcha
 
 logger = logging.getLogger(__name__)
 
 HTTP_TIMEOUT = 30
 MAX_CAPTCHA_ATTEMPTS = 3
+CAPTCHA_CANDIDATES = 3        # captchas fetched (each in its own session) per async login attempt
+MIN_CAPTCHA_CONFIDENCE = 0.25  # readings below this are not worth a login round trip
 
 _HEADERS = {
     "User-Agent": (
@@ -76,6 +85,65 @@ def cookie_dict_to_str(cookies: dict) -> str:
     return "; ".join(f"{k}={v}" for k, v in cookies.items())
 
 
+# ── Shared login helpers ─────────────────────────────────────────────────────
+
+
+def _rsa_encrypt(plain_text: str, public_key_pem: str) -> str:
+    """RSA PKCS1v15 encrypt — tương thích JSEncrypt của upstream."""
+    key_data = (
+        public_key_pem
+        .replace("-----BEGIN PUBLIC KEY-----", "")
+        .replace("-----END PUBLIC KEY-----", "")
+        .replace("\n", "")
+        .replace("\r", "")
+        .strip()
+    )
+    lines = [key_data[i : i + 64] for i in range(0, len(key_data), 64)]
+    pem = (
+        "-----BEGIN PUBLIC KEY-----\n"
+        + "\n".join(lines)
+        + "\n-----END PUBLIC KEY-----\n"
+    ).encode()
+    public_key = serialization.load_pem_public_key(pem)
+    encrypted = public_key.encrypt(plain_text.encode("utf-8"), padding.PKCS1v15())
+    return base64.b64encode(encrypted).decode("utf-8")
+
+
+def _parse_login_response(resp: httpx.Response, attempt: int) -> dict:
+    try:
+        data = resp.json()
+        code = data.get("code", -1)
+        msg = data.get("msg", "")
+        if code == 1:
+            return {"success": True, "message": msg or "OK", "retry": False}
+        msg_lower = str(msg).lower()
+        if any(kw in msg_lower for kw in ("captcha", "xac nhan", "ma xac", "verify", "验证码")):
+            return {"success": False, "message": f"Captcha sai: {msg}", "retry": True}
+        if any(kw in msg_lower for kw in ("password", "mat khau", "密码", "pwd")):
+            return {"success": False, "message": f"Sai mật khẩu: {msg}", "retry": False}
+        if any(kw in msg_lower for kw in ("account", "tai khoan", "用户", "khong ton tai")):
+            return {"success": False, "message": f"Lỗi tài khoản: {msg}", "retry": False}
+        return {"success": False, "message": msg or f"Lỗi (code={code})", "retry": attempt < MAX_CAPTCHA_ATTEMPTS}
+    except (ValueError, KeyError):
+        return {"success": False, "message": f"HTTP {resp.status_code}", "retry": False}
+
+
+def _captcha_result(raw: str) -> tuple[bool, str, str]:
+    cleaned = captcha.clean_captcha(raw)
+    if not cleaned:
+        return False, "", "OCR trả về rỗng"
+    logger.info("Captcha solved: %s -> %s", raw, cleaned)
+    return True, cleaned, ""
+
+
+def _absolute_url(base_url: str, url: str) -> str:
+    return f"{base_url}{url}" if url.startswith("/") else url
+
+
+def _is_login_redirect(resp: httpx.Response) -> bool:
+    return resp.status_code == 302 and "login" in resp.headers.get("Location", "").lower()
+
+
 # ── Login Service ────────────────────────────────────────────────────────────
 
 
@@ -83,7 +151,7 @@ class AgentLoginService:
     """Tự động đăng nhập upstream agent platform.
 
     Dùng blocking httpx.Client + ddddocr OCR (CPU-bound).
-    Gọi từ async code qua asyncio.to_thread().
+    Gọi từ async code qua asyncio.to_thread() — hoặc dùng AsyncAgentLoginService.
     """
 
     def __init__(self, base_url: str) -> None:
@@ -92,7 +160,6 @@ class AgentLoginService:
         self._client: Optional[httpx.Client] = None
         self._public_key: Optional[str] = None
         self._captcha_url: Optional[str] = None
-        self._ocr = None
 
     def _get_client(self) -> httpx.Client:
         if self._client is None:
@@ -103,39 +170,10 @@ class AgentLoginService:
             )
         return self._client
 
-    def _get_ocr(self):
-        if self._ocr is None:
-            import ddddocr  # lazy import — nặng, chỉ load khi cần
-
-            self._ocr = ddddocr.DdddOcr(show_ad=False)
-        return self._ocr
-
-    @staticmethod
-    def _rsa_encrypt(plain_text: str, public_key_pem: str) -> str:
-        """RSA PKCS1v15 encrypt — tương thích JSEncrypt của upstream."""
-        key_data = (
-            public_key_pem
-            .replace("-----BEGIN PUBLIC KEY-----", "")
-            .replace("-----END PUBLIC KEY-----", "")
-            .replace("\n", "")
-            .replace("\r", "")
-            .strip()
-        )
-        lines = [key_data[i : i + 64] for i in range(0, len(key_data), 64)]
-        pem = (
-            "-----BEGIN PUBLIC KEY-----\n"
-            + "\n".join(lines)
-            + "\n-----END PUBLIC KEY-----\n"
-        ).encode()
-        public_key = serialization.load_pem_public_key(pem)
-        encrypted = public_key.encrypt(plain_text.encode("utf-8"), padding.PKCS1v15())
-        return base64.b64encode(encrypted).decode("utf-8")
-
     def close(self) -> None:
         if self._client:
             self._client.close()
             self._client = None
-        self._ocr = None
 
     # ─── Init ────────────────────────────────────────────────────────────────
 
@@ -167,9 +205,8 @@ class AgentLoginService:
             if not ok:
                 return False, b"", msg
         client = self._get_client()
-        url = self._captcha_url if not (self._captcha_url or "").startswith("/") else f"{self._base_url}{self._captcha_url}"
         try:
-            resp = client.get(url)
+            resp = client.get(_absolute_url(self._base_url, self._captcha_url or ""))
             if resp.status_code != 200:
                 return False, b"", f"HTTP {resp.status_code}"
             if "image" not in resp.headers.get("Content-Type", ""):
@@ -179,31 +216,9 @@ class AgentLoginService:
             return False, b"", f"Lỗi tải captcha: {e}"
 
     def solve_captcha(self, image_bytes: bytes) -> tuple[bool, str, str]:
-        """Giải captcha bằng ddddocr OCR."""
+        """Giải captcha bằng ddddocr OCR (model dùng chung trong process)."""
         try:
-            ocr = self._get_ocr()
-            result = ocr.classification(image_bytes)
-            _map = {
-                "o": "0", "O": "0", "\u53e3": "0",
-                "l": "1", "I": "1", "i": "1",
-                "z": "2", "Z": "2",
-                "s": "5", "S": "5",
-                "b": "6",
-                "B": "8",
-                "g": "9", "q": "9",
-            }
-            cleaned = ""
-            for c in result:
-                if c.isdigit() and c.isascii():
-                    cleaned += c
-                elif c in _map:
-                    cleaned += _map[c]
-                elif c.isascii() and c.isalnum():
-                    cleaned += c
-            if not cleaned:
-                return False, "", "OCR trả về rỗng"
-            logger.info("Captcha solved: %s -> %s", result, cleaned)
-            return True, cleaned, ""
+            return _captcha_result(captcha.get_model().classification(image_bytes))
         except ImportError:
             return False, "", "ddddocr chưa cài. Chạy: pip install ddddocr"
         except Exception as e:
@@ -239,7 +254,7 @@ class AgentLoginService:
                 continue
 
             try:
-                encrypted_password = self._rsa_encrypt(password, self._public_key)
+                encrypted_password = _rsa_encrypt(password, self._public_key or "")
             except Exception as e:
                 logger.error("RSA encryption failed: %s", e)
                 return False, f"Lỗi mã hóa mật khẩu: {e}", {}
@@ -254,7 +269,7 @@ class AgentLoginService:
                         "scene": "login",
                     },
                 )
-                result = self._parse_login_response(resp, attempt)
+                result = _parse_login_response(resp, attempt)
                 if result["success"]:
                     cookies = dict(client.cookies)
                     logger.info("Login OK, got %d cookies", len(cookies))
@@ -270,24 +285,6 @@ class AgentLoginService:
 
         return False, f"Captcha sai sau {MAX_CAPTCHA_ATTEMPTS} lần thử", {}
 
-    def _parse_login_response(self, resp: httpx.Response, attempt: int) -> dict:
-        try:
-            data = resp.json()
-            code = data.get("code", -1)
-            msg = data.get("msg", "")
-            if code == 1:
-                return {"success": True, "message": msg or "OK", "retry": False}
-            msg_lower = str(msg).lower()
-            if any(kw in msg_lower for kw in ("captcha", "xac nhan", "ma xac", "verify", "验证码")):
-                return {"success": False, "message": f"Captcha sai: {msg}", "retry": True}
-            if any(kw in msg_lower for kw in ("password", "mat khau", "密码", "pwd")):
-                return {"success": False, "message": f"Sai mật khẩu: {msg}", "retry": False}
-            if any(kw in msg_lower for kw in ("account", "tai khoan", "用户", "khong ton tai")):
-                return {"success": False, "message": f"Lỗi tài khoản: {msg}", "retry": False}
-            return {"success": False, "message": msg or f"Lỗi (code={code})", "retry": attempt < MAX_CAPTCHA_ATTEMPTS}
-        except (ValueError, KeyError):
-            return {"success": False, "message": f"HTTP {resp.status_code}", "retry": False}
-
     # ─── Cookie validation ───────────────────────────────────────────────────
 
     def check_cookies_live(self, cookies_dict: dict) -> tuple[bool, str]:
@@ -295,9 +292,8 @@ class AgentLoginService:
         client = self._get_client()
         try:
             resp = client.get(f"{self._base_url}/", cookies=cookies_dict)
-            if resp.status_code == 302:
-                if "login" in resp.headers.get("Location", "").lower():
-                    return False, "Cookie đã hết hạn"
+            if _is_login_redirect(resp):
+                return False, "Cookie đã hết hạn"
             if resp.status_code == 200:
                 return True, "Cookie còn hiệu lực"
             return False, f"HTTP {resp.status_code}"
@@ -329,3 +325,167 @@ class AgentLoginService:
         self._public_key = None
         self._captcha_url = None
         return self.login(username, password)
+
+
+# ── Async Login Service ──────────────────────────────────────────────────────
+
+
+class AsyncAgentLoginService:
+    """Đăng nhập upstream không cần thread — cùng flow với AgentLoginService.
+
+    Requests go through the caller's pooled ``httpx.AsyncClient`` (the proxy
+    client). Its cookie jar is shared by every agent, so this login's session
+    cookies are kept in ``self._cookies`` and sent explicitly. Captcha OCR
+    runs in the captcha process pool, whose workers keep the model loaded.
+    """
+
+    def __init__(self, base_url: str, client: httpx.AsyncClient) -> None:
+        self._base_url = base_url.rstrip("/")
+        self._login_url = f"{self._base_url}/agent/login"
+        self._client = client
+        self._cookies: dict[str, str] = {}
+        self._public_key: str | None = None
+        self._captcha_url: str | None = None
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        headers = {**_HEADERS, "Cookie": cookie_dict_to_str(self._cookies)}
+        resp = await self._client.request(method, url, headers=headers, **kwargs)
+        self._cookies.update(resp.cookies.items())
+        return resp
+
+    async def init_login(self) -> tuple[bool, str]:
+        """Gọi scene=init để lấy public_key + captcha_url."""
+        try:
+            resp = await self._request("POST", self._login_url, json={"scene": "init"})
+            if resp.status_code != 200:
+                return False, f"HTTP {resp.status_code}"
+            data = resp.json().get("data", {})
+            self._public_key = data.get("public_key", "")
+            self._captcha_url = data.get("captcha_url", "")
+            if not self._public_key:
+                return False, "Không lấy được public key"
+            if not self._captcha_url:
+                return False, "Không lấy được captcha URL"
+            return True, "Init thành công"
+        except (httpx.HTTPError, ValueError) as e:
+            return False, f"Lỗi kết nối: {e}"
+
+    async def get_captcha_image(self) -> tuple[bool, bytes, str]:
+        """Tải ảnh captcha."""
+        if not self._captcha_url:
+            ok, msg = await self.init_login()
+            if not ok:
+                return False, b"", msg
+        try:
+            resp = await self._request("GET", _absolute_url(self._base_url, self._captcha_url or ""))
+            if resp.status_code != 200:
+                return False, b"", f"HTTP {resp.status_code}"
+            if "image" not in resp.headers.get("Content-Type", ""):
+                return False, b"", "Response không phải ảnh"
+            return True, resp.content, ""
+        except (httpx.HTTPError, ValueError) as e:
+            return False, b"", f"Lỗi tải captcha: {e}"
+
+    async def solve_captcha(self, image_bytes: bytes) -> tuple[str, float]:
+        """``(code, confidence)`` của captcha, giải trong OCR process pool."""
+        try:
+            code, confidence = captcha.score_captcha(await captcha.classify(image_bytes))
+        except Exception as e:
+            logger.error("Captcha solve error: %s", e)
+            return "", 0.0
+        logger.info("Captcha solved: %s (confidence %.2f)", code, confidence)
+        return code, confidence
+
+    async def _candidate(self) -> tuple[str, float] | None:
+        """Start a fresh session and solve its captcha. None if that failed."""
+        ok, msg = await self.init_login()
+        if ok:
+            ok, image, msg = await self.get_captcha_image()
+        if not ok:
+            logger.warning("Captcha candidate failed: %s", msg)
+            return None
+        code, confidence = await self.solve_captcha(image)
+        return (code, confidence) if confidence >= MIN_CAPTCHA_CONFIDENCE else None
+
+    async def _submit(self, username: str, password: str, code: str, attempt: int) -> dict:
+        resp = await self._request(
+            "POST",
+            self._login_url,
+            json={
+                "username": username,
+                "password": _rsa_encrypt(password, self._public_key or ""),
+                "captcha": code,
+                "scene": "login",
+            },
+        )
+        return _parse_login_response(resp, attempt)
+
+    async def _ranked_candidates(self) -> list[tuple["AsyncAgentLoginService", str]]:
+        """Solve ``CAPTCHA_CANDIDATES`` captchas concurrently, most confident first.
+
+        Upstream keeps one captcha per session, so each candidate gets its own
+        session (and cookie jar) on the shared client.
+        """
+        sessions = [AsyncAgentLoginService(self._base_url, self._client) for _ in range(CAPTCHA_CANDIDATES)]
+        solved = await asyncio.gather(*(svc._candidate() for svc in sessions))
+        ranked = sorted(
+            ((svc, *result) for svc, result in zip(sessions, solved, strict=True) if result is not None),
+            key=lambda candidate: candidate[2],
+            reverse=True,
+        )
+        return [(svc, code) for svc, code, _ in ranked]
+
+    async def login(self, username: str, password: str) -> tuple[bool, str, dict]:
+        """Đăng nhập tự động: captcha candidates → RSA encrypt → POST login.
+
+        Each attempt solves a batch of captchas and submits them best first —
+        a wrong captcha falls back to the next candidate, whose session is
+        still unused, instead of restarting init → captcha.
+
+        Returns:
+            (success, message, cookies_dict)
+        """
+        for attempt in range(1, MAX_CAPTCHA_ATTEMPTS + 1):
+            logger.info("Login attempt %d/%d", attempt, MAX_CAPTCHA_ATTEMPTS)
+            candidates = await self._ranked_candidates()
+            if not candidates:
+                logger.warning("No readable captcha (attempt %d)", attempt)
+                continue
+
+            for rank, (svc, code) in enumerate(candidates):
+                try:
+                    result = await svc._submit(username, password, code, attempt)
+                except httpx.HTTPError as e:
+                    logger.error("Login request error: %s", e)
+                    return False, f"Lỗi kết nối: {e}", {}
+                except ValueError as e:
+                    logger.error("RSA encryption failed: %s", e)
+                    return False, f"Lỗi mã hóa mật khẩu: {e}", {}
+                if result["success"] or result["retry"]:
+                    captcha.record_solve(self._base_url, result["success"], rank)
+                if result["success"]:
+                    self._cookies = svc._cookies
+                    logger.info("Login OK, got %d cookies", len(self._cookies))
+                    return True, "Đăng nhập thành công", dict(self._cookies)
+                if not result["retry"]:
+                    return False, result["message"], {}
+                logger.warning("Attempt %d, candidate %d: %s", attempt, rank + 1, result["message"])
+
+        return False, f"Captcha sai sau {MAX_CAPTCHA_ATTEMPTS} lần thử", {}
+
+    async def check_cookies_live(self, cookies_dict: dict) -> tuple[bool, str]:
+        """Kiểm tra cookie còn hiệu lực không (302 → login = hết hạn)."""
+        headers = {**_HEADERS, "Cookie": cookie_dict_to_str(cookies_dict)}
+        try:
+            resp = await self._client.get(f"{self._base_url}/", headers=headers)
+            if _is_login_redirect(resp):
+                return False, "Cookie đã hết hạn"
+            if resp.status_code == 200:
+                return True, "Cookie còn hiệu lực"
+            return False, f"HTTP {resp.status_code}"
+        except httpx.TimeoutException:
+            return False, "Timeout"
+        except httpx.ConnectError:
+            return False, "Không thể kết nối"
+        except httpx.HTTPError as e:
+            return False, f"Lỗi: {e}"
@@ -1,6 +1,5 @@
 """Agent CRUD router — quản lý tài khoản upstream agent."""
 
-import asyncio
 from datetime import datetime
 from typing import Any
 
@@ -12,8 +11,9 @@ from ....core.config import APP_TZ
 from ....core.db.database import async_get_db
 from ....core.deps import get_current_superuser
 from ....core.exceptions.http_exceptions import NotFoundException
+from ..engine.proxy import get_client
 from .login_service import (
-    AgentLoginService,
+    AsyncAgentLoginService,
     cookie_dict_to_str,
     decrypt_password,
     encrypt_password,
@@ -106,12 +106,8 @@ async def login_agent(agent_id: int, db: AsyncSession = Depends(async_get_db)) -
         return {"code": 1, "message": "Agent chưa có mật khẩu. Cập nhật password trước.", "data": None, "errors": []}
 
     plain_pw = decrypt_password(agent.password_enc)
-    svc = AgentLoginService(agent.base_url)
-
-    try:
-        ok, msg, cookies_dict = await asyncio.to_thread(svc.login, agent.username, plain_pw)
-    finally:
-        svc.close()
+    svc = AsyncAgentLoginService(agent.base_url, await get_client())
+    ok, msg, cookies_dict = await svc.login(agent.username, plain_pw)
 
     if not ok:
         return {"code": 1, "message": msg, "data": None, "errors": []}
@@ -95,3 +95,7 @@ class BetLottery(Base):
     prize_time: Mapped[datetime | None] = mapped_column(DateTime, default=None)
     ip: Mapped[str | None] = mapped_column(String(45), default=None)
     is_tester: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Upstream display labels, kept so local answers match upstream rows
+    play_type_name: Mapped[str | None] = mapped_column(String(100), default=None)
+    play_name: Mapped[str | None] = mapped_column(String(100), default=None)
+    status_text: Mapped[str | None] = mapped_column(String(50), default=None)
@@ -0,0 +1,129 @@
+"""Per-agent circuit breaker and health scores for the upstream fan-out.
+
+Every agent request is recorded as a success or failure (errors, timeouts,
+non-JSON bodies) together with its latency. Once at least
+``BREAKER_MIN_CALLS`` of the last ``BREAKER_WINDOW`` requests were made and
+``BREAKER_FAILURE_RATE`` of them failed, the agent's breaker opens: the
+fan-out skips the agent (it is reported in ``_agents_failed``) instead of
+tying up pooled connections until its timeout on every request.
+
+After ``BREAKER_COOLDOWN`` seconds the breaker is half-open and lets a single
+probe request through; success closes it, failure opens it for another
+cooldown. State is per worker — each worker learns of a dead agent from its
+own requests.
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from ....core.config import settings
+
+BREAKER_WINDOW = 20         # most recent requests per agent considered
+BREAKER_MIN_CALLS = 5       # requests in the window before the breaker may open
+BREAKER_FAILURE_RATE = settings.PROXY_BREAKER_FAILURE_RATE
+BREAKER_COOLDOWN = settings.PROXY_BREAKER_COOLDOWN
+PROBE_TIMEOUT = settings.PROXY_AGENT_TIMEOUT  # a probe not recorded by then is assumed lost
+LATENCY_SMOOTHING = 0.2     # weight of the newest sample in the latency EWMA
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+@dataclass(slots=True)
+class AgentHealth:
+    outcomes: deque = field(default_factory=lambda: deque(maxlen=BREAKER_WINDOW))
+    latency: float | None = None   # EWMA of request latency, seconds
+    opened_at: float | None = None
+    probe_at: float | None = None
+    opens: int = 0
+
+    def failure_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def state(self, now: float) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        return OPEN if now - self.opened_at < BREAKER_COOLDOWN else HALF_OPEN
+
+
+_health: dict[int, AgentHealth] = {}
+
+
+def _get(agent_id: int) -> AgentHealth:
+    health = _health.get(agent_id)
+    if health is None:
+        health = _health[agent_id] = AgentHealth()
+    return health
+
+
+def allow(agent_id: int) -> bool:
+    """Whether a request to *agent_id* should be sent now.
+
+    While half-open only one probe is let through at a time.
+    """
+    health = _health.get(agent_id)
+    if health is None:
+        return True
+    now = time.monotonic()
+    state = health.state(now)
+    if state == CLOSED:
+        return True
+    if state == OPEN or (health.probe_at is not None and now - health.probe_at < PROBE_TIMEOUT):
+        return False
+    health.probe_at = now
+    return True
+
+
+def record(agent_id: int, ok: bool, latency: float) -> None:
+    """Record the outcome of one request to *agent_id*."""
+    health = _get(agent_id)
+    health.outcomes.append(ok)
+    if ok:
+        smoothed = health.latency
+        health.latency = latency if smoothed is None else smoothed + LATENCY_SMOOTHING * (latency - smoothed)
+    now = time.monotonic()
+
+    if health.opened_at is not None:
+        # Requests sent before the breaker opened don't decide; the probe does
+        if health.probe_at is None:
+            return
+        health.probe_at = None
+        if ok:
+            health.opened_at = None
+            health.outcomes.clear()
+        else:
+            health.opened_at = now
+        return
+    if len(health.outcomes) >= BREAKER_MIN_CALLS and health.failure_rate() >= BREAKER_FAILURE_RATE:
+        health.opened_at = now
+        health.opens += 1
+
+
+def health_score(agent_id: int) -> float:
+    """1.0 for a healthy agent, down to 0.0 for one whose breaker is open.
+
+    The success rate of recent requests, scaled down as the smoothed latency
+    approaches the per-agent timeout.
+    """
+    health = _health.get(agent_id)
+    if health is None:
+        return 1.0
+    if health.state(time.monotonic()) != CLOSED:
+        return 0.0
+    slowness = min((health.latency or 0.0) / PROBE_TIMEOUT, 1.0)
+    return round((1.0 - health.failure_rate()) * (1.0 - slowness / 2), 3)
+
+
+def get_breaker_stats() -> dict:
+    now = time.monotonic()
+    return {
+        str(agent_id): {
+            "state": health.state(now),
+            "health": health_score(agent_id),
+            "failure_rate": round(health.failure_rate(), 3),
+            "requests": len(health.outcomes),
+            "latency_ms": round(health.latency * 1000) if health.latency is not None else None,
+            "opens": health.opens,
+        }
+        for agent_id, health in _health.items()
+    }
@@ -0,0 +1,248 @@
+"""Answer proxy queries from the locally synced tables.
+
+The sync queue copies upstream history into PostgreSQL one day at a time and
+records, per agent and sync endpoint, the contiguous span of days it synced
+completely in ``sync_metadata.sync_params`` (``synced_from`` ..
+``synced_through``, see ``extend_coverage``). Those days were already over
+when they were synced and can no longer change upstream, so they are read
+with one indexed query instead of a fan-out.
+
+``plan_query`` splits a requested date range into the days every requested
+agent has synced (read locally) and the days before / after them (fetched
+upstream); ``combine_results`` merges the parts back into one result.
+
+Rows are shaped like upstream rows: tagged with ``_agent_*`` fields, newest
+first by id, and — for reports upstream aggregates over the requested range
+— summed per user across all parts.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from ....core.config import APP_TZ
+from ...data.service import aggregate_rows, filter_fields, measure_columns, parse_date_range, query_rows
+from ..account.model import Agent
+from ..model import SyncMetadata
+from .proxy import AGENT_MAX_ROWS, UPSTREAM_DATE_PARAMS, get_active_agents, merge_agent_rows, tag_rows
+
+logger = structlog.get_logger(__name__)
+
+# Proxy endpoint → sync_metadata.endpoint. ``withdrawals`` is not here: its
+# upstream page (withdrawalsRecord) is not the one synced into deposit_withdrawal.
+SYNC_ENDPOINTS: dict[str, str] = {
+    "bets": "bet_lottery",
+    "bet-orders": "bet_order",
+    "report-lottery": "report_lottery",
+    "report-funds": "report_funds",
+    "report-third": "report_third_game",
+    "deposits": "deposit_withdrawal",
+}
+
+# Reports upstream sums over the requested range: columns identifying a row,
+# and label columns grouped along with them
+AGGREGATED_REPORTS: dict[str, tuple[str, ...]] = {
+    "report-lottery": ("uid", "lottery_id"),
+    "report-third": ("uid", "platform_id"),
+}
+_REPORT_LABELS: dict[str, tuple[str, ...]] = {
+    "report-lottery": ("username", "lottery_name", "user_parent_format"),
+    "report-third": ("username", "platform_id_name"),
+}
+
+# Form filters the local tables answer the way upstream does: each names a
+# column holding the values upstream filters on (text fields match substrings
+# case-insensitively, as in ``data.service``). Status / type selects are not
+# here — the form sends codes while the tables hold labels (deposits) or
+# different codes (bets) — so such requests go upstream.
+LOCAL_FILTERS: dict[str, set[str]] = {
+    "bets": {"username", "serial_no", "lottery_id"},
+    "bet-orders": {"serial_no", "platform_username"},
+    "report-lottery": {"username", "lottery_id"},
+    "report-funds": {"username"},
+    "report-third": {"username", "platform_id"},
+    "deposits": {"username"},
+}
+
+# Local columns absent from (or named differently in) upstream rows
+_DROP_COLUMNS = ("synced_at",)
+_RENAMED_COLUMNS: dict[str, dict[str, str]] = {"report-funds": {"report_date": "date"}}
+
+
+def synced_span(meta: SyncMetadata) -> tuple[str, str] | None:
+    """``(first, last)`` ISO days fully synced for *meta*, or None."""
+    params = meta.sync_params or {}
+    first, last = params.get("synced_from"), params.get("synced_through")
+    if not first or not last:
+        return None
+    return first, last
+
+
+def extend_coverage(params: dict, day: date, started_at: datetime) -> dict[str, str]:
+    """Coverage keys to merge into *params* once *day* was synced by a task started at *started_at*.
+
+    Only a day that was already over when the task started counts — one
+    synced mid-day holds a partial copy. The span stays contiguous: a day
+    next to it extends it, a day apart from it starts a new span.
+    """
+    if day >= started_at.astimezone(APP_TZ).date():
+        return {}
+    synced = day.isoformat()
+    first, last = params.get("synced_from"), params.get("synced_through")
+    if first and last:
+        if first <= synced <= last:
+            return {}
+        if synced == _shift(last, 1):
+            return {"synced_through": synced}
+        if synced == _shift(first, -1):
+            return {"synced_from": synced}
+    return {"synced_from": synced, "synced_through": synced}
+
+
+async def _common_span(db: AsyncSession, sync_endpoint: str, agent_ids: list[int]) -> tuple[str, str] | None:
+    """Days synced for *every* agent in *agent_ids*, or None."""
+    stmt = select(SyncMetadata).where(
+        SyncMetadata.endpoint == sync_endpoint,
+        SyncMetadata.agent_id.in_(agent_ids),
+    )
+    metas = (await db.execute(stmt)).scalars().all()
+    spans = {meta.agent_id: synced_span(meta) for meta in metas}
+    covered = [span for ag_id in agent_ids if (span := spans.get(ag_id)) is not None]
+    if len(covered) < len(agent_ids):
+        return None
+    first = max(span[0] for span in covered)
+    last = min(span[1] for span in covered)
+    return (first, last) if first <= last else None
+
+
+def _shift(day: str, days: int) -> str:
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+def _shape_row(endpoint: str, row: dict) -> dict:
+    for column in _DROP_COLUMNS:
+        row.pop(column, None)
+    for local, upstream in _RENAMED_COLUMNS.get(endpoint, {}).items():
+        if local in row:
+            value = row.pop(local)
+            row[upstream] = value.isoformat() if isinstance(value, date) else value
+    return row
+
+
+def _local_query(endpoint: str, form_params: dict) -> tuple[tuple[str, str], dict[str, str]] | None:
+    """``((start, end), filters)`` if the request can be answered locally at all.
+
+    Requests without a date range, or with a filter not in ``LOCAL_FILTERS``,
+    must go upstream.
+    """
+    date_param = UPSTREAM_DATE_PARAMS.get(endpoint)
+    if endpoint not in SYNC_ENDPOINTS or not date_param:
+        return None
+    date_value = form_params.get(date_param)
+    date_range = parse_date_range(date_value) if date_value else None
+    if date_range is None:
+        return None
+    filters = {k: v for k, v in form_params.items() if k != date_param and v}
+    if not set(filters) <= LOCAL_FILTERS.get(endpoint, set()) & filter_fields(endpoint):
+        return None
+    return date_range, filters
+
+
+@dataclass(slots=True)
+class QueryPlan:
+    local: dict                                        # result for the synced days
+    upstream: list[dict] = field(default_factory=list)  # form params per unsynced sub-range
+
+
+async def plan_query(db: AsyncSession, endpoint: str, form_params: dict, agent_id: int | None) -> QueryPlan | None:
+    """Read the synced part of a request locally; list the rest for upstream.
+
+    Returns None when no requested day is synced for every agent — the
+    caller then sends the request upstream unchanged.
+    """
+    query = _local_query(endpoint, form_params)
+    if query is None:
+        return None
+    (start, end), filters = query
+
+    agents = await get_active_agents(db, agent_id)
+    if not agents:
+        return None
+    agent_ids = [ag.id for ag in agents]
+    span = await _common_span(db, SYNC_ENDPOINTS[endpoint], agent_ids)
+    if span is None or span[0] > end or span[1] < start:
+        return None
+    lo, hi = max(start, span[0]), min(end, span[1])
+
+    local_range = f"{lo} | {hi}"
+    if endpoint in AGGREGATED_REPORTS:
+        group_by = AGGREGATED_REPORTS[endpoint] + _REPORT_LABELS[endpoint]
+        rows = await aggregate_rows(db, endpoint, agent_ids, filters, local_range, group_by)
+    else:
+        rows = await query_rows(db, endpoint, agent_ids, filters, local_range, AGENT_MAX_ROWS * len(agents))
+
+    date_param = UPSTREAM_DATE_PARAMS[endpoint]
+    upstream = [
+        {**form_params, date_param: f"{first} | {last}"}
+        for first, last in ((start, _shift(lo, -1)), (_shift(hi, 1), end))
+        if first <= last
+    ]
+    logger.info(
+        "Proxy %s %s..%s: %s..%s from local tables (%d rows), %d upstream range(s)",
+        endpoint, start, end, lo, hi, len(rows), len(upstream),
+    )
+    return QueryPlan(local=_merge_local(endpoint, agents, rows), upstream=upstream)
+
+
+def _to_number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _sum_groups(endpoint: str, parts: Iterable[dict]) -> list[dict]:
+    """Add up per-user report rows of several date ranges, ordered by agent and key."""
+    keys = AGGREGATED_REPORTS[endpoint]
+    measures = measure_columns(endpoint, keys)
+    merged: dict[tuple, dict] = {}
+    for part in parts:
+        for row in part.get("data") or []:
+            key = (row.get("_agent_id") or 0, *(_to_number(row.get(name)) for name in keys))
+            total = merged.get(key)
+            if total is None:
+                merged[key] = dict(row)
+                continue
+            for name in measures:
+                total[name] = _to_number(total.get(name)) + _to_number(row.get(name))
+    return [merged[key] for key in sorted(merged)]
+
+
+def combine_results(endpoint: str, parts: list[dict]) -> dict:
+    """Merge the local and upstream parts of a planned query into one result."""
+    failed = next((part for part in parts if part.get("code") != 0), None)
+    if failed is not None:
+        return failed
+    if endpoint in AGGREGATED_REPORTS:
+        rows = _sum_groups(endpoint, parts)
+        result = {"code": 0, "data": rows, "count": len(rows)}
+    else:
+        result = merge_agent_rows(part.get("data") or [] for part in parts)
+    result["_source"] = "local" if len(parts) == 1 else "hybrid"
+    failed_agents = {ag["id"]: ag for part in parts for ag in part.get("_agents_failed", ())}
+    if failed_agents:
+        result["_partial"] = True
+        result["_agents_failed"] = list(failed_agents.values())
+    return result
+
+
+def _merge_local(endpoint: str, agents: list[Agent], rows: list[dict]) -> dict:
+    by_agent: dict[int, list[dict]] = {ag.id: [] for ag in agents}
+    for row in rows:
+        by_agent[row["agent_id"]].append(_shape_row(endpoint, row))
+    return merge_agent_rows(tag_rows(ag, {"code": 0, "data": by_agent[ag.id]}) or [] for ag in agents)
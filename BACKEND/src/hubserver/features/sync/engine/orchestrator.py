@@ -0,0 +1,502 @@
+"""Server-side sync — a durable queue that pulls upstream into the local tables.
+
+A sync job is planned into ``sync_tasks`` rows, one per agent, endpoint and
+day (endpoints without a date range get one undated task per agent), from
+the last synced day (or ``lookback_days`` back on a full sync) up to today.
+``SYNC_WORKERS`` asyncio workers per process claim tasks with
+``FOR UPDATE SKIP LOCKED``, so any number of processes share one queue.
+A task's rows come from the upstream fan-out on the pooled client
+(``fetch_agents`` with paging and session renewal, under ``SYNC_FETCH``: a
+longer deadline, no hedging, no circuit breaker and no row cap), are
+upserted with ``bulk_upsert``, and ``sync_metadata`` is widened to the days
+they cover; its ``sync_params["checkpoint"]`` records the last day done,
+which incremental syncs continue from, and days that were over when synced
+extend the span the proxy serves locally (``local_store.extend_coverage``).
+
+One agent's endpoint runs its days oldest first, one at a time: a task is
+claimable only when no earlier day of it is still unfinished, and a day
+that fails ``SYNC_TASK_ATTEMPTS`` times skips the days after it, so the
+span recorded in ``sync_metadata`` never skips a day. Different agents and
+endpoints run in parallel.
+
+Everything lives in the database, so a job survives restarts: workers
+hand their task back on shutdown and renew the lease of the task they run
+every ``TASK_HEARTBEAT``, so a task whose worker died is claimed again once
+its short ``TASK_LEASE`` runs out instead of holding up its later days.
+"""
+
+import asyncio
+import contextlib
+import secrets
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+import structlog
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ....core.config import APP_TZ, settings
+from ....core.db.database import local_session
+from ....core.utils.upsert import bulk_upsert
+from ..account.model import Agent
+from ..bet.model import BetLottery, BetOrder
+from ..config.model import BankList, InviteList
+from ..crud import crud_sync_metadata
+from ..finance.model import DepositWithdrawal
+from ..member.model import Member
+from ..model import SyncJob, SyncTask
+from ..report.model import ReportFunds, ReportLottery, ReportThirdGame
+from ..service import clean_member, record_sync_error, rename_report_funds, update_sync_meta
+from .local_store import extend_coverage
+from .proxy import UPSTREAM_DATE_PARAMS, FetchPolicy, fetch_agents
+
+logger = structlog.get_logger(__name__)
+
+SYNC_WORKERS = settings.SYNC_WORKERS
+SYNC_TASK_ATTEMPTS = settings.SYNC_TASK_ATTEMPTS
+SYNC_POLL_INTERVAL = 5                # seconds an idle worker waits before looking for work again
+TASK_LEASE = timedelta(minutes=2)     # a running task not renewed by then is claimed again
+TASK_HEARTBEAT = timedelta(seconds=30)  # how often a worker renews its running task's lease
+RETRY_DELAY = timedelta(seconds=30)   # wait before a failed day is tried again, per attempt
+# Background pulls wait for slow agents instead of racing or skipping them, and
+# page in every row (no AGENT_MAX_ROWS cap): a synced day is served locally as complete
+SYNC_FETCH = FetchPolicy(timeout=settings.SYNC_AGENT_TIMEOUT, hedge_delay=0, breaker=False, max_rows=None)
+MAX_FINISHED_JOBS = 20                # finished jobs kept for /sync/jobs
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+SKIPPED = "skipped"      # an earlier day of the same agent and endpoint failed
+CANCELLED = "cancelled"
+
+_UNFINISHED = (PENDING, RUNNING)
+
+
+@dataclass(frozen=True, slots=True)
+class SyncTarget:
+    """How one sync endpoint is pulled from upstream and stored."""
+
+    name: str                          # sync_metadata.endpoint
+    upstream: str                      # proxy endpoint (key of UPSTREAM_PATHS)
+    model: type
+    conflict_columns: tuple[str, ...]
+    lookback_days: int = 0             # first day of a full sync, counted back from today; 0 = no date range
+    datetime_range: bool = False       # range sent as ``day 00:00:00|day 23:59:59``
+    report: bool = False               # rows without report_date get the task's day
+    clean: Callable[[dict], dict] = dict
+
+
+SYNC_TARGETS: dict[str, SyncTarget] = {
+    target.name: target
+    for target in (
+        SyncTarget("invite_list", "invites", InviteList, ("id",)),
+        SyncTarget("bank_list", "banks", BankList, ("id",)),
+        SyncTarget("members", "members", Member, ("id",), clean=clean_member),
+        SyncTarget("bet_order", "bet-orders", BetOrder, ("id", "bet_time"), lookback_days=7),
+        SyncTarget("bet_lottery", "bets", BetLottery, ("id", "create_time"), lookback_days=7, datetime_range=True),
+        SyncTarget("deposit_withdrawal", "deposits", DepositWithdrawal, ("id", "create_time"), lookback_days=30),
+        SyncTarget(
+            "report_lottery", "report-lottery", ReportLottery, ("agent_id", "report_date", "uid", "lottery_id"),
+            lookback_days=30, report=True,
+        ),
+        SyncTarget(
+            "report_funds", "report-funds", ReportFunds, ("agent_id", "id"),
+            lookback_days=30, report=True, clean=rename_report_funds,
+        ),
+        SyncTarget(
+            "report_third_game", "report-third", ReportThirdGame, ("agent_id", "report_date", "uid", "platform_id"),
+            lookback_days=30, report=True,
+        ),
+    )
+}
+SYNC_ORDER: tuple[str, ...] = tuple(SYNC_TARGETS)
+
+
+class SyncJobConflict(Exception):
+    """A sync job is already queued or running."""
+
+
+class TaskFailed(Exception):
+    """Upstream returned no rows for a task (agent failed or breaker open)."""
+
+
+# ── Planning ──
+
+
+def _day_value(target: SyncTarget, day: date) -> str:
+    if target.datetime_range:
+        return f"{day} 00:00:00|{day} 23:59:59"
+    return f"{day}|{day}"
+
+
+def sync_days(start: date, end: date) -> list[date]:
+    """Every day of *start*..*end*, oldest first."""
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+async def _sync_start(db: AsyncSession, target: SyncTarget, agent_id: int, full: bool) -> date:
+    """First day to fetch: the last synced or checkpointed day (re-fetched, it may
+    have been partial) or the lookback."""
+    today = datetime.now(APP_TZ).date()
+    start = today - timedelta(days=target.lookback_days)
+    if full:
+        return start
+    meta = await crud_sync_metadata.get(db=db, agent_id=agent_id, endpoint=target.name)
+    params = (meta or {}).get("sync_params") or {}
+    synced = [params.get("last_data_date"), (params.get("checkpoint") or {}).get("day")]
+    last = max((day for day in synced if day), default=None)
+    return min(date.fromisoformat(last), today) if last else start
+
+
+async def _plan(db: AsyncSession, job: SyncJob) -> list[SyncTask]:
+    today = datetime.now(APP_TZ).date()
+    tasks = []
+    for agent_id in job.agent_ids:
+        for endpoint in job.endpoints:
+            target = SYNC_TARGETS[endpoint]
+            if not target.lookback_days:
+                tasks.append(SyncTask(job_id=job.id, agent_id=agent_id, endpoint=endpoint))
+                continue
+            start = await _sync_start(db, target, agent_id, job.full)
+            tasks.extend(
+                SyncTask(job_id=job.id, agent_id=agent_id, endpoint=endpoint, day=day)
+                for day in sync_days(start, today)
+            )
+    return tasks
+
+
+# ── Jobs ──
+
+
+def _series_status(statuses: set[str]) -> str:
+    """Status of one agent's endpoint from the statuses of its days."""
+    for status in (FAILED, CANCELLED):
+        if status in statuses:
+            return status
+    if statuses == {PENDING}:
+        return PENDING
+    return RUNNING if statuses & set(_UNFINISHED) else COMPLETED
+
+
+def _endpoint_status(statuses: set[str]) -> str:
+    for status in (RUNNING, PENDING, CANCELLED, FAILED):
+        if status in statuses:
+            return status
+    return COMPLETED
+
+
+async def job_summary(db: AsyncSession, job: SyncJob, detail: bool = True) -> dict:
+    """Job state with per-endpoint progress; *detail* adds each agent's endpoints."""
+    stmt = (
+        select(
+            SyncTask.agent_id, SyncTask.endpoint, SyncTask.status,
+            func.count(), func.coalesce(func.sum(SyncTask.rows), 0), func.max(SyncTask.error),
+        )
+        .where(SyncTask.job_id == job.id)
+        .group_by(SyncTask.agent_id, SyncTask.endpoint, SyncTask.status)
+    )
+    series: dict[tuple[int, str], dict] = {}
+    for agent_id, endpoint, status, count, rows, error in (await db.execute(stmt)).all():
+        unit = series.setdefault((agent_id, endpoint), {
+            "agent_id": agent_id, "endpoint": endpoint, "statuses": set(),
+            "done": 0, "total": 0, "rows": 0, "error": None,
+        })
+        unit["statuses"].add(status)
+        unit["total"] += count
+        unit["done"] += 0 if status in _UNFINISHED else count
+        unit["rows"] += rows
+        if status == FAILED:
+            unit["error"] = error
+    for unit in series.values():
+        unit["status"] = _series_status(unit.pop("statuses"))
+
+    endpoints = {}
+    for endpoint in job.endpoints:
+        units = [unit for unit in series.values() if unit["endpoint"] == endpoint]
+        endpoints[endpoint] = {
+            "status": _endpoint_status({unit["status"] for unit in units}),
+            "done": sum(unit["done"] for unit in units),
+            "total": sum(unit["total"] for unit in units),
+            "rows": sum(unit["rows"] for unit in units),
+            "agents_failed": [unit["agent_id"] for unit in units if unit["status"] == FAILED],
+        }
+    done = sum(unit["done"] for unit in series.values())
+    total = sum(unit["total"] for unit in series.values())
+    result = {
+        "id": job.id,
+        "status": job.status,
+        "full": job.full,
+        "agent_ids": job.agent_ids,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "progress": round(100 * done / total, 1) if total else 100.0,
+        "rows": sum(unit["rows"] for unit in series.values()),
+        "endpoints": endpoints,
+    }
+    if detail:
+        result["agents"] = list(series.values())
+    return result
+
+
+async def _prune_jobs(db: AsyncSession) -> None:
+    """Drop finished jobs (and their tasks) beyond the newest ``MAX_FINISHED_JOBS``."""
+    old = (
+        select(SyncJob.id)
+        .where(SyncJob.finished_at.is_not(None))
+        .order_by(SyncJob.created_at.desc())
+        .offset(MAX_FINISHED_JOBS)
+    )
+    await db.execute(delete(SyncJob).where(SyncJob.id.in_(old)))
+
+
+async def start_job(db: AsyncSession, endpoints: list[str], agent_ids: list[int], full: bool = False) -> SyncJob:
+    """Queue syncing *endpoints* for *agent_ids*; the workers pick it up.
+
+    Raises ``SyncJobConflict`` while another job is unfinished.
+    """
+    if await db.scalar(select(exists().where(SyncJob.finished_at.is_(None)))):
+        raise SyncJobConflict
+    await _prune_jobs(db)
+    ordered = [name for name in SYNC_ORDER if name in endpoints]
+    job = SyncJob(id=secrets.token_hex(6), endpoints=ordered, agent_ids=agent_ids, full=full)
+    db.add(job)
+    tasks = await _plan(db, job)
+    db.add_all(tasks)
+    await db.commit()
+    logger.info("Sync job %s queued: %d tasks", job.id, len(tasks))
+    _wake.set()
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: str) -> SyncJob | None:
+    return await db.get(SyncJob, job_id)
+
+
+async def list_jobs(db: AsyncSession) -> list[SyncJob]:
+    """Newest first."""
+    return list(await db.scalars(select(SyncJob).order_by(SyncJob.created_at.desc())))
+
+
+async def cancel_job(db: AsyncSession, job: SyncJob) -> None:
+    """Stop *job*: its queued days are dropped, days already running finish."""
+    if job.finished_at is not None:
+        return
+    await db.execute(
+        update(SyncTask).where(SyncTask.job_id == job.id, SyncTask.status == PENDING).values(status=CANCELLED)
+    )
+    job.status, job.finished_at = CANCELLED, datetime.now(APP_TZ)
+    await db.commit()
+    logger.info("Sync job %s cancelled", job.id)
+
+
+async def _finish_job(db: AsyncSession, job_id: str) -> None:
+    """Mark the job running, or finished once none of its tasks are left."""
+    job = await db.get(SyncJob, job_id)
+    if job is None or job.finished_at is not None:
+        return
+    stmt = select(SyncTask.status, func.count()).where(SyncTask.job_id == job_id).group_by(SyncTask.status)
+    counts = dict((await db.execute(stmt)).all())
+    if any(counts.get(status) for status in _UNFINISHED):
+        job.status = RUNNING
+        return
+    job.status = FAILED if counts.get(FAILED) else COMPLETED
+    job.finished_at = datetime.now(APP_TZ)
+    logger.info("Sync job %s %s", job.id, job.status)
+
+
+# ── Tasks ──
+
+
+def _same_series(other: type[SyncTask], task: SyncTask | type[SyncTask]) -> list:
+    return [other.job_id == task.job_id, other.agent_id == task.agent_id, other.endpoint == task.endpoint]
+
+
+async def _pull(db: AsyncSession, agent: Agent, target: SyncTarget, day: date | None) -> list[dict]:
+    """Fetch one day of *target* for *agent* and upsert it. Returns the records stored."""
+    params = {}
+    if day is not None:
+        params[UPSTREAM_DATE_PARAMS[target.upstream]] = _day_value(target, day)
+    rows = (await fetch_agents(db, target.upstream, params, [agent], policy=SYNC_FETCH))[agent.id]
+    if rows is None:
+        raise TaskFailed(f"{target.upstream} {params or 'all'} failed upstream")
+
+    records = [target.clean(row) | {"agent_id": agent.id} for row in rows]
+    if target.report and day is not None:
+        for record in records:
+            if not record.get("report_date"):
+                record["report_date"] = day.isoformat()
+    await bulk_upsert(db, target.model, records, conflict_columns=list(target.conflict_columns))
+    return records
+
+
+async def _claim() -> int | None:
+    """Take the next runnable task off the queue. Returns its id, or None when idle.
+
+    A task is runnable when it is pending (and past its retry delay) or its
+    lease ran out, and no earlier day of its agent and endpoint is unfinished.
+    """
+    now = datetime.now(APP_TZ)
+    earlier = aliased(SyncTask)
+    blocked = exists().where(
+        *_same_series(earlier, SyncTask), earlier.day < SyncTask.day, earlier.status.in_(_UNFINISHED),
+    )
+    stmt = (
+        select(SyncTask)
+        .where(
+            or_(
+                and_(SyncTask.status == PENDING, SyncTask.run_after <= now),
+                and_(SyncTask.status == RUNNING, SyncTask.claimed_at < now - TASK_LEASE),
+            ),
+            ~blocked,
+        )
+        .order_by(SyncTask.day.asc().nulls_first(), SyncTask.id)
+        .limit(1)
+        .with_for_update(skip_locked=True, of=SyncTask)
+    )
+    async with local_session() as db:
+        task = await db.scalar(stmt)
+        if task is None:
+            return None
+        task.status, task.claimed_at, task.attempts = RUNNING, now, task.attempts + 1
+        await db.commit()
+        return task.id
+
+
+async def _complete(db: AsyncSession, task: SyncTask, records: list[dict]) -> None:
+    left = select(
+        exists().where(*_same_series(SyncTask, task), SyncTask.id != task.id, SyncTask.status.in_(_UNFINISHED)),
+    )
+    params: dict = {"checkpoint": {"job_id": task.job_id, "day": task.day.isoformat() if task.day else None}}
+    if task.day is not None and task.claimed_at is not None:
+        meta = await crud_sync_metadata.get(db=db, agent_id=task.agent_id, endpoint=task.endpoint)
+        params |= extend_coverage((meta or {}).get("sync_params") or {}, task.day, task.claimed_at)
+    await update_sync_meta(
+        db, task.agent_id, task.endpoint, len(records), records,
+        status=RUNNING if await db.scalar(left) else COMPLETED, params=params,
+    )
+    task.status, task.rows, task.error = COMPLETED, len(records), None
+
+
+async def _fail(db: AsyncSession, task: SyncTask, error: str, retry: bool = True) -> None:
+    """Retry *task* later, or fail it and skip the days after it."""
+    task.error = error
+    if retry and task.attempts < SYNC_TASK_ATTEMPTS:
+        task.status, task.run_after = PENDING, datetime.now(APP_TZ) + RETRY_DELAY * task.attempts
+        return
+    task.status = FAILED
+    await db.execute(
+        update(SyncTask).where(*_same_series(SyncTask, task), SyncTask.status == PENDING).values(status=SKIPPED)
+    )
+    await record_sync_error(db, task.agent_id, task.endpoint, error)
+
+
+async def _run_task(task_id: int) -> None:
+    async with local_session() as db:
+        task = await db.get(SyncTask, task_id)
+        if task is None:  # its job was pruned meanwhile
+            return
+        agent = await db.get(Agent, task.agent_id)
+        if agent is None or not agent.is_active:
+            # Retrying cannot help: fail now and skip the agent's later days
+            logger.warning("Sync %s skipped: agent %s is missing or inactive", task.endpoint, task.agent_id)
+            await _fail(db, task, f"agent {task.agent_id} is missing or inactive", retry=False)
+        else:
+            try:
+                records = await _pull(db, agent, SYNC_TARGETS[task.endpoint], task.day)
+                await _complete(db, task, records)
+            except Exception as e:
+                await db.rollback()
+                await db.refresh(task)
+                error = str(e) or type(e).__name__
+                logger.warning(
+                    "Sync %s %s failed for agent %s (attempt %d): %s",
+                    task.endpoint, task.day or "", task.agent_id, task.attempts, error, exc_info=True,
+                )
+                await _fail(db, task, error)
+        await _finish_job(db, task.job_id)
+        await db.commit()
+
+
+async def _heartbeat(task_id: int) -> None:
+    """Renew the lease of *task_id* while this worker runs it.
+
+    Only the stored ``claimed_at`` moves; the running task keeps its claim
+    time, which coverage is judged by (``_complete``).
+    """
+    while True:
+        await asyncio.sleep(TASK_HEARTBEAT.total_seconds())
+        try:
+            async with local_session() as db:
+                await db.execute(
+                    update(SyncTask)
+                    .where(SyncTask.id == task_id, SyncTask.status == RUNNING)
+                    .values(claimed_at=datetime.now(APP_TZ))
+                )
+                await db.commit()
+        except Exception:
+            logger.warning("Sync task %s lease renewal failed", task_id, exc_info=True)
+
+
+async def _release(task_id: int) -> None:
+    """Hand a claimed task back to the queue (worker stopping mid-task)."""
+    async with local_session() as db:
+        await db.execute(
+            update(SyncTask)
+            .where(SyncTask.id == task_id, SyncTask.status == RUNNING)
+            .values(status=PENDING, attempts=SyncTask.attempts - 1)
+        )
+        await db.commit()
+
+
+# ── Workers ──
+
+_workers: list[asyncio.Task] = []
+_wake = asyncio.Event()  # set when a job is queued, so idle workers don't wait out the poll
+
+
+async def _idle() -> None:
+    _wake.clear()
+    with contextlib.suppress(TimeoutError):
+        async with asyncio.timeout(SYNC_POLL_INTERVAL):
+            await _wake.wait()
+
+
+async def _worker() -> None:
+    while True:
+        try:
+            task_id = await _claim()
+        except Exception:
+            logger.warning("Sync worker could not claim a task", exc_info=True)
+            task_id = None
+        if task_id is None:
+            await _idle()
+            continue
+        heartbeat = asyncio.create_task(_heartbeat(task_id))
+        try:
+            await _run_task(task_id)
+        except asyncio.CancelledError:
+            heartbeat.cancel()
+            await asyncio.shield(_release(task_id))
+            raise
+        except Exception:
+            logger.error("Sync task %s aborted", task_id, exc_info=True)
+        finally:
+            heartbeat.cancel()
+
+
+def start_sync_workers(count: int = SYNC_WORKERS) -> None:
+    """Start the queue workers of this process (no-op if running or *count* is 0)."""
+    if _workers:
+        return
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(count))
+
+
+async def stop_sync_workers() -> None:
+    """Stop the queue workers, handing running tasks back. Called during application shutdown."""
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -3,25 +3,27 @@
 Speed design:
 - httpx.AsyncClient with connection pooling (keep-alive)
 - asyncio.gather for parallel requests (latency = max, not sum)
+- Large response bodies parsed off the event loop (codec.loads_json_async)
+- Agents with more rows than one upstream page are paged concurrently (stream_pages)
 - Each row tagged with _agent_name for the "Đại lý" column
+- Agents whose circuit breaker is open are skipped (see breaker.py)
 """
 
 import asyncio
-from datetime import datetime
+import math
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from dataclasses import dataclass
 
 import httpx
 import structlog
-from sqlalchemy import select, update
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
-from ....core.config import APP_TZ
-from ..account.login_service import (
-    AgentLoginService,
-    cookie_dict_to_str,
-    cookie_str_to_dict,
-    decrypt_password,
-)
+from ....core.config import settings
 from ..account.model import Agent
+from . import breaker, codec
+from .sessions import ensure_sessions, invalidate_cookie
 
 logger = structlog.get_logger(__name__)
 
@@ -46,6 +48,17 @@ _USER_AGENT = (
     "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
 )
 
+# Form param carrying the ``YYYY-MM-DD | YYYY-MM-DD`` range per endpoint
+UPSTREAM_DATE_PARAMS: dict[str, str] = {
+    "bets": "create_time",
+    "bet-orders": "bet_time",
+    "report-lottery": "date",
+    "report-funds": "date",
+    "report-third": "date",
+    "deposits": "create_time",
+    "withdrawals": "create_time",
+}
+
 # Default params per endpoint (required by upstream but not sent by frontend)
 UPSTREAM_DEFAULTS: dict[str, dict] = {
     "bets": {"es": "1"},
@@ -88,37 +101,58 @@ async def get_active_agents(db: AsyncSession, agent_id: int | None = None) -> li
     return list(result.scalars().all())
 
 
-async def _ensure_agent_cookie(agent: Agent, db: AsyncSession) -> None:
-    """Kiểm tra cookie upstream còn sống không. Nếu hết hạn → auto re-login."""
-    if not agent.password_enc:
-        return
+# Per-agent deadline: a slow agent is dropped from the fan-out instead of
+# holding every other agent's rows until the 30s client timeout
+AGENT_TIMEOUT = settings.PROXY_AGENT_TIMEOUT
+HEDGE_DELAY = settings.PROXY_HEDGE_DELAY
+
+# Rows per upstream page; agents with more rows are paged, up to AGENT_MAX_ROWS
+AGENT_FETCH_LIMIT = 5000
+AGENT_MAX_ROWS = settings.PROXY_AGENT_MAX_ROWS
+PAGE_CONCURRENCY = 4  # concurrent page requests per agent
+
+
+@dataclass(frozen=True, slots=True)
+class FetchPolicy:
+    timeout: float      # seconds for one agent's first page, and again per round of further pages
+    hedge_delay: float  # re-send a still-unanswered first page after this; 0 disables hedging
+    breaker: bool       # skip agents whose breaker is open, and record each agent's outcome
+    max_rows: int | None = AGENT_MAX_ROWS  # newest rows paged in per agent; None pages in every row
+
+
+INTERACTIVE_FETCH = FetchPolicy(timeout=AGENT_TIMEOUT, hedge_delay=HEDGE_DELAY, breaker=True)
+
+
+class SessionExpired(Exception):
+    """Upstream redirected a data request to its login page."""
+
 
-    cookies_dict = cookie_str_to_dict(agent.cookie or "")
-    svc = AgentLoginService(agent.base_url)
+# Returned by _fetch_one for an agent whose session expired: a failed
+# upstream-style result, recognised by identity for the re-login retry
+_SESSION_EXPIRED: dict = {"code": -1, "msg": "Session expired", "data": []}
 
+
+async def _hedged(attempt: Callable[[], Awaitable[dict]], delay: float) -> dict:
+    """Await *attempt*; if it is still running after *delay*, race a second copy.
+
+    Only slow attempts are hedged — one that fails fast raises as usual. The
+    first copy to succeed wins and the other is cancelled.
+    """
+    tasks = [asyncio.ensure_future(attempt())]
     try:
-        is_valid, msg = await asyncio.to_thread(svc.check_cookies_live, cookies_dict)
-        if is_valid:
-            return
-
-        logger.info("Agent %s cookie expired (%s) — re-logging in", agent.id, msg)
-        plain_pw = decrypt_password(agent.password_enc)
-        ok, login_msg, new_cookies = await asyncio.to_thread(svc.login, agent.username, plain_pw)
-
-        if not ok:
-            logger.warning("Agent %s re-login failed: %s", agent.id, login_msg)
-            return
-
-        new_cookie_str = cookie_dict_to_str(new_cookies)
-        now = datetime.now(APP_TZ)
-        await db.execute(
-            update(Agent).where(Agent.id == agent.id).values(cookie=new_cookie_str, last_login_at=now)
-        )
-        await db.commit()
-        await db.refresh(agent)
-        logger.info("Agent %s re-login OK", agent.id)
+        if delay > 0:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.append(asyncio.ensure_future(attempt()))
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None or not pending:
+                    return task.result()
     finally:
-        svc.close()
+        for task in tasks:
+            task.cancel()
 
 
 async def _fetch_one(
@@ -126,8 +160,13 @@ async def _fetch_one(
     agent: Agent,
     upstream_path: str,
     form_data: dict,
+    hedge_delay: float = 0,
 ) -> tuple[Agent, dict | None]:
-    """Fetch from one upstream agent. Returns (agent, response_dict)."""
+    """Fetch one upstream page from *agent*. Returns (agent, response_dict).
+
+    The request is hedged after *hedge_delay* seconds (0: not hedged); the
+    caller bounds the whole agent fetch (see ``fetch_agents``).
+    """
     headers = {
         "Cookie": agent.cookie or "",
         "X-Requested-With": "XMLHttpRequest",
@@ -137,69 +176,221 @@ async def _fetch_one(
         "Content-Type": "application/x-www-form-urlencoded",
     }
     url = agent.base_url + upstream_path
-    try:
+
+    async def attempt() -> dict:
         resp = await client.post(url, data=form_data, headers=headers)
-        data = resp.json()
-        return agent, data
+        if resp.is_redirect and "login" in resp.headers.get("Location", "").lower():
+            raise SessionExpired(resp.headers["Location"])
+        data: dict = await codec.loads_json_async(resp.content)
+        return data
+
+    try:
+        return agent, await _hedged(attempt, hedge_delay)
+    except SessionExpired:
+        # The agent answered — its session is the problem, not its health
+        logger.info("Agent %s (%s) session expired", agent.id, agent.owner)
+        invalidate_cookie(agent.id)
+        return agent, _SESSION_EXPIRED
     except (httpx.HTTPError, ValueError) as e:
         logger.warning("Agent %s (%s) fetch failed: %s", agent.id, agent.owner, e)
         return agent, None
 
 
-# Max rows to fetch from each agent (get everything for server-side pagination)
-_AGENT_FETCH_LIMIT = 5000
+def build_upstream_params(
+    endpoint: str, form_params: dict, limit: int = AGENT_FETCH_LIMIT, page: int = 1,
+) -> dict:
+    """Inject endpoint defaults and override pagination to fetch *page* of *limit* rows."""
+    # Inject default params (e.g. es=1 for bet endpoints)
+    defaults = UPSTREAM_DEFAULTS.get(endpoint, {})
+    upstream_params = {**defaults, **form_params}
 
+    # Override upstream pagination: fetch ALL rows from each agent.
+    # Server-side pagination on the merged result is done by swr_fetch().
+    upstream_params["page"] = str(page)
+    upstream_params["limit"] = str(limit)
+    return upstream_params
 
-async def fetch_all_agents(
-    db: AsyncSession,
+
+def _page_count(first: dict, max_rows: int | None) -> int:
+    """Pages of ``AGENT_FETCH_LIMIT`` rows needed for the rows upstream reports in *first*."""
+    if len(first.get("data") or []) < AGENT_FETCH_LIMIT:
+        return 1
+    try:
+        total = int(first.get("count") or 0)
+    except (TypeError, ValueError):
+        return 1
+    if max_rows is not None:
+        total = min(total, max_rows)
+    return max(math.ceil(total / AGENT_FETCH_LIMIT), 1)
+
+
+async def stream_pages(
+    client: httpx.AsyncClient,
+    agent: Agent,
     endpoint: str,
     form_params: dict,
-    agent_id: int | None = None,
-) -> dict:
-    """Fan-out to all active agents in parallel, merge results.
-
-    Pagination is applied server-side on the merged result so that
-    ``limit`` means total rows across ALL agents, not per-agent.
+    deadline: asyncio.Timeout | None = None,
+    policy: FetchPolicy = INTERACTIVE_FETCH,
+) -> AsyncIterator[tuple[int, dict | None]]:
+    """Yield ``(page, response)`` for one agent as pages arrive, page 1 first.
+
+    Page 1 reports how many rows upstream has (``count``); the other pages,
+    up to ``policy.max_rows`` rows, are then fetched ``PAGE_CONCURRENCY`` at
+    a time, unhedged, and yielded in completion order. A failed page yields None.
+    *deadline*, the agent's fetch deadline, is extended by ``policy.timeout``
+    per round of ``PAGE_CONCURRENCY`` further pages.
     """
-    upstream_path = UPSTREAM_PATHS.get(endpoint)
-    if not upstream_path:
-        return {"code": 1, "msg": f"Unknown endpoint: {endpoint}", "data": [], "count": 0}
+    upstream_path = UPSTREAM_PATHS[endpoint]
+    params = build_upstream_params(endpoint, form_params)
+    _, first = await _fetch_one(client, agent, upstream_path, params, policy.hedge_delay)
+    yield 1, first
+    if first is None or first.get("code") != 0:
+        return
+    max_rows = policy.max_rows
+    pages = _page_count(first, max_rows)
+    if max_rows is not None and pages > 1 and int(first.get("count") or 0) > max_rows:
+        logger.warning("Agent %s has %s %s rows — fetching the newest %d", agent.id, first["count"], endpoint, max_rows)
+    if deadline is not None and (when := deadline.when()) is not None and pages > 1:
+        deadline.reschedule(when + policy.timeout * math.ceil((pages - 1) / PAGE_CONCURRENCY))
+
+    slots = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+    async def fetch_page(page: int) -> tuple[int, dict | None]:
+        async with slots:
+            params = build_upstream_params(endpoint, form_params, page=page)
+            _, result = await _fetch_one(client, agent, upstream_path, params)
+        return page, result
+
+    for next_page in asyncio.as_completed([fetch_page(page) for page in range(2, pages + 1)]):
+        yield await next_page
+
+
+def _join_pages(pages: dict[int, list[dict]]) -> list[dict]:
+    """Concatenate pages in order, dropping rows that new rows pushed onto the next page."""
+    if len(pages) == 1:
+        return next(iter(pages.values()))
+    rows: list[dict] = []
+    seen: set = set()
+    for page in sorted(pages):
+        for row in pages[page]:
+            row_id = row.get("id")
+            if row_id is not None:
+                if row_id in seen:
+                    continue
+                seen.add(row_id)
+            rows.append(row)
+    return rows
+
+
+async def _fetch_all_pages(
+    client: httpx.AsyncClient,
+    agent: Agent,
+    endpoint: str,
+    form_params: dict,
+    deadline: asyncio.Timeout | None = None,
+    policy: FetchPolicy = INTERACTIVE_FETCH,
+) -> dict | None:
+    """Every page of one agent's rows as one upstream-style response; None if a page failed."""
+    first: dict = {}
+    pages: dict[int, list[dict]] = {}
+    async for page, result in stream_pages(client, agent, endpoint, form_params, deadline=deadline, policy=policy):
+        if result is None or result.get("code") != 0 or not isinstance(result.get("data"), list):
+            if page == 1:
+                return result
+            logger.warning("Agent %s %s page %d failed — dropping the agent's rows", agent.id, endpoint, page)
+            return None
+        if page == 1:
+            first = result
+        pages[page] = result["data"]
+    return {**first, "data": _join_pages(pages)}
+
+
+def tag_rows(agent: Agent, result: dict | None) -> list[dict] | None:
+    """Extract rows from an upstream response and tag them with the agent."""
+    if result is None or result.get("code") != 0 or not isinstance(result.get("data"), list):
+        return None
+    rows: list[dict] = result["data"]
+    for row in rows:
+        row["_agent_id"] = agent.id
+        row["_agent_name"] = agent.owner
+        row["_agent_base_url"] = agent.base_url
+    return rows
 
-    agents = await get_active_agents(db, agent_id)
-    if not agents:
-        return {"code": 0, "msg": "No active agents", "data": [], "count": 0}
 
-    # Pre-check cookies — tự động re-login nếu agent có password_enc và cookie hết hạn
-    for ag in agents:
-        if ag.password_enc:
-            await _ensure_agent_cookie(ag, db)
+async def fetch_agents(
+    db: AsyncSession,
+    endpoint: str,
+    form_params: dict,
+    agents: list[Agent],
+    limits: dict[int, int] | None = None,
+    policy: FetchPolicy = INTERACTIVE_FETCH,
+) -> dict[int, list[dict] | None]:
+    """Fetch *agents* in parallel. Returns ``{agent_id: rows}``, None for failed agents.
+
+    Each agent's rows are paged in up to ``policy.max_rows``; *limits* instead
+    fetches a single page of that many rows for an agent id (e.g. small delta pages).
+    One deadline of ``policy.timeout`` bounds each agent's whole fetch, extended
+    once for agents whose rows span several pages (see ``stream_pages``).
+    """
+    upstream_path = UPSTREAM_PATHS[endpoint]
 
-    # Inject default params (e.g. es=1 for bet endpoints)
-    defaults = UPSTREAM_DEFAULTS.get(endpoint, {})
-    upstream_params = {**defaults, **form_params}
+    # Known-down agents are not contacted (nor re-logged in) until their breaker half-opens
+    skipped = [ag for ag in agents if policy.breaker and not breaker.allow(ag.id)]
+    if skipped:
+        logger.info("Skipping agents with open circuit breaker: %s", [ag.id for ag in skipped])
+        agents = [ag for ag in agents if ag not in skipped]
 
-    # Override upstream pagination: fetch ALL rows from each agent.
-    # Server-side pagination on the merged result is done by swr_fetch().
-    upstream_params["page"] = "1"
-    upstream_params["limit"] = str(_AGENT_FETCH_LIMIT)
+    # Check cookies not verified recently — tự động re-login nếu cookie hết hạn
+    await ensure_sessions(db, agents)
 
+    limits = limits or {}
     client = await get_client()
 
+    async def fetch(ag: Agent) -> tuple[Agent, dict | None]:
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(policy.timeout) as deadline:
+                if ag.id in limits:
+                    params = build_upstream_params(endpoint, form_params, limits[ag.id])
+                    _, result = await _fetch_one(client, ag, upstream_path, params, policy.hedge_delay)
+                else:
+                    result = await _fetch_all_pages(client, ag, endpoint, form_params, deadline, policy)
+        except TimeoutError:
+            logger.warning("Agent %s (%s) timed out after %.1fs", ag.id, ag.owner, time.monotonic() - started)
+            result = None
+        if policy.breaker and result is not _SESSION_EXPIRED:
+            breaker.record(ag.id, result is not None, time.monotonic() - started)
+        return ag, result
+
     # Parallel fetch from all agents
-    tasks = [_fetch_one(client, ag, upstream_path, upstream_params) for ag in agents]
-    results = await asyncio.gather(*tasks)
+    results = dict(await asyncio.gather(*(fetch(ag) for ag in agents)))
+
+    # Sessions upstream rejected: log in again and retry those agents once
+    expired = [ag for ag, result in results.items() if result is _SESSION_EXPIRED and ag.password_enc]
+    if expired:
+        await ensure_sessions(db, expired, expired=True)
+        results.update(await asyncio.gather(*(fetch(ag) for ag in expired)))
+
+    return {
+        **{ag.id: None for ag in skipped},
+        **{agent.id: tag_rows(agent, result) for agent, result in results.items()},
+    }
 
-    all_data: list[dict] = []
 
-    for agent, result in results:
-        if result is None:
-            continue
-        if result.get("code") == 0 and isinstance(result.get("data"), list):
-            for row in result["data"]:
-                row["_agent_id"] = agent.id
-                row["_agent_name"] = agent.owner
-                row["_agent_base_url"] = agent.base_url
-            all_data.extend(result["data"])
+def mark_partial(result: dict, failed: Iterable[Agent]) -> dict:
+    """Flag *result* as missing the rows of *failed* agents (for the UI)."""
+    failed = list(failed)
+    if failed:
+        result["_partial"] = True
+        result["_agents_failed"] = [{"id": ag.id, "name": ag.owner} for ag in failed]
+    return result
+
+
+def merge_agent_rows(slices: Iterable[list[dict]]) -> dict:
+    """Merge per-agent row lists into one response dict, newest first by id."""
+    all_data: list[dict] = []
+    for rows in slices:
+        all_data.extend(rows)
 
     # Sort mixed data so records from all agents interleave naturally
     # (same order as viewing a single agent — newest first by id)
@@ -209,6 +400,29 @@ async def fetch_all_agents(
     return {"code": 0, "data": all_data, "count": len(all_data)}
 
 
+async def fetch_all_agents(
+    db: AsyncSession,
+    endpoint: str,
+    form_params: dict,
+    agent_id: int | None = None,
+) -> dict:
+    """Fan-out to all active agents in parallel, merge results.
+
+    Pagination is applied server-side on the merged result so that
+    ``limit`` means total rows across ALL agents, not per-agent.
+    """
+    if endpoint not in UPSTREAM_PATHS:
+        return {"code": 1, "msg": f"Unknown endpoint: {endpoint}", "data": [], "count": 0}
+
+    agents = await get_active_agents(db, agent_id)
+    if not agents:
+        return {"code": 0, "msg": "No active agents", "data": [], "count": 0}
+
+    results = await fetch_agents(db, endpoint, form_params, agents)
+    merged = merge_agent_rows(rows for rows in results.values() if rows is not None)
+    return mark_partial(merged, (ag for ag in agents if results[ag.id] is None))
+
+
 # ── Rebate-specific helpers (JSON API, not form-encoded) ──────────
 
 
@@ -7,11 +7,11 @@ from sqlalchemy.ext.asyncio.session import AsyncSession
 
 from ....core.db.database import async_get_db
 from ....core.deps import get_current_user
+from ..account.captcha import get_captcha_stats
+from .breaker import get_breaker_stats
 from .proxy import fetch_rebate_games, fetch_rebate_init, fetch_rebate_panel
 from .swr import get_cache_stats, swr_fetch
-
-# Maximum rows fetched for computing report totals (prevents OOM)
-_TOTALS_MAX_ROWS = 5000
+from .warmer import get_warmer_stats
 
 router = APIRouter(
     prefix="/proxy",
@@ -72,8 +72,13 @@ async def proxy_rebate(
 
 @router.get("/cache-stats")
 async def cache_stats() -> dict:
-    """SWR cache statistics."""
-    return get_cache_stats()
+    """SWR cache, warmer, per-agent circuit breaker and captcha solve statistics."""
+    return {
+        **get_cache_stats(),
+        "warmer": get_warmer_stats(),
+        "agents": get_breaker_stats(),
+        "captcha": get_captcha_stats(),
+    }
 
 
 @router.post("/{endpoint}")
@@ -84,40 +89,20 @@ async def proxy_upstream(
 ) -> dict:
     """Proxy request with 3-layer SWR cache (Memory → Redis → Upstream).
 
+    Days already synced for every requested agent are read from the local
+    tables; only the rest of the range goes upstream (``_source`` is
+    ``"local"`` or ``"hybrid"`` in the response).
+
     Query params:
-      _fresh=1  → bypass cache, always fetch from upstream
+      _fresh=1  → skip the cached result for this query and rebuild it: an
+                  all-agents query reuses fresh per-agent slices and only
+                  re-fetches stale or missing ones (joining in-flight
+                  fetches); a single-agent query refreshes its slice
     """
     params = _parse_form(await request.body())
     agent_id = _extract_agent_id(params)
     force_fresh = request.query_params.get("_fresh") == "1"
-    result = await swr_fetch(db, endpoint, params, agent_id, force_fresh)
-
-    # Report endpoints: compute column totals
-    if endpoint.startswith("report-") and result.get("code") == 0:
-        totals_params = {k: v for k, v in params.items() if k not in ("page", "limit")}
-        totals_params["page"] = "1"
-        totals_params["limit"] = str(_TOTALS_MAX_ROWS)
-        totals_res = await swr_fetch(
-            db, endpoint, totals_params, agent_id, force_fresh=False,
-        )
-        if totals_res.get("code") == 0 and totals_res.get("data"):
-            _totals: dict[str, float] = {}
-            _uniques: dict[str, set] = {}
-            for row in totals_res["data"]:
-                for key, val in row.items():
-                    if key.startswith("_"):
-                        continue
-                    try:
-                        _totals[key] = _totals.get(key, 0) + float(val)
-                    except (ValueError, TypeError):
-                        if key not in _uniques:
-                            _uniques[key] = set()
-                        if val:
-                            _uniques[key].add(str(val))
-            for key, vals in _uniques.items():
-                _totals[key] = len(vals)
-            result["_totals"] = _totals
-            if len(totals_res["data"]) >= _TOTALS_MAX_ROWS:
-                result["_totals_truncated"] = True
-
-    return result
+    # Report endpoints: column totals over every row of the cached result
+    return await swr_fetch(
+        db, endpoint, params, agent_id, force_fresh, with_totals=endpoint.startswith("report-"),
+    )
@@ -0,0 +1,215 @@
+"""Upstream agent sessions — cookie validity cache and re-login coordination.
+
+A cookie that passed ``check_cookies_live`` (or came from a login) is trusted
+for ``COOKIE_CHECK_TTL``; a data fetch redirected to the login page drops it
+at once (``invalidate_cookie``). Cookies due for a check are checked
+concurrently, and a re-login is deduplicated twice over:
+
+- per worker, callers needing the same agent join one in-flight task;
+- across workers, a Redis lock lets one worker log in while the others wait
+  for the lock to clear and reuse the cookie it stored.
+
+So a cold start after a session expiry takes about one login, not the sum
+of one login per agent.
+"""
+
+import asyncio
+import secrets
+import time
+from collections.abc import Iterable
+from datetime import datetime
+
+import structlog
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from ....core.config import APP_TZ, settings
+from ....core.db.database import local_session
+from ....core.utils import cache as redis_cache
+from ..account.login_service import AsyncAgentLoginService, cookie_dict_to_str, cookie_str_to_dict, decrypt_password
+from ..account.model import Agent
+
+logger = structlog.get_logger(__name__)
+
+COOKIE_CHECK_TTL = settings.PROXY_COOKIE_CHECK_TTL
+LOGIN_LOCK_TTL = 120        # seconds — must outlive a login with all its captcha attempts
+LOGIN_POLL_INTERVAL = 0.5   # seconds — how often lock waiters re-check Redis
+
+# Cookies known to be live: agent_id → (cookie, monotonic time verified).
+# Keyed by the cookie string, so a cookie replaced by another worker is checked again.
+_verified_cookies: dict[int, tuple[str, float]] = {}
+
+# In-flight check / re-login per (agent_id, expired)
+_logins: dict[tuple[int, bool], asyncio.Task] = {}
+
+
+def _cookie_verified(agent: Agent) -> bool:
+    entry = _verified_cookies.get(agent.id)
+    return (
+        entry is not None
+        and entry[0] == (agent.cookie or "")
+        and time.monotonic() - entry[1] < COOKIE_CHECK_TTL
+    )
+
+
+def invalidate_cookie(agent_id: int) -> None:
+    """Forget that *agent_id*'s cookie was live; the next fetch re-checks it."""
+    _verified_cookies.pop(agent_id, None)
+
+
+# ── Cross-worker login lock ──
+# Compare-and-delete so a worker never releases a lock it no longer owns
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _lock_key(agent_id: int) -> str:
+    return f"proxy:login:{agent_id}:lock"
+
+
+async def _acquire_login_lock(agent_id: int) -> str | None:
+    """Token if this worker may log *agent_id* in, None if another worker is.
+
+    Without Redis (or on Redis errors) every worker gets a token.
+    """
+    token = secrets.token_hex(8)
+    if redis_cache.client is None:
+        return token
+    try:
+        acquired = await redis_cache.client.set(_lock_key(agent_id), token, nx=True, ex=LOGIN_LOCK_TTL)
+    except Exception:
+        logger.warning("Redis login lock acquire failed: agent %s", agent_id, exc_info=True)
+        return token
+    return token if acquired else None
+
+
+async def _release_login_lock(agent_id: int, token: str) -> None:
+    if redis_cache.client is None:
+        return
+    try:
+        await redis_cache.client.eval(_RELEASE_SCRIPT, 1, _lock_key(agent_id), token)
+    except Exception:
+        logger.warning("Redis login lock release failed: agent %s", agent_id, exc_info=True)
+
+
+async def _stored_cookie(agent_id: int) -> str:
+    async with local_session() as db:
+        return (await db.execute(select(Agent.cookie).where(Agent.id == agent_id))).scalar_one_or_none() or ""
+
+
+async def _wait_for_login(agent_id: int, stale: str) -> str | None:
+    """Wait for another worker's login of *agent_id*; its new cookie, or None."""
+    deadline = time.monotonic() + LOGIN_LOCK_TTL
+    client = redis_cache.client
+    try:
+        while client is not None and time.monotonic() < deadline:
+            if not await client.exists(_lock_key(agent_id)):
+                break
+            await asyncio.sleep(LOGIN_POLL_INTERVAL)
+    except Exception:
+        logger.warning("Redis login lock wait failed: agent %s", agent_id, exc_info=True)
+    cookie = await _stored_cookie(agent_id)
+    return cookie if cookie and cookie != stale else None
+
+
+# ── Check / login ──
+
+
+async def _login_service(base_url: str) -> AsyncAgentLoginService:
+    from .proxy import get_client  # proxy imports this module
+
+    return AsyncAgentLoginService(base_url, await get_client())
+
+
+async def _check_live(base_url: str, cookie: str) -> tuple[bool, str]:
+    svc = await _login_service(base_url)
+    return await svc.check_cookies_live(cookie_str_to_dict(cookie))
+
+
+async def _login(agent_id: int, base_url: str, username: str, password_enc: str) -> str | None:
+    """Log in upstream and store the new cookie. Returns it, or None."""
+    svc = await _login_service(base_url)
+    ok, msg, cookies = await svc.login(username, decrypt_password(password_enc))
+    if not ok:
+        logger.warning("Agent %s re-login failed: %s", agent_id, msg)
+        return None
+
+    cookie = cookie_dict_to_str(cookies)
+    async with local_session() as db:
+        await db.execute(
+            update(Agent).where(Agent.id == agent_id).values(cookie=cookie, last_login_at=datetime.now(APP_TZ))
+        )
+        await db.commit()
+    logger.info("Agent %s re-login OK", agent_id)
+    return cookie
+
+
+async def _renew(
+    agent_id: int, base_url: str, username: str, password_enc: str, cookie: str, expired: bool,
+) -> str | None:
+    """A live cookie for the agent — *cookie* itself, or a new one. None on failure.
+
+    *expired* means upstream already rejected *cookie*: no liveness check.
+    Works on plain values, not the caller's ``Agent``, since the task is shared.
+    """
+    if not expired:
+        is_valid, msg = await _check_live(base_url, cookie)
+        if is_valid:
+            return cookie
+        logger.info("Agent %s cookie expired (%s) — re-logging in", agent_id, msg)
+
+    token = await _acquire_login_lock(agent_id)
+    if token is None:
+        return await _wait_for_login(agent_id, cookie)
+    try:
+        # Another worker may have finished a login just before we got the lock
+        current = await _stored_cookie(agent_id)
+        if current and current != cookie:
+            return current
+        return await _login(agent_id, base_url, username, password_enc)
+    finally:
+        await _release_login_lock(agent_id, token)
+
+
+async def _renew_shared(agent: Agent, expired: bool) -> str | None:
+    """Join the in-flight check / login for *agent*, starting one if needed.
+
+    An *expired* caller only joins a forced re-login: a liveness check
+    running alongside may still hand back the cookie upstream just rejected.
+    """
+    task = _logins.get((agent.id, True))
+    if task is None and not expired:
+        task = _logins.get((agent.id, False))
+    if task is None:
+        key = (agent.id, expired)
+        task = asyncio.create_task(_renew(
+            agent.id, agent.base_url, agent.username, agent.password_enc or "", agent.cookie or "", expired,
+        ))
+        _logins[key] = task
+        task.add_done_callback(lambda _: _logins.pop(key, None))
+    # shield: a cancelled caller must not cancel the login other callers await
+    return await asyncio.shield(task)
+
+
+async def ensure_sessions(db: AsyncSession, agents: Iterable[Agent], expired: bool = False) -> None:
+    """Make sure each agent with a stored password has a live cookie.
+
+    Cookies verified within ``COOKIE_CHECK_TTL`` are trusted; the rest are
+    checked (and re-logged in if dead) concurrently. *expired* marks cookies
+    upstream just rejected. Renewed agents are refreshed from *db*.
+    """
+    due = [ag for ag in agents if ag.password_enc and (expired or not _cookie_verified(ag))]
+    if not due:
+        return
+    cookies = await asyncio.gather(*(_renew_shared(ag, expired) for ag in due))
+    for ag, cookie in zip(due, cookies, strict=True):
+        if cookie is None:
+            continue
+        if cookie != (ag.cookie or ""):
+            # Sequential: the agents share the caller's session
+            await db.refresh(ag)
+        _verified_cookies[ag.id] = (cookie, time.monotonic())
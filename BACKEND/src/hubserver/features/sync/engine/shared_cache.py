@@ -0,0 +1,208 @@
+"""Host-wide proxy cache shared by all Uvicorn workers (Layer 1.5).
+
+Entries live as files in a tmpfs directory (``/dev/shm/...`` on Linux), so
+they are held in shared memory once per host and survive worker restarts —
+a freshly spawned worker starts warm instead of refetching upstream.
+
+Layout: one file per ``make_cache_key`` digest holding an 8-byte creation
+timestamp followed by a ``codec``-encoded payload. Writes go to a temp file
+and are published with ``os.replace`` (atomic), so readers never see a
+partial entry; temp files a crashed write left behind are removed by the
+next rescan. The file mtime is bumped on every hit and doubles as the LRU
+clock when the directory exceeds its byte budget.
+
+File I/O runs in worker threads, off the event loop. Each worker keeps a
+running byte total of the directory (its own writes and removals) and only
+rescans it when that total goes over budget or every ``RESCAN_INTERVAL``
+seconds, to pick up the other workers' writes. The directory is private to
+the server's user (0700) and entries are created 0600.
+
+Because workers still keep decoded hot entries in their own ``MemoryCache``,
+lower ``PROXY_CACHE_MAX_BYTES`` when enabling this layer to keep the
+per-worker copies small.
+"""
+
+import asyncio
+import os
+import struct
+import tempfile
+import time
+
+import structlog
+
+from . import codec
+
+logger = structlog.get_logger(__name__)
+
+_HEADER = struct.Struct("!d")  # created_at (wall clock, shared across processes)
+_TMP_SUFFIX = ".tmp"
+RESCAN_INTERVAL = 60  # seconds between directory rescans that resync the byte total
+TMP_MAX_AGE = 30  # seconds — older temp files were left by a crashed write and are removed on rescan
+
+
+class SharedCache:
+    """Serialized LRU/TTL cache in a directory every worker on the host can read."""
+
+    def __init__(self, directory: str, max_stale_ttl: float, max_bytes: int):
+        self._dir = directory
+        self._max_stale_ttl = max_stale_ttl
+        self._max_bytes = max_bytes
+        self._evictions = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)  # makedirs leaves an existing directory's mode alone
+        entries = self._scan()
+        self._entries = len(entries)
+        self._bytes = sum(size for _, size, _ in entries)
+        self._scanned_at = time.monotonic()
+        self._rescan: asyncio.Task | None = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._dir, key.rsplit(":", 1)[-1])
+
+    @staticmethod
+    def _unlink(path: str) -> bool:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    @staticmethod
+    def _read(path: str) -> bytes | None:
+        """Read an entry and bump its mtime (LRU: mtime = last access)."""
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return raw
+
+    async def _drop(self, path: str, size: int) -> None:
+        """Remove an unusable entry (expired or corrupt) of *size* bytes."""
+        if await asyncio.to_thread(self._unlink, path):
+            self._entries -= 1
+            self._bytes -= size
+
+    async def get(self, key: str, max_stale_ttl: float | None = None) -> tuple[dict | None, float]:
+        """Returns (data, age_seconds). (None, -1) on miss.
+
+        *max_stale_ttl* overrides the cache-wide limit for this key's policy.
+        """
+        path = self._path(key)
+        try:
+            raw = await asyncio.to_thread(self._read, path)
+        except OSError:
+            logger.warning("Shared cache read failed: %s", key, exc_info=True)
+            return None, -1
+        if raw is None or len(raw) <= _HEADER.size:
+            return None, -1
+
+        (created_at,) = _HEADER.unpack_from(raw)
+        age = time.time() - created_at
+        if age > (max_stale_ttl or self._max_stale_ttl):
+            await self._drop(path, len(raw))
+            return None, -1
+
+        try:
+            data = await codec.decode_async(raw[_HEADER.size :])
+        except ValueError:
+            logger.warning("Shared cache entry corrupt, dropping: %s", key)
+            await self._drop(path, len(raw))
+            return None, -1
+        return data, age
+
+    def _write(self, path: str, payload: bytes) -> int | None:
+        """Publish *payload* at *path*. Returns the size of the entry it replaced, None if new."""
+        fd, tmp = tempfile.mkstemp(dir=self._dir, suffix=_TMP_SUFFIX)  # created 0600
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            try:
+                replaced: int | None = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = None
+            os.replace(tmp, path)
+        except OSError:
+            self._unlink(tmp)
+            raise
+        return replaced
+
+    async def put(self, key: str, data: dict, age: float = 0) -> None:
+        payload = _HEADER.pack(time.time() - age) + await codec.encode_async(data)
+        if len(payload) > self._max_bytes:
+            return
+        try:
+            replaced = await asyncio.to_thread(self._write, self._path(key), payload)
+        except OSError:
+            logger.warning("Shared cache write failed: %s", key, exc_info=True)
+            return
+        if replaced is None:
+            self._entries += 1
+        self._bytes += len(payload) - (replaced or 0)
+
+        over_budget = self._bytes > self._max_bytes
+        if (over_budget or time.monotonic() - self._scanned_at > RESCAN_INTERVAL) and self._rescan is None:
+            self._rescan = asyncio.create_task(self._resync())
+            if over_budget:
+                await asyncio.shield(self._rescan)
+
+    async def _resync(self) -> None:
+        try:
+            entries, total, evicted = await asyncio.to_thread(self._evict)
+            self._entries, self._bytes = entries, total
+            self._evictions += evicted
+        except OSError:
+            logger.warning("Shared cache rescan failed: %s", self._dir, exc_info=True)
+        finally:
+            self._scanned_at = time.monotonic()
+            self._rescan = None
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) of every published entry. Removes abandoned temp files."""
+        entries = []
+        tmp_cutoff = time.time() - TMP_MAX_AGE
+        with os.scandir(self._dir) as it:
+            for item in it:
+                try:
+                    st = item.stat()
+                except FileNotFoundError:
+                    continue
+                if item.name.endswith(_TMP_SUFFIX):
+                    if st.st_mtime < tmp_cutoff:
+                        self._unlink(item.path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, item.path))
+        return entries
+
+    def _evict(self) -> tuple[int, int, int]:
+        """Drop least recently used entries over budget. Returns (entries, bytes, evicted)."""
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        if total > self._max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self._max_bytes:
+                    break
+                self._unlink(path)
+                total -= size
+                evicted += 1
+        return len(entries) - evicted, total, evicted
+
+    def clear(self) -> None:
+        for _, _, path in self._scan():
+            self._unlink(path)
+        self._entries = self._bytes = 0
+
+    def stats(self) -> dict:
+        """Entry and byte counts as of this worker's running total (no directory scan)."""
+        return {
+            "entries": self._entries,
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "evictions": self._evictions,
+        }
@@ -1,24 +1,53 @@
 """3-layer SWR cache: Memory → Redis → Upstream.
 
 Layer 1: In-process memory (OrderedDict, LRU, <1ms)
-Layer 2: Redis (existing pool from core/utils/cache, ~3ms)
-Layer 3: Upstream HTTP fetch via proxy.py (~200ms)
+Layer 1.5: Optional host-wide shared cache (tmpfs, see shared_cache.py)
+Layer 2: Redis (existing pool from core/utils/cache, ~3ms, see codec.py)
+Layer 3: Upstream HTTP fetch via proxy.py (~200ms); days already synced
+         are read from the local tables instead (local_store.py)
 
-Stale-While-Revalidate: returns stale data instantly,
-frontend triggers ?_fresh=1 reload for fresh data.
+Stale-While-Revalidate: returns stale data instantly and schedules one
+background refresh per key that writes back to Memory + Redis.
+
+How long an entry stays fresh / servable depends on the endpoint and, for
+date-filtered endpoints, on whether the range is already over (see
+``ttl_policy``).
 """
 
+import asyncio
 import hashlib
-import json
+import itertools
+import secrets
+import sys
 import time
+from array import array
 from collections import OrderedDict
-from dataclasses import dataclass
+from collections.abc import Coroutine
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
 
 import structlog
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
+from ....core.config import APP_TZ, settings
+from ....core.db.database import local_session
 from ....core.utils import cache as redis_cache
-from .proxy import fetch_all_agents
+from ...data.service import parse_date_range
+from ..account.model import Agent
+from . import codec
+from .local_store import combine_results, plan_query
+from .proxy import (
+    AGENT_MAX_ROWS,
+    UPSTREAM_DATE_PARAMS,
+    UPSTREAM_PATHS,
+    fetch_agents,
+    fetch_all_agents,
+    get_active_agents,
+    mark_partial,
+    merge_agent_rows,
+)
+from .shared_cache import SharedCache
 
 logger = structlog.get_logger(__name__)
 
@@ -26,7 +55,71 @@ logger = structlog.get_logger(__name__)
 MEMORY_FRESH_TTL = 300      # seconds — data considered "fresh" (5 min)
 MEMORY_MAX_STALE_TTL = 3600 # seconds — evict after this (1 hour)
 MEMORY_MAX_ENTRIES = 500
+MEMORY_MAX_BYTES = settings.PROXY_CACHE_MAX_BYTES  # approximate, per worker
+SIZE_SAMPLE_ROWS = 32       # rows sampled to estimate an entry's size
 REDIS_TTL = 1800            # seconds — 30 minutes
+LEASE_TTL = 35              # seconds — renewed every third of it while the holder fetches
+LEASE_POLL_INTERVAL = 0.1   # seconds — how often lease waiters re-check Redis
+LEASE_WAIT_TIMEOUT = 60     # seconds a waiter follows the lease holder before fetching itself
+HIT_HALF_LIFE = 600         # seconds — an entry's hit score halves every 10 minutes without hits
+
+
+
+@dataclass(frozen=True, slots=True)
+class TTLPolicy:
+    fresh: float      # seconds served without revalidation
+    max_stale: float  # seconds before memory / shared entries are dropped
+    redis: float      # Redis expiry in seconds
+
+
+DEFAULT_TTL = TTLPolicy(MEMORY_FRESH_TTL, MEMORY_MAX_STALE_TTL, REDIS_TTL)
+ENDPOINT_TTLS: dict[str, TTLPolicy] = {
+    "banks": TTLPolicy(3600, 6 * 3600, 6 * 3600),      # edited by hand, rarely
+    "invites": TTLPolicy(1800, 6 * 3600, 6 * 3600),
+    "bets": TTLPolicy(60, 1800, 900),                  # new rows every second
+    "bet-orders": TTLPolicy(60, 1800, 900),
+    "deposits": TTLPolicy(120, 3600, 1800),
+    "withdrawals": TTLPolicy(120, 3600, 1800),
+}
+# Date ranges that ended before today no longer change upstream
+HISTORICAL_TTL = TTLPolicy(24 * 3600, 7 * 24 * 3600, 7 * 24 * 3600)
+
+# Append-mostly endpoints refreshed by delta (newest rows above the cached max id)
+DELTA_ENDPOINTS = {"bets", "bet-orders"}
+DELTA_FETCH_LIMIT = 500     # rows per delta page — a full page without overlap forces a full fetch
+
+# Sort columns served from the cache entry's index (built on first use), per
+# endpoint; any other sort stays in the cache key and is forwarded for upstream to apply
+INDEXED_SORT_COLUMNS: dict[str, tuple[str, ...]] = {
+    "members": ("create_time", "money"),
+    "invites": ("create_time",),
+    "bets": ("create_time", "money"),
+    "bet-orders": ("create_time", "bet_amount"),
+    "report-lottery": ("bet_amount",),
+    "deposits": ("create_time",),
+    "withdrawals": ("create_time",),
+}
+
+# Form filters applied in memory to a cached superset entry, per endpoint. Each
+# names a row field holding the values upstream filters on: ids and members'
+# status codes compare equal, SUBSTRING_FILTER_FIELDS match case-insensitive
+# substrings as upstream does (the ``_LIKE_FIELDS`` of data/service.py). Selects
+# whose form codes differ from the row values (bets / withdrawals status,
+# deposits status and type, invites user_type) go upstream, as does username
+# on bet-orders, whose rows carry no username.
+MEMORY_FILTER_FIELDS: dict[str, set[str]] = {
+    "members": {"username", "status"},
+    "invites": {"invite_code"},
+    "bets": {"username", "serial_no", "lottery_id"},
+    "bet-orders": {"serial_no", "platform_username"},
+    "report-lottery": {"username", "lottery_id"},
+    "report-funds": {"username"},
+    "report-third": {"username", "platform_id"},
+    "deposits": {"username"},
+    "withdrawals": {"username", "serial_no"},
+    "banks": {"card_number"},
+}
+SUBSTRING_FILTER_FIELDS = {"username", "serial_no", "platform_username", "invite_code", "card_number"}
 
 
 # ── Cache key ──
@@ -37,23 +130,122 @@ def make_cache_key(endpoint: str, agent_id: int | None, params: dict) -> str:
     return f"sync:proxy:{digest}"
 
 
+def ttl_policy(endpoint: str, form_params: dict) -> TTLPolicy:
+    """TTLs for a request: historical date ranges get ``HISTORICAL_TTL``."""
+    date_param = UPSTREAM_DATE_PARAMS.get(endpoint)
+    value = form_params.get(date_param) if date_param else None
+    date_range = parse_date_range(value) if value else None
+    if date_range and date_range[1] < datetime.now(APP_TZ).date().isoformat():
+        return HISTORICAL_TTL
+    return ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL)
+
+
+# ── Sort index ──
+def _sort_key(value: Any) -> tuple:
+    """Order numbers numerically, everything else as text, missing values last.
+
+    Descending pages walk the index backwards, so missing values come first
+    there — the same NULLS LAST / NULLS FIRST defaults PostgreSQL applies.
+    """
+    if value is None or value == "":
+        return (2, "")
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+
+def build_sort_index(rows: list[dict], column: str) -> array:
+    """Row offsets of *rows* sorted ascending by *column* (uint32 array)."""
+    return array("I", sorted(range(len(rows)), key=lambda i: _sort_key(rows[i].get(column))))
+
+
+def compute_totals(rows: list[dict]) -> dict[str, float]:
+    """Column totals of *rows*: numeric columns summed, others counted distinct.
+
+    Keys starting with ``_`` are bookkeeping (e.g. ``_agent_id``) and skipped.
+    """
+    totals: dict[str, float] = {}
+    uniques: dict[str, set] = {}
+    for row in rows:
+        for key, val in row.items():
+            if key.startswith("_"):
+                continue
+            try:
+                totals[key] = totals.get(key, 0) + float(val)
+            except (ValueError, TypeError):
+                seen = uniques.setdefault(key, set())
+                if val:
+                    seen.add(str(val))
+    for key, vals in uniques.items():
+        totals[key] = len(vals)
+    return totals
+
+
 # ── Layer 1: Memory cache ──
+def estimate_size(data: dict) -> int:
+    """Approximate in-memory bytes of a cached result.
+
+    Measures a sample of evenly spaced rows (dict + keys + values) and
+    extrapolates, so cost is O(SIZE_SAMPLE_ROWS) regardless of row count.
+    Rows shared between per-agent slices and merged entries are counted in
+    each entry — the estimate errs on the high side.
+    """
+    rows = data.get("data")
+    size = sys.getsizeof(data)
+    if not isinstance(rows, list) or not rows:
+        return size
+    step = max(len(rows) // SIZE_SAMPLE_ROWS, 1)
+    sample = rows[::step][:SIZE_SAMPLE_ROWS]
+    sampled = 0
+    for row in sample:
+        sampled += sys.getsizeof(row)
+        if isinstance(row, dict):
+            sampled += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in row.items())
+    return size + sys.getsizeof(rows) + sampled * len(rows) // len(sample)
+
+
+# (endpoint, form_params, agent_id) — enough to refetch an entry without a request
+RequestOrigin = tuple[str, dict, int | None]
+
+
 @dataclass(slots=True)
 class CacheEntry:
     data: dict
     created_at: float
+    fresh_ttl: float = MEMORY_FRESH_TTL
+    max_stale_ttl: float = MEMORY_MAX_STALE_TTL
     hit_count: int = 0
+    size: int = 0
+    # column → row offsets sorted ascending; descending pages walk it backwards
+    sort_indexes: dict[str, array] = field(default_factory=dict)
+    totals: dict[str, float] | None = None  # column totals over all rows, built on first use
+    # Exponentially decayed hit count (see HIT_HALF_LIFE), kept across refreshes
+    score: float = 0.0
+    last_hit: float = 0.0
+    origin: RequestOrigin | None = None
+
+    def hit_score(self, now: float) -> float:
+        decay: float = 0.5 ** ((now - self.last_hit) / HIT_HALF_LIFE)
+        return self.score * decay
 
 
 class MemoryCache:
-    """LRU-bounded in-process cache with fresh/stale distinction.
+    """LRU in-process cache with fresh/stale distinction, bounded by bytes.
+
+    Entries are evicted least-recently-used first once the approximate byte
+    budget (``max_bytes``, see ``estimate_size``) or ``max_entries`` is
+    exceeded. An entry larger than the whole budget is not cached.
+    ``fresh_ttl`` / ``max_stale_ttl`` apply to entries stored without a
+    ``TTLPolicy`` of their own.
 
     WARNING: This is a per-process cache. When running multiple Uvicorn workers
     (e.g. ``--workers 4``), each worker maintains its own independent cache.
     This means cache hits are not shared across workers, leading to higher
     upstream traffic and inconsistent staleness between requests served by
     different workers. For multi-worker deployments, rely primarily on the
-    Redis layer (Layer 2) for shared caching.
+    Redis layer (Layer 2) for shared caching; upstream fetches are serialized
+    across workers by a Redis lease (see ``_acquire_lease``).
     """
 
     def __init__(
@@ -61,11 +253,18 @@ class MemoryCache:
         fresh_ttl: float = MEMORY_FRESH_TTL,
         max_stale_ttl: float = MEMORY_MAX_STALE_TTL,
         max_entries: int = MEMORY_MAX_ENTRIES,
+        max_bytes: int = MEMORY_MAX_BYTES,
     ):
         self._store: OrderedDict[str, CacheEntry] = OrderedDict()
         self._fresh_ttl = fresh_ttl
         self._max_stale_ttl = max_stale_ttl
         self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._evictions = 0
+        self._evicted_bytes = 0
+        self._expired = 0
+        self._rejected = 0
 
     def get(self, key: str) -> tuple[dict | None, bool]:
         """Returns (data, is_fresh). (None, False) on miss."""
@@ -74,38 +273,168 @@ class MemoryCache:
             return None, False
 
         age = time.monotonic() - entry.created_at
-        if age > self._max_stale_ttl:
-            del self._store[key]
+        if age > entry.max_stale_ttl:
+            self._remove(key)
+            self._expired += 1
             return None, False
 
         self._store.move_to_end(key)
+        now = time.monotonic()
         entry.hit_count += 1
-        return entry.data, age < self._fresh_ttl
+        entry.score = entry.hit_score(now) + 1
+        entry.last_hit = now
+        return entry.data, age < entry.fresh_ttl
+
+    def peek(self, key: str) -> tuple[dict | None, bool]:
+        """Like ``get``, without counting a hit, touching LRU order or expiring."""
+        entry = self._store.get(key)
+        if entry is None:
+            return None, False
+        age = time.monotonic() - entry.created_at
+        if age > entry.max_stale_ttl:
+            return None, False
+        return entry.data, age < entry.fresh_ttl
 
     def get_age(self, key: str) -> float:
         """Return age in seconds, or -1 on cache miss."""
         entry = self._store.get(key)
         return round(time.monotonic() - entry.created_at, 1) if entry else -1
 
-    def put(self, key: str, data: dict) -> None:
-        if key in self._store:
-            del self._store[key]
-        self._store[key] = CacheEntry(data=data, created_at=time.monotonic())
+    def put(
+        self,
+        key: str,
+        data: dict,
+        age: float = 0,
+        origin: RequestOrigin | None = None,
+        ttl: TTLPolicy | None = None,
+    ) -> None:
+        """Store *data*; *age* back-dates entries copied from a shared layer.
+
+        The hit score and *origin* of the entry being replaced carry over, so
+        a refresh does not reset how hot a key is.
+        """
+        previous = self._store.get(key)
+        self._remove(key)
+        size = estimate_size(data)
+        if size > self._max_bytes:
+            self._rejected += 1
+            logger.warning("SWR entry too large for memory budget: %s (%d bytes)", key, size)
+            return
+        entry = CacheEntry(
+            data=data,
+            created_at=time.monotonic() - age,
+            fresh_ttl=ttl.fresh if ttl else self._fresh_ttl,
+            max_stale_ttl=ttl.max_stale if ttl else self._max_stale_ttl,
+            size=size,
+            origin=origin,
+        )
+        if previous is not None:
+            entry.score, entry.last_hit = previous.score, previous.last_hit
+            entry.origin = origin or previous.origin
+        self._store[key] = entry
+        self._bytes += entry.size
         self._evict()
 
+    def sort_index(self, key: str, column: str, rows: list[dict]) -> array | None:
+        """Return (building on first use) the sort index of *column* for *key*.
+
+        The index is kept with the entry and counted in the byte budget,
+        unless entry and index together would exceed ``max_bytes``.
+
+        Returns None if *rows* is no longer the list cached under *key*, or if
+        the rows have no such column.
+        """
+        entry = self._store.get(key)
+        if entry is None or entry.data.get("data") is not rows or not rows:
+            return None
+        index = entry.sort_indexes.get(column)
+        if index is None:
+            if column not in rows[0]:
+                return None
+            index = build_sort_index(rows, column)
+            index_size = index.itemsize * len(index)
+            if entry.size + index_size > self._max_bytes:
+                return index  # used once, not kept: the entry would outgrow the whole budget
+            entry.sort_indexes[column] = index
+            entry.size += index_size
+            self._bytes += index_size
+            self._evict()
+        return index
+
+    def totals(self, key: str, rows: list[dict]) -> dict[str, float] | None:
+        """Return (computing on first use) the column totals of *key*'s rows.
+
+        Returns None if *rows* is no longer the list cached under *key*.
+        """
+        entry = self._store.get(key)
+        if entry is None or entry.data.get("data") is not rows:
+            return None
+        if entry.totals is None:
+            entry.totals = compute_totals(rows)
+        return entry.totals
+
+    def hot_keys(self, limit: int, lead_time: float | None = None) -> list[tuple[str, RequestOrigin]]:
+        """The *limit* hottest refetchable keys, then (if given) those due within *lead_time*.
+
+        Keys are ranked by decayed hit score; entries that were never hit or
+        have no recorded origin are skipped. An entry is due when it turns
+        stale within *lead_time* seconds (at most half its fresh TTL, so
+        short-lived entries are not refreshed on every pass).
+        """
+        now = time.monotonic()
+        ranked = sorted(
+            ((entry.hit_score(now), key, entry, origin) for key, entry in self._store.items()
+             if (origin := entry.origin) is not None and entry.score > 0),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        return [
+            (key, origin) for _, key, entry, origin in ranked[:limit]
+            if lead_time is None or entry.created_at + entry.fresh_ttl - now <= min(lead_time, entry.fresh_ttl / 2)
+        ]
+
+    def _remove(self, key: str) -> None:
+        entry = self._store.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
     def _evict(self) -> None:
-        while len(self._store) > self._max_entries:
-            self._store.popitem(last=False)
+        # Never evict the most recent entry — it is the one being served
+        while len(self._store) > 1 and (len(self._store) > self._max_entries or self._bytes > self._max_bytes):
+            _, entry = self._store.popitem(last=False)
+            self._bytes -= entry.size
+            self._evictions += 1
+            self._evicted_bytes += entry.size
 
     def clear(self) -> None:
         self._store.clear()
+        self._bytes = 0
 
     def stats(self) -> dict:
-        return {"entries": len(self._store), "max": self._max_entries}
+        return {
+            "entries": len(self._store),
+            "max": self._max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "evictions": self._evictions,
+            "evicted_bytes": self._evicted_bytes,
+            "expired": self._expired,
+            "rejected": self._rejected,
+        }
 
 
-# Module singleton
+# Module singletons
 _memory = MemoryCache()
+_shared: SharedCache | None = None
+if settings.PROXY_CACHE_SHM_DIR:
+    try:
+        _shared = SharedCache(
+            settings.PROXY_CACHE_SHM_DIR,
+            max_stale_ttl=MEMORY_MAX_STALE_TTL,
+            max_bytes=settings.PROXY_CACHE_SHM_MAX_BYTES,
+        )
+    except OSError:
+        logger.warning("Shared proxy cache disabled: %s", settings.PROXY_CACHE_SHM_DIR, exc_info=True)
 
 
 # ── Layer 2: Redis helpers ──
@@ -116,29 +445,558 @@ async def _redis_get(key: str) -> dict | None:
         raw = await redis_cache.client.get(key)
         if raw is None:
             return None
-        return json.loads(raw)
+        return await codec.decode_async(raw)
     except Exception:
         logger.warning("Redis GET failed: %s", key, exc_info=True)
         return None
 
 
-async def _redis_put(key: str, data: dict) -> None:
+async def _redis_age(key: str, ttl: TTLPolicy) -> float | None:
+    """Seconds since *key* was written, from its remaining expiry; None if unknown."""
+    if redis_cache.client is None:
+        return None
+    try:
+        remaining = await redis_cache.client.ttl(key)
+    except Exception:
+        logger.warning("Redis TTL failed: %s", key, exc_info=True)
+        return None
+    if not isinstance(remaining, int) or remaining < 0:
+        return None
+    return max(ttl.redis - remaining, 0)
+
+
+async def _redis_put(key: str, data: dict, ttl: TTLPolicy = DEFAULT_TTL) -> None:
     if redis_cache.client is None:
         return
     try:
-        serialized = json.dumps(data, ensure_ascii=False, default=str)
-        await redis_cache.client.set(key, serialized, ex=REDIS_TTL)
+        await redis_cache.client.set(key, await codec.encode_async(data), ex=int(ttl.redis))
     except Exception:
         logger.warning("Redis SET failed: %s", key, exc_info=True)
 
 
+async def _shared_get(key: str, origin: RequestOrigin | None = None) -> tuple[dict | None, bool]:
+    """Read *key* from the host-wide layer into memory, keeping its real age."""
+    if _shared is None:
+        return None, False
+    ttl = _origin_ttl(origin)
+    data, age = await _shared.get(key, max_stale_ttl=ttl.max_stale)
+    if data is None:
+        return None, False
+    _memory.put(key, data, age=age, origin=origin, ttl=ttl)
+    return data, age < ttl.fresh
+
+
+def _origin_ttl(origin: RequestOrigin | None) -> TTLPolicy:
+    return ttl_policy(origin[0], origin[1]) if origin else DEFAULT_TTL
+
+
+async def _write_through(key: str, data: dict, origin: RequestOrigin | None = None) -> None:
+    """Write *data* to every cache layer."""
+    ttl = _origin_ttl(origin)
+    _memory.put(key, data, origin=origin, ttl=ttl)
+    if _shared is not None:
+        await _shared.put(key, data)
+    await _redis_put(key, data, ttl)
+
+
+async def _store(key: str, result: dict, origin: RequestOrigin | None = None) -> None:
+    """Write a successful upstream result to all cache layers.
+
+    A partial result (some agents failed) is kept in this worker's memory
+    only, already due for revalidation, so the next hit retries the missing
+    agents instead of every worker serving the gap until it expires.
+    """
+    if result.get("code") != 0 or not result.get("data"):
+        return
+    if result.get("_partial"):
+        ttl = _origin_ttl(origin)
+        _memory.put(key, {**result}, age=ttl.fresh, origin=origin, ttl=ttl)
+        return
+    await _write_through(key, {**result}, origin)
+
+
+# ── Cross-worker lease ──
+# Compare-and-delete so a worker never releases a lease it no longer owns
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+async def _acquire_lease(key: str) -> str | None:
+    """Take the upstream lease for *key*.
+
+    Returns a lease token, or None if another worker already holds it.
+    Without Redis (or on Redis errors) every worker gets a token.
+    """
+    token = secrets.token_hex(8)
+    if redis_cache.client is None:
+        return token
+    try:
+        acquired = await redis_cache.client.set(f"{key}:lock", token, nx=True, ex=LEASE_TTL)
+    except Exception:
+        logger.warning("Redis lease acquire failed: %s", key, exc_info=True)
+        return token
+    return token if acquired else None
+
+
+_RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+async def _renew_lease(key: str, token: str) -> None:
+    """Keep the lease for *key* alive while its holder is still fetching.
+
+    Paged fetches may outlast ``LEASE_TTL``; the lease still expires that
+    long after a holder that died stops renewing it.
+    """
+    if redis_cache.client is None:
+        return
+    while True:
+        await asyncio.sleep(LEASE_TTL / 3)
+        try:
+            await redis_cache.client.eval(_RENEW_SCRIPT, 1, f"{key}:lock", token, LEASE_TTL)
+        except Exception:
+            logger.warning("Redis lease renewal failed: %s", key, exc_info=True)
+
+
+async def _release_lease(key: str, token: str) -> None:
+    if redis_cache.client is None:
+        return
+    try:
+        await redis_cache.client.eval(_RELEASE_SCRIPT, 1, f"{key}:lock", token)
+    except Exception:
+        logger.warning("Redis lease release failed: %s", key, exc_info=True)
+
+
+async def _wait_for_leader(key: str) -> dict | None:
+    """Poll until the lease is released or expires, then return its Redis entry.
+
+    The holder renews the lease while it fetches, so waiting normally ends
+    with the fetch; a holder that hangs is given up on after
+    ``LEASE_WAIT_TIMEOUT``. Returns None on timeout, on Redis errors, or if
+    the leader stored nothing (failed or empty fetch) — the caller then
+    fetches upstream itself.
+    """
+    client = redis_cache.client
+    if client is None:
+        return None
+    try:
+        async with asyncio.timeout(LEASE_WAIT_TIMEOUT):
+            while await client.exists(f"{key}:lock"):
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+        return await _redis_get(key)
+    except TimeoutError:
+        logger.warning("Lease holder of %s still fetching after %ss — fetching locally", key, LEASE_WAIT_TIMEOUT)
+    except Exception:
+        logger.warning("Redis lease wait failed: %s", key, exc_info=True)
+    return None
+
+
+# ── Per-agent slices ──
+# Each agent's rows are cached under make_cache_key(endpoint, agent.id, params)
+# — the same key a single-agent view uses — so refreshing the all-agents entry
+# only refetches agents whose slice is stale or missing.
+def _max_id(rows: list[dict]) -> int:
+    return max((int(r.get("id") or 0) for r in rows), default=0)
+
+
+def _merge_delta(old_rows: list[dict], new_rows: list[dict], watermark: int) -> list[dict] | None:
+    """Merge a newest-first delta page into a newest-first cached slice.
+
+    Rows in the delta replace cached rows down to the delta's oldest id (so
+    status changes on recent rows are picked up); older cached rows are kept.
+    Returns None when the delta page is full but never reaches *watermark* —
+    rows may be missing in between, so the caller must do a full fetch.
+    """
+    if not new_rows:
+        return old_rows
+    oldest_new = min(int(r.get("id") or 0) for r in new_rows)
+    if len(new_rows) >= DELTA_FETCH_LIMIT and oldest_new > watermark:
+        return None
+    merged = new_rows + [r for r in old_rows if int(r.get("id") or 0) < oldest_new]
+    return merged[:AGENT_MAX_ROWS]
+
+
+def _slice_entry(rows: list[dict]) -> dict:
+    return {"code": 0, "data": rows, "count": len(rows), "_max_id": _max_id(rows)}
+
+
+def _watermark(entry: dict | None) -> int:
+    if not entry or not entry.get("data"):
+        return 0
+    return entry.get("_max_id") or _max_id(entry["data"])
+
+
+async def _lookup_slices(
+    endpoint: str,
+    form_params: dict,
+    agents: list[Agent],
+) -> tuple[dict[int, list[dict]], dict[int, dict]]:
+    """Return (fresh rows, stale entries) by agent id; missing agents are in neither."""
+    fresh: dict[int, list[dict]] = {}
+    stale: dict[int, dict] = {}
+    for ag in agents:
+        slice_key = make_cache_key(endpoint, ag.id, form_params)
+        cached, is_fresh = _memory.peek(slice_key)
+        if cached is None:
+            cached, is_fresh = await _shared_get(slice_key, (endpoint, form_params, ag.id))
+        if cached is not None:
+            if is_fresh:
+                fresh[ag.id] = cached["data"]
+            else:
+                stale[ag.id] = cached
+    return fresh, stale
+
+
+async def _pull_slices(
+    db: AsyncSession,
+    endpoint: str,
+    form_params: dict,
+    agents: list[Agent],
+    previous: dict[int, dict],
+    delta: bool = True,
+) -> dict[int, list[dict] | None]:
+    """Fetch *agents*' slices from upstream. Returns ``{agent_id: rows}``, None for failed agents.
+
+    Slices of ``DELTA_ENDPOINTS`` with a *previous* entry only pull a small
+    newest-first page merged above its ``_max_id`` watermark; a delta that
+    leaves a gap is retried as a full fetch.
+    """
+    watermarks = {}
+    if delta and endpoint in DELTA_ENDPOINTS:
+        watermarks = {ag.id: _watermark(previous.get(ag.id)) for ag in agents}
+    delta_limits = {ag_id: DELTA_FETCH_LIMIT for ag_id, mark in watermarks.items() if mark}
+
+    fetched = await fetch_agents(db, endpoint, form_params, agents, delta_limits)
+
+    gaps = []
+    for ag_id, rows in fetched.items():
+        if rows is not None and ag_id in delta_limits:
+            fetched[ag_id] = rows = _merge_delta(previous[ag_id]["data"], rows, watermarks[ag_id])
+            if rows is None:
+                gaps.append(ag_id)
+    if gaps:
+        gap_agents = [ag for ag in agents if ag.id in gaps]
+        fetched.update(await _pull_slices(db, endpoint, form_params, gap_agents, previous, delta=False))
+    return fetched
+
+
+def _slice_result(agent: Agent, rows: list[dict] | None, previous: dict | None) -> dict:
+    """One agent's slice as a result; a failed agent keeps its last known rows, marked partial."""
+    if rows is not None:
+        return _slice_entry(rows)
+    return mark_partial(_slice_entry(previous["data"] if previous else []), [agent])
+
+
+async def _fetch_agent(db: AsyncSession, endpoint: str, form_params: dict, agent_id: int) -> dict:
+    """Fetch one agent's result — its cache slice, delta-refreshed like in ``_refresh_slices``."""
+    if endpoint not in UPSTREAM_PATHS:
+        return await fetch_all_agents(db, endpoint, form_params, agent_id)
+    agents = await get_active_agents(db, agent_id)
+    if not agents:
+        return {"code": 0, "msg": "No active agents", "data": [], "count": 0}
+    previous, _ = _memory.peek(make_cache_key(endpoint, agent_id, form_params))
+    pulled = await _pull_slices(db, endpoint, form_params, agents, {agent_id: previous} if previous else {})
+    return _slice_result(agents[0], pulled.get(agent_id), previous)
+
+
+async def _store_slice(
+    pull: asyncio.Future, key: str, agent: Agent, origin: RequestOrigin, previous: dict | None,
+) -> dict:
+    """Await *agent*'s part of a shared slice pull and cache it (empty slices too)."""
+    result = _slice_result(agent, (await pull).get(agent.id), previous)
+    if result.get("_partial"):
+        await _store(key, result, origin)
+    else:
+        await _write_through(key, result, origin)
+    return result
+
+
+async def _refresh_slices(
+    db: AsyncSession,
+    endpoint: str,
+    form_params: dict,
+    agents: list[Agent],
+    stale: dict[int, dict],
+) -> dict[int, list[dict]]:
+    """Refresh *agents*' slices and write them through all cache layers.
+
+    Each slice is a single-flight fetch under its own key: slices already in
+    flight (a single-agent view, warming) are joined, and the rest are pulled
+    together while registered in ``_inflight``, so those callers join this
+    fetch in turn. Failed agents keep their last known rows, if any.
+    """
+    keys = {ag.id: make_cache_key(endpoint, ag.id, form_params) for ag in agents}
+    tasks = {ag.id: _inflight[keys[ag.id]] for ag in agents if keys[ag.id] in _inflight}
+    to_pull = [ag for ag in agents if ag.id not in tasks]
+    if to_pull:
+        pull = asyncio.ensure_future(_pull_slices(db, endpoint, form_params, to_pull, stale))
+        for ag in to_pull:
+            store = _store_slice(pull, keys[ag.id], ag, (endpoint, form_params, ag.id), stale.get(ag.id))
+            tasks[ag.id] = _start_inflight(keys[ag.id], store)
+
+    results = await asyncio.gather(*(asyncio.shield(task) for task in tasks.values()), return_exceptions=True)
+    refreshed: dict[int, list[dict]] = {}
+    for ag_id, result in zip(tasks, results, strict=True):
+        if isinstance(result, BaseException):
+            logger.warning("Slice refresh failed: %s: %r", keys[ag_id], result)
+        elif result["data"] or not result.get("_partial"):
+            refreshed[ag_id] = result["data"]
+            continue
+        if ag_id in stale:
+            refreshed[ag_id] = stale[ag_id]["data"]
+    return refreshed
+
+
+async def _fetch_merged(db: AsyncSession, endpoint: str, form_params: dict) -> dict:
+    """Compose the all-agents result from per-agent slices."""
+    if endpoint not in UPSTREAM_PATHS:
+        return await fetch_all_agents(db, endpoint, form_params)
+
+    agents = await get_active_agents(db)
+    if not agents:
+        return {"code": 0, "msg": "No active agents", "data": [], "count": 0}
+
+    slices, stale = await _lookup_slices(endpoint, form_params, agents)
+    to_fetch = [ag for ag in agents if ag.id not in slices]
+    if to_fetch:
+        slices.update(await _refresh_slices(db, endpoint, form_params, to_fetch, stale))
+
+    merged = merge_agent_rows(slices[ag.id] for ag in agents if ag.id in slices)
+    return mark_partial(merged, (ag for ag in agents if ag.id not in slices))
+
+
+async def _fetch_remote(db: AsyncSession, endpoint: str, form_params: dict, agent_id: int | None) -> dict:
+    if agent_id:
+        return await _fetch_agent(db, endpoint, form_params, agent_id)
+    return await _fetch_merged(db, endpoint, form_params)
+
+
+async def _fetch_upstream(db: AsyncSession, endpoint: str, form_params: dict, agent_id: int | None) -> dict:
+    """Fetch a result from its sources.
+
+    Days synced for every requested agent are read from the local tables;
+    only the remaining sub-ranges (typically today) go upstream.
+    """
+    plan = await plan_query(db, endpoint, form_params, agent_id)
+    if plan is None:
+        return await _fetch_remote(db, endpoint, form_params, agent_id)
+    # Sequential: the sub-ranges share this task's DB session
+    remote = [await _fetch_remote(db, endpoint, params, agent_id) for params in plan.upstream]
+    return combine_results(endpoint, [plan.local, *remote])
+
+
+# ── Single-flight upstream fetch ──
+# Concurrent misses / _fresh requests for the same key await one shared task
+_inflight: dict[str, asyncio.Task] = {}
+
+
+async def _fetch_and_store(key: str, endpoint: str, form_params: dict, agent_id: int | None) -> dict:
+    """Fetch upstream with a dedicated DB session and write back to caches.
+
+    Uses its own session so the shared task never depends on the request
+    (and session) of whichever caller happened to start it. Only the worker
+    holding the Redis lease goes upstream; the others wait for its entry.
+    """
+    token = await _acquire_lease(key)
+    if token is None:
+        shared = await _wait_for_leader(key)
+        if shared is not None:
+            _memory.put(key, shared, origin=(endpoint, form_params, agent_id), ttl=ttl_policy(endpoint, form_params))
+            return shared
+
+    renewal = asyncio.create_task(_renew_lease(key, token)) if token is not None else None
+    try:
+        async with local_session() as db:
+            result = await _fetch_upstream(db, endpoint, form_params, agent_id)
+        await _store(key, result, (endpoint, form_params, agent_id))
+    finally:
+        if renewal is not None:
+            renewal.cancel()
+        if token is not None:
+            await _release_lease(key, token)
+    return result
+
+
+def _start_inflight(key: str, fetch: Coroutine[Any, Any, dict]) -> asyncio.Task:
+    task = asyncio.create_task(fetch)
+    _inflight[key] = task
+    task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return task
+
+
+async def _fetch_shared(key: str, endpoint: str, form_params: dict, agent_id: int | None) -> dict:
+    """Join the in-flight upstream fetch for *key*, starting one if needed."""
+    task = _inflight.get(key)
+    if task is None:
+        task = _start_inflight(key, _fetch_and_store(key, endpoint, dict(form_params), agent_id))
+    # shield: a cancelled caller must not cancel the fetch other callers await
+    return await asyncio.shield(task)
+
+
+# ── Background revalidation ──
+# One in-flight refresh task per cache key (strong refs keep tasks alive)
+_revalidating: dict[str, asyncio.Task] = {}
+
+
+async def _revalidate(key: str, endpoint: str, form_params: dict, agent_id: int | None) -> None:
+    """Refresh *key* in the background, sharing any in-flight upstream fetch."""
+    try:
+        await _fetch_shared(key, endpoint, form_params, agent_id)
+    except Exception:
+        logger.warning("SWR revalidation failed: %s", key, exc_info=True)
+    finally:
+        _revalidating.pop(key, None)
+
+
+def _schedule_revalidation(key: str, endpoint: str, form_params: dict, agent_id: int | None) -> None:
+    """Start a background refresh for *key* unless one is already running."""
+    if key in _revalidating or key in _inflight:
+        return
+    _revalidating[key] = asyncio.create_task(_revalidate(key, endpoint, dict(form_params), agent_id))
+
+
+# ── Predictive warming (driven by warmer.py) ──
+def hot_keys(limit: int, lead_time: float | None = None) -> list[tuple[str, RequestOrigin]]:
+    """Hottest memory keys by recent hit rate that turn stale within *lead_time*."""
+    return _memory.hot_keys(limit, lead_time)
+
+
+async def warm_key(key: str, origin: RequestOrigin) -> bool:
+    """Refresh *key* ahead of expiry. False if a refresh is already running."""
+    if key in _revalidating or key in _inflight:
+        return False
+    endpoint, form_params, agent_id = origin
+    await _fetch_shared(key, endpoint, form_params, agent_id)
+    return True
+
+
+# ── In-memory filtering ──
+def _filter_rows(rows: list[dict], filters: dict[str, str]) -> list[dict] | None:
+    """Apply equality / case-insensitive substring filters to *rows*.
+
+    Equality compares as strings, as the form sends values. Returns None if
+    the rows lack a filtered column (filter must go upstream).
+    """
+    if rows and any(name not in rows[0] for name in filters):
+        return None
+    exact = {k: v for k, v in filters.items() if k not in SUBSTRING_FILTER_FIELDS}
+    like = {k: v.casefold() for k, v in filters.items() if k in SUBSTRING_FILTER_FIELDS}
+    return [
+        row for row in rows
+        if all(str(row.get(k)) == v for k, v in exact.items())
+        and all(v in str(row.get(k) or "").casefold() for k, v in like.items())
+    ]
+
+
+def _find_superset(
+    endpoint: str,
+    agent_id: int | None,
+    form_params: dict,
+) -> tuple[str, dict, dict, bool] | None:
+    """Find a memory entry for the same request with fewer filters.
+
+    Tries the narrowest supersets first (fewest dropped filters). Candidates
+    are peeked, so probing does not make them look hot or recently used.
+    Returns ``(superset_key, superset_params, filtered_result, is_fresh)`` or None.
+    """
+    fields = MEMORY_FILTER_FIELDS.get(endpoint, set())
+    filters = {k: v for k, v in form_params.items() if k in fields and v}
+    names = sorted(filters)
+    for drop_count in range(1, len(names) + 1):
+        for dropped in itertools.combinations(names, drop_count):
+            base_params = {k: v for k, v in form_params.items() if k not in dropped}
+            base_key = make_cache_key(endpoint, agent_id, base_params)
+            data, is_fresh = _memory.peek(base_key)
+            if data is None:
+                continue
+            rows = _filter_rows(data.get("data", []), {k: filters[k] for k in dropped})
+            if rows is None:
+                continue
+            return base_key, base_params, {**data, "data": rows, "count": len(rows)}, is_fresh
+    return None
+
+
 # ── Pagination helper ──
-def _paginate(result: dict, page: int, limit: int) -> dict:
-    """Apply server-side pagination to a cached/fetched result."""
+def _pop_sort(endpoint: str, form_params: dict) -> tuple[str, bool] | None:
+    """Extract ``(column, descending)`` from Layui column sort or the sort form.
+
+    A sort on one of the endpoint's ``INDEXED_SORT_COLUMNS`` is served from
+    the cache entry's index, so its params are removed from the cache key and
+    never forwarded upstream. Any other sort is left in *form_params* (and
+    None returned) so upstream applies it and it gets its own cache entry.
+    """
+    column = form_params.get("sort_field")
+    direction = form_params.get("sort_direction", "desc")
+    if form_params.get("field"):
+        column, direction = form_params["field"], form_params.get("order") or "desc"
+    if not column or column not in INDEXED_SORT_COLUMNS.get(endpoint, ()):
+        return None
+    for name in ("sort_field", "sort_direction", "field", "order"):
+        form_params.pop(name, None)
+    return column, direction != "asc"
+
+
+def _paginate(
+    result: dict,
+    page: int,
+    limit: int,
+    key: str | None = None,
+    sort: tuple[str, bool] | None = None,
+) -> dict:
+    """Apply server-side pagination (and optional sort) to a cached/fetched result.
+
+    Sorted pages read ``limit`` offsets from the entry's sort index instead of
+    re-sorting the merged rows.
+    """
     data = result.get("data", [])
     start = (page - 1) * limit
-    paged = data[start : start + limit]
-    return {**result, "data": paged}
+    if sort is None or not data:
+        return {**result, "data": data[start : start + limit]}
+
+    column, descending = sort
+    index = _memory.sort_index(key, column, data) if key else None
+    if index is None:
+        if column not in data[0]:
+            return {**result, "data": data[start : start + limit]}
+        index = build_sort_index(data, column)
+    if descending:
+        end = len(index) - start
+        offsets = index[max(end - limit, 0) : max(end, 0)][::-1]
+    else:
+        offsets = index[start : start + limit]
+    return {**result, "data": [data[i] for i in offsets]}
+
+
+def _entry_totals(result: dict, key: str | None) -> dict[str, float]:
+    rows = result.get("data") or []
+    totals = _memory.totals(key, rows) if key else None
+    return totals if totals is not None else compute_totals(rows)
+
+
+def _respond(
+    result: dict,
+    page: int,
+    limit: int,
+    key: str | None,
+    sort: tuple[str, bool] | None,
+    status: str,
+    age: float,
+    with_totals: bool = False,
+) -> dict:
+    response = _paginate(result, page, limit, key, sort)
+    response["_cache_status"] = status
+    response["_cache_age"] = age
+    if with_totals and result.get("code") == 0 and result.get("data"):
+        response["_totals"] = _entry_totals(result, key)
+    return response
 
 
 # ── SWR orchestrator ──
@@ -148,57 +1006,78 @@ async def swr_fetch(
     form_params: dict,
     agent_id: int | None = None,
     force_fresh: bool = False,
+    with_totals: bool = False,
 ) -> dict:
     """3-layer SWR cache. Returns response with _cache_status metadata.
 
-    Pagination (page/limit) is applied AFTER cache lookup so all pages
-    share a single cache entry containing ALL merged agent data.
+    Pagination (page/limit) and sorting are applied AFTER cache lookup so all
+    pages and sort orders share a single cache entry containing ALL merged
+    agent data.
+    Serving a stale entry schedules a background revalidation of that key;
+    concurrent upstream fetches for the same key are coalesced into one.
+    Filtered requests are answered from a cached entry with fewer filters
+    when one is in memory. *with_totals* adds ``_totals`` over all rows of
+    the entry (computed once per cached entry).
     """
     # Extract pagination — cache key excludes page/limit
     page = int(form_params.pop("page", 1) or 1)
     limit = int(form_params.pop("limit", 10) or 10)
+    sort = _pop_sort(endpoint, form_params)
 
     key = make_cache_key(endpoint, agent_id, form_params)
 
-    # Force fresh — bypass all caches
+    # Force fresh — bypass all caches (but join an in-flight fetch for this key)
     if force_fresh:
-        result = await fetch_all_agents(db, endpoint, form_params, agent_id)
-        if result.get("code") == 0 and result.get("data"):
-            _memory.put(key, {**result})
-            await _redis_put(key, {**result})
-        response = _paginate(result, page, limit)
-        response["_cache_status"] = "miss"
-        response["_cache_age"] = 0
-        return response
+        result = await _fetch_shared(key, endpoint, form_params, agent_id)
+        return _respond(result, page, limit, key, sort, "miss", 0, with_totals)
 
     # Layer 1: Memory
     data, is_fresh = _memory.get(key)
     if data is not None:
-        response = _paginate(data, page, limit)
-        response["_cache_status"] = "fresh" if is_fresh else "stale"
-        response["_cache_age"] = _memory.get_age(key)
-        return response
+        if not is_fresh:
+            _schedule_revalidation(key, endpoint, form_params, agent_id)
+        status = "fresh" if is_fresh else "stale"
+        return _respond(data, page, limit, key, sort, status, _memory.get_age(key), with_totals)
+
+    # Layer 1b: Memory superset — same request with fewer filters, filtered here
+    superset = _find_superset(endpoint, agent_id, form_params)
+    if superset is not None:
+        base_key, base_params, filtered, is_fresh = superset
+        if not is_fresh:
+            _schedule_revalidation(base_key, endpoint, base_params, agent_id)
+        status = "fresh" if is_fresh else "stale"
+        return _respond(filtered, page, limit, None, sort, status, _memory.get_age(base_key), with_totals)
+
+    # Layer 1.5: Host-wide shared cache — keeps the entry's real age
+    data, is_fresh = await _shared_get(key, (endpoint, dict(form_params), agent_id))
+    if data is not None:
+        if not is_fresh:
+            _schedule_revalidation(key, endpoint, form_params, agent_id)
+        status = "fresh" if is_fresh else "stale"
+        return _respond(data, page, limit, key, sort, status, _memory.get_age(key), with_totals)
 
-    # Layer 2: Redis — data was not in memory, so treat as stale
+    # Layer 2: Redis — aged by the key's remaining expiry; stale if that is unknown
     data = await _redis_get(key)
     if data is not None:
-        _memory.put(key, data)
-        response = _paginate(data, page, limit)
-        response["_cache_status"] = "stale"
-        response["_cache_age"] = _memory.get_age(key)
-        return response
-
-    # Layer 3: Upstream fetch
-    result = await fetch_all_agents(db, endpoint, form_params, agent_id)
-    if result.get("code") == 0 and result.get("data"):
-        _memory.put(key, {**result})
-        await _redis_put(key, {**result})
-
-    response = _paginate(result, page, limit)
-    response["_cache_status"] = "miss"
-    response["_cache_age"] = 0
-    return response
+        ttl = ttl_policy(endpoint, form_params)
+        age = await _redis_age(key, ttl)
+        is_fresh = age is not None and age < ttl.fresh
+        origin = (endpoint, dict(form_params), agent_id)
+        _memory.put(key, data, age=ttl.fresh if age is None else age, origin=origin, ttl=ttl)
+        if not is_fresh:
+            _schedule_revalidation(key, endpoint, form_params, agent_id)
+        status = "fresh" if is_fresh else "stale"
+        return _respond(data, page, limit, key, sort, status, _memory.get_age(key), with_totals)
+
+    # Layer 3: Upstream fetch — single-flight per key
+    result = await _fetch_shared(key, endpoint, form_params, agent_id)
+    return _respond(result, page, limit, key, sort, "miss", 0, with_totals)
 
 
 def get_cache_stats() -> dict:
-    return _memory.stats()
+    return {
+        **_memory.stats(),
+        "revalidating": len(_revalidating),
+        "inflight": len(_inflight),
+        "shared": _shared.stats() if _shared is not None else None,
+    }
@@ -0,0 +1,93 @@
+"""Predictive warming for the proxy SWR cache.
+
+Every ``WARM_INTERVAL`` seconds the hottest memory entries (ranked by their
+decayed hit score, see ``swr.HIT_HALF_LIFE``) that are about to turn stale
+are refetched in the background, so users of popular views keep getting
+fresh hits instead of a stale answer followed by a revalidation.
+
+Refreshes go through the normal single-flight path (and Redis lease), so a
+warmed key never races a user-triggered fetch. An agent's key is its cache
+slice, refreshed as the all-agents fan-out does (delta pages above the
+slice's ``_max_id``, one in-flight fetch per slice key). Each agent gets at
+most ``WARM_AGENT_CONCURRENCY`` warming fetches at once; all-agents keys
+share one budget, since their fan-out already touches every agent.
+"""
+
+import asyncio
+import contextlib
+
+import structlog
+
+from ....core.config import settings
+from . import swr
+
+logger = structlog.get_logger(__name__)
+
+WARM_TOP_N = settings.PROXY_CACHE_WARM_TOP_N
+WARM_INTERVAL = 30          # seconds between warming passes
+WARM_LEAD_TIME = 60         # seconds before its fresh TTL runs out that a hot key is refreshed
+WARM_AGENT_CONCURRENCY = 2  # concurrent warming fetches per agent
+
+_ALL_AGENTS = 0
+
+_task: asyncio.Task | None = None
+_agent_slots: dict[int, asyncio.Semaphore] = {}
+_stats = {"passes": 0, "warmed": 0, "skipped": 0, "failed": 0}
+
+
+async def _warm(key: str, origin: swr.RequestOrigin) -> None:
+    agent_id = origin[2] or _ALL_AGENTS
+    slot = _agent_slots.get(agent_id)
+    if slot is None:
+        slot = _agent_slots[agent_id] = asyncio.Semaphore(WARM_AGENT_CONCURRENCY)
+    async with slot:
+        try:
+            warmed = await swr.warm_key(key, origin)
+        except Exception:
+            _stats["failed"] += 1
+            logger.warning("Cache warming failed: %s", key, exc_info=True)
+            return
+    _stats["warmed" if warmed else "skipped"] += 1
+
+
+async def warm_once(top_n: int = WARM_TOP_N) -> int:
+    """Refresh the hottest keys that turn stale within ``WARM_LEAD_TIME``.
+
+    Returns the number of keys that were due.
+    """
+    due = swr.hot_keys(top_n, lead_time=WARM_LEAD_TIME)
+    _stats["passes"] += 1
+    if due:
+        await asyncio.gather(*(_warm(key, origin) for key, origin in due))
+    return len(due)
+
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(WARM_INTERVAL)
+        try:
+            await warm_once()
+        except Exception:
+            logger.warning("Cache warming pass failed", exc_info=True)
+
+
+def start_cache_warmer() -> None:
+    """Start the background warming loop (no-op if disabled or running)."""
+    global _task
+    if WARM_TOP_N <= 0 or _task is not None:
+        return
+    _task = asyncio.create_task(_run())
+
+
+async def stop_cache_warmer() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _task
+    _task = None
+
+
+def get_warmer_stats() -> dict:
+    return {**_stats, "enabled": WARM_TOP_N > 0, "running": _task is not None}
@@ -60,3 +60,4 @@ class DepositWithdrawal(Base):
     review_time: Mapped[datetime | None] = mapped_column(DateTime, default=None)
     transfer_record: Mapped[str | None] = mapped_column(Text, default=None)
     currency: Mapped[int] = mapped_column(SmallInteger, default=1)
+    user_parent_format: Mapped[str | None] = mapped_column(String(50), default=None)
@@ -1,6 +1,18 @@
+import datetime as dt
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, SmallInteger, String, Text, UniqueConstraint
+from sqlalchemy import (
+    Boolean,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -30,3 +42,43 @@ class SyncMetadata(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default_factory=lambda: datetime.now(APP_TZ)
     )
+
+
+class SyncJob(Base):
+    """A server-side sync run; its work is queued as ``SyncTask`` rows."""
+
+    __tablename__ = "sync_jobs"
+
+    id: Mapped[str] = mapped_column(String(16), primary_key=True)
+    endpoints: Mapped[list] = mapped_column(JSONB)
+    agent_ids: Mapped[list] = mapped_column(JSONB)
+    full: Mapped[bool] = mapped_column(Boolean, default=False)
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default_factory=lambda: datetime.now(APP_TZ)
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+
+
+class SyncTask(Base):
+    """One work unit of a sync job: one endpoint of one agent for one day."""
+
+    __tablename__ = "sync_tasks"
+    __table_args__ = (
+        UniqueConstraint("job_id", "agent_id", "endpoint", "day", name="uq_sync_task"),
+        Index("idx_sync_tasks_status", "status", "run_after"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True, init=False)
+    job_id: Mapped[str] = mapped_column(String(16), ForeignKey("sync_jobs.id", ondelete="CASCADE"))
+    agent_id: Mapped[int] = mapped_column(SmallInteger, ForeignKey("agents.id"))
+    endpoint: Mapped[str] = mapped_column(String(50))
+    day: Mapped[dt.date | None] = mapped_column(Date, default=None)  # None: endpoint has no date range
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    attempts: Mapped[int] = mapped_column(SmallInteger, default=0)
+    rows: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(Text, default=None)
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default_factory=lambda: datetime.now(APP_TZ)
+    )
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
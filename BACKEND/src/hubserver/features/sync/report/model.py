@@ -31,6 +31,7 @@ class ReportLottery(Base):
     result: Mapped[Decimal] = mapped_column(Numeric(15, 4), default=Decimal("0"))
     win_lose: Mapped[Decimal] = mapped_column(Numeric(15, 4), default=Decimal("0"))
     prize: Mapped[Decimal] = mapped_column(Numeric(15, 4), default=Decimal("0"))
+    user_parent_format: Mapped[str | None] = mapped_column(String(50), default=None)
     synced_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default_factory=lambda: datetime.now(APP_TZ)
     )
@@ -60,6 +61,7 @@ class ReportFunds(Base):
     promotion: Mapped[Decimal] = mapped_column(Numeric(15, 4), default=Decimal("0"))
     third_rebate: Mapped[Decimal] = mapped_column(Numeric(15, 4), default=Decimal("0"))
     third_activity_amount: Mapped[Decimal] = mapped_column(Numeric(15, 4), default=Decimal("0"))
+    user_parent_format: Mapped[str | None] = mapped_column(String(50), default=None)
     synced_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default_factory=lambda: datetime.now(APP_TZ)
     )
@@ -3,7 +3,7 @@
 from typing import Any
 
 from fastapi import APIRouter, Depends
-from ...core.exceptions.http_exceptions import NotFoundException
+from ...core.exceptions.http_exceptions import BadRequestException, DuplicateValueException, NotFoundException
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
 from sqlalchemy import select
@@ -17,6 +17,17 @@ from .bet.model import BetLottery, BetOrder
 from .bet.router import router as bet_router
 from .config.model import BankList, InviteList, LotteryGame, LotterySeries
 from .crud import crud_sync_metadata
+from .engine.orchestrator import (
+    SYNC_ORDER,
+    SYNC_TARGETS,
+    SyncJobConflict,
+    cancel_job,
+    get_job,
+    job_summary,
+    list_jobs,
+    start_job,
+)
+from .engine.proxy import get_active_agents
 from .engine.router import router as engine_router
 from .finance.model import DepositWithdrawal
 from .finance.router import router as finance_router
@@ -24,7 +35,7 @@ from .member.model import Member
 from .member.router import router as member_router
 from .report.model import ReportFunds, ReportLottery, ReportThirdGame
 from .report.router import router as report_router
-from .schema import SyncConfigRequest, SyncResponse, SyncStatusResponse, VerifyRequest
+from .schema import SyncConfigRequest, SyncJobRequest, SyncResponse, SyncStatusResponse, VerifyRequest
 from .service import fetch_records_by_ids
 
 router = APIRouter(
@@ -123,6 +134,50 @@ async def get_sync_status(db: AsyncSession = Depends(async_get_db)):
     return SyncStatusResponse(endpoints=endpoints)
 
 
+# --- Server-side sync jobs ---
+@router.post("/jobs")
+async def create_sync_job(body: SyncJobRequest, db: AsyncSession = Depends(async_get_db)) -> dict:
+    """Queue pulling upstream into the local tables; background workers run it.
+
+    Poll ``GET /sync/jobs/{job_id}`` for progress; ``full`` re-syncs the whole
+    lookback period instead of continuing from the last synced day.
+    """
+    endpoints = body.endpoints or list(SYNC_ORDER)
+    unknown = [ep for ep in endpoints if ep not in SYNC_TARGETS]
+    if unknown:
+        raise BadRequestException(f"Unknown sync endpoints: {', '.join(unknown)}")
+    agents = await get_active_agents(db, body.agent_id)
+    if not agents:
+        raise NotFoundException("No active agents")
+    try:
+        job = await start_job(db, endpoints, [ag.id for ag in agents], body.full)
+    except SyncJobConflict:
+        raise DuplicateValueException("A sync job is already running") from None
+    return await job_summary(db, job)
+
+
+@router.get("/jobs")
+async def list_sync_jobs(db: AsyncSession = Depends(async_get_db)) -> dict:
+    return {"jobs": [await job_summary(db, job, detail=False) for job in await list_jobs(db)]}
+
+
+@router.get("/jobs/{job_id}")
+async def get_sync_job(job_id: str, db: AsyncSession = Depends(async_get_db)) -> dict:
+    job = await get_job(db, job_id)
+    if job is None:
+        raise NotFoundException(f"Sync job '{job_id}' not found")
+    return await job_summary(db, job)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_sync_job(job_id: str, db: AsyncSession = Depends(async_get_db)) -> dict:
+    job = await get_job(db, job_id)
+    if job is None:
+        raise NotFoundException(f"Sync job '{job_id}' not found")
+    await cancel_job(db, job)
+    return await job_summary(db, job)
+
+
 # --- Include sub-routers ---
 router.include_router(member_router)
 router.include_router(bet_router)
@@ -32,6 +32,13 @@ class SyncStatusResponse(BaseModel):
     endpoints: list[dict[str, Any]]
 
 
+class SyncJobRequest(BaseModel):
+    """Start a server-side sync job; omitted endpoints / agent mean all of them."""
+    endpoints: list[str] | None = None
+    agent_id: int | None = None
+    full: bool = False
+
+
 class VerifyRequest(BaseModel):
     """Verify request with list of IDs to check."""
     ids: list[int]
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio.session import AsyncSession
 
 from ...core.config import APP_TZ
 from .crud import crud_sync_metadata
+from .schema import SyncMetadataCreateInternal
 
 # Date field per endpoint (for tracking last synced data date)
 DATE_FIELDS: dict[str, str] = {
@@ -29,8 +30,15 @@ async def update_sync_meta(
     count: int,
     records: list[dict] | None = None,
     status: str = "completed",
+    error: str | None = None,
+    params: dict | None = None,
 ) -> str | None:
-    """Update sync metadata. Returns last_data_date if detected."""
+    """Update sync metadata. Returns last_data_date if detected.
+
+    *error* is stored as ``error_message`` (cleared on a successful update);
+    *params* are merged into ``sync_params`` as is (the sync queue's
+    checkpoint and coverage).
+    """
     now = datetime.now(APP_TZ)
     last_data_date = None
 
@@ -50,6 +58,8 @@ async def update_sync_meta(
                 "date_field": date_field,
                 "record_count": count,
             }
+    if params:
+        sync_params.update(params)
 
     meta = await crud_sync_metadata.get(db=db, agent_id=agent_id, endpoint=endpoint)
     if meta:
@@ -57,12 +67,17 @@ async def update_sync_meta(
             "last_sync_at": now,
             "last_sync_count": count,
             "sync_status": status,
+            "error_message": error,
             "updated_at": now,
         }
         if sync_params:
-            existing = meta.sync_params or {}
-            existing.update(sync_params)
-            update_data["sync_params"] = existing
+            existing = meta.get("sync_params") or {}
+            # Batches arrive in any order — keep the widest synced span
+            if existing.get("first_data_date") and sync_params.get("first_data_date"):
+                sync_params["first_data_date"] = min(existing["first_data_date"], sync_params["first_data_date"])
+            if existing.get("last_data_date") and sync_params.get("last_data_date"):
+                sync_params["last_data_date"] = max(existing["last_data_date"], sync_params["last_data_date"])
+            update_data["sync_params"] = {**existing, **sync_params}
         await crud_sync_metadata.update(
             db=db, object=update_data, agent_id=agent_id, endpoint=endpoint,
         )
@@ -75,12 +90,36 @@ async def update_sync_meta(
                 "last_sync_at": now,
                 "last_sync_count": count,
                 "sync_status": status,
+                "error_message": error,
                 "sync_params": sync_params or None,
             },
         )
     return last_data_date
 
 
+async def record_sync_error(db: AsyncSession, agent_id: int, endpoint: str, error: str) -> None:
+    """Mark a sync as failed with *error*.
+
+    Unlike ``update_sync_meta`` this leaves ``last_sync_at`` and
+    ``sync_params`` alone, so a failure never counts as a sync.
+    """
+    meta = await crud_sync_metadata.get(db=db, agent_id=agent_id, endpoint=endpoint)
+    if meta:
+        await crud_sync_metadata.update(
+            db=db,
+            object={"sync_status": "error", "error_message": error, "updated_at": datetime.now(APP_TZ)},
+            agent_id=agent_id,
+            endpoint=endpoint,
+        )
+    else:
+        await crud_sync_metadata.create(
+            db=db,
+            object=SyncMetadataCreateInternal(
+                agent_id=agent_id, endpoint=endpoint, sync_status="error", error_message=error,
+            ),
+        )
+
+
 async def fetch_records_by_ids(db: AsyncSession, model: type, ids: list[int]) -> list[dict]:
     """Fetch DB records by IDs and serialize to JSON-safe dicts."""
     table = model.__table__
@@ -0,0 +1,76 @@
+"""Tạo bảng sync_jobs và sync_tasks cho hàng đợi đồng bộ phía server.
+
+Revision ID: 008_sync_queue
+Revises: 007_hub_users
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision = "008_sync_queue"
+down_revision = "007_hub_users"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_jobs",
+        sa.Column("id", sa.String(16), primary_key=True),
+        sa.Column("endpoints", JSONB, nullable=False),
+        sa.Column("agent_ids", JSONB, nullable=False),
+        sa.Column("full", sa.Boolean, nullable=False, server_default="false"),
+        sa.Column(
+            "status",
+            sa.String(20),
+            nullable=False,
+            server_default="pending",
+            comment="pending | running | completed | failed | cancelled",
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+        ),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.create_table(
+        "sync_tasks",
+        sa.Column("id", sa.Integer, autoincrement=True, primary_key=True),
+        sa.Column(
+            "job_id",
+            sa.String(16),
+            sa.ForeignKey("sync_jobs.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("agent_id", sa.SmallInteger, sa.ForeignKey("agents.id"), nullable=False),
+        sa.Column("endpoint", sa.String(50), nullable=False),
+        sa.Column("day", sa.Date, nullable=True, comment="NULL: endpoint không lọc theo ngày"),
+        sa.Column(
+            "status",
+            sa.String(20),
+            nullable=False,
+            server_default="pending",
+            comment="pending | running | completed | failed | skipped | cancelled",
+        ),
+        sa.Column("attempts", sa.SmallInteger, nullable=False, server_default="0"),
+        sa.Column("rows", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("error", sa.Text, nullable=True),
+        sa.Column(
+            "run_after",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+        ),
+        sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("job_id", "agent_id", "endpoint", "day", name="uq_sync_task"),
+    )
+    op.create_index("idx_sync_tasks_status", "sync_tasks", ["status", "run_after"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_sync_tasks_status", "sync_tasks")
+    op.drop_table("sync_tasks")
+    op.drop_table("sync_jobs")
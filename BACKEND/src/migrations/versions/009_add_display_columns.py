@@ -0,0 +1,38 @@
+"""Thêm các cột hiển thị của upstream vào bảng đồng bộ.
+
+Proxy trả dữ liệu từ bảng local cho các ngày đã đồng bộ; các cột này giúp
+dòng local có đủ trường như dòng upstream (tên cách chơi, trạng thái, đại lý).
+
+Revision ID: 009_display_columns
+Revises: 008_sync_queue
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "009_display_columns"
+down_revision = "008_sync_queue"
+
+_COLUMNS = {
+    "bet_lottery": (
+        ("play_type_name", sa.String(100)),
+        ("play_name", sa.String(100)),
+        ("status_text", sa.String(50)),
+    ),
+    "report_lottery": (("user_parent_format", sa.String(50)),),
+    "report_funds": (("user_parent_format", sa.String(50)),),
+    "deposit_withdrawal": (("user_parent_format", sa.String(50)),),
+}
+
+
+def upgrade() -> None:
+    for table, columns in _COLUMNS.items():
+        for name, type_ in columns:
+            op.add_column(table, sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    for table, columns in _COLUMNS.items():
+        for name, _ in columns:
+            op.drop_column(table, name)
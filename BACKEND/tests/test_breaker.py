@@ -0,0 +1,115 @@
+"""Unit tests for the per-agent upstream circuit breaker."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.hubserver.features.sync.engine import breaker, proxy
+
+_PATCH_BASE = "src.hubserver.features.sync.engine.breaker"
+
+
+@pytest.fixture(autouse=True)
+def clock():
+    """Isolate breaker state and control ``time.monotonic``."""
+    breaker._health.clear()
+    with patch(f"{_PATCH_BASE}.time.monotonic", return_value=1000.0) as monotonic:
+        yield monotonic
+    breaker._health.clear()
+
+
+def _fail(agent_id: int, times: int) -> None:
+    for _ in range(times):
+        breaker.record(agent_id, False, 1.0)
+
+
+class TestCircuitBreaker:
+    """Failing agents are skipped until a probe succeeds."""
+
+    def test_opens_on_failure_rate(self):
+        breaker.record(1, True, 0.1)
+        _fail(1, 3)
+        assert breaker.allow(1)
+
+        _fail(1, 1)
+
+        assert not breaker.allow(1)
+        assert breaker.get_breaker_stats()["1"]["state"] == breaker.OPEN
+        assert breaker.health_score(1) == 0.0
+
+    def test_half_open_lets_one_probe_through(self, clock):
+        _fail(1, breaker.BREAKER_MIN_CALLS)
+        clock.return_value += breaker.BREAKER_COOLDOWN
+
+        assert breaker.allow(1)
+        assert not breaker.allow(1)
+
+    def test_successful_probe_closes(self, clock):
+        _fail(1, breaker.BREAKER_MIN_CALLS)
+        clock.return_value += breaker.BREAKER_COOLDOWN
+        breaker.allow(1)
+
+        breaker.record(1, True, 0.2)
+
+        assert breaker.allow(1)
+        assert breaker.get_breaker_stats()["1"]["state"] == breaker.CLOSED
+
+    def test_failed_probe_reopens(self, clock):
+        _fail(1, breaker.BREAKER_MIN_CALLS)
+        clock.return_value += breaker.BREAKER_COOLDOWN
+        breaker.allow(1)
+
+        _fail(1, 1)
+
+        assert not breaker.allow(1)
+        clock.return_value += breaker.BREAKER_COOLDOWN - 1
+        assert not breaker.allow(1)
+
+    def test_straggler_does_not_close_open_breaker(self):
+        _fail(1, breaker.BREAKER_MIN_CALLS)
+
+        breaker.record(1, True, 0.1)
+
+        assert not breaker.allow(1)
+
+    def test_health_reflects_latency(self):
+        breaker.record(1, True, 0.0)
+        breaker.record(2, True, breaker.PROBE_TIMEOUT)
+
+        assert breaker.health_score(1) == 1.0
+        assert breaker.health_score(2) == 0.5
+        assert breaker.health_score(3) == 1.0
+
+
+class TestFanOutSkipsOpenAgents:
+    """The fan-out neither contacts nor re-logs an agent whose breaker is open."""
+
+    @pytest.mark.asyncio
+    async def test_open_agent_reported_failed(self, mock_db):
+        agents = [MagicMock(id=1, owner="a1", password_enc=None), MagicMock(id=2, owner="a2", password_enc="x")]
+        _fail(2, breaker.BREAKER_MIN_CALLS)
+
+        with (
+            patch.object(proxy, "get_client", new=AsyncMock()),
+            patch.object(proxy, "ensure_sessions", new=AsyncMock()) as mock_sessions,
+            patch.object(proxy, "_fetch_one", new=AsyncMock(return_value=(agents[0], {"code": 0, "data": []}))),
+        ):
+            results = await proxy.fetch_agents(mock_db, "bets", {}, agents)
+
+        assert results == {1: [], 2: None}
+        assert mock_sessions.await_args.args[1] == [agents[0]]
+
+    @pytest.mark.asyncio
+    async def test_policy_without_breaker_contacts_open_agents(self, mock_db):
+        agent = MagicMock(id=2, owner="a2", password_enc=None)
+        _fail(2, breaker.BREAKER_MIN_CALLS)
+        policy = proxy.FetchPolicy(timeout=1, hedge_delay=0, breaker=False)
+
+        with (
+            patch.object(proxy, "get_client", new=AsyncMock()),
+            patch.object(proxy, "ensure_sessions", new=AsyncMock()),
+            patch.object(proxy, "_fetch_one", new=AsyncMock(return_value=(agent, {"code": 0, "data": []}))),
+        ):
+            results = await proxy.fetch_agents(mock_db, "bets", {}, [agent], policy=policy)
+
+        assert results == {2: []}
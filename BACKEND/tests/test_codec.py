@@ -0,0 +1,72 @@
+"""Unit tests for the proxy cache codec."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.hubserver.features.sync.engine import codec
+
+_ROWS = {"code": 0, "data": [{"id": i, "username": f"người_dùng_{i}", "money": "12.50"} for i in range(500)]}
+
+
+class TestCodec:
+    """Versioned encode/decode of cache payloads."""
+
+    def test_large_payload_is_compressed(self):
+        raw = codec.encode(_ROWS)
+
+        assert raw[0] == codec.VERSION_ZLIB_JSON
+        assert len(raw) < len(json.dumps(_ROWS, ensure_ascii=False).encode()) / 3
+        assert codec.decode(raw) == _ROWS
+
+    def test_small_payload_is_stored_plain(self):
+        raw = codec.encode({"code": 0, "data": []})
+
+        assert raw[0] == codec.VERSION_JSON
+        assert codec.decode(raw) == {"code": 0, "data": []}
+
+    def test_legacy_json_entries_are_readable(self):
+        legacy = json.dumps(_ROWS, ensure_ascii=False)
+
+        assert codec.decode(legacy.encode()) == _ROWS
+        assert codec.decode(legacy) == _ROWS
+
+    def test_stdlib_fallback_reads_same_format(self):
+        raw = codec.encode(_ROWS)
+        with patch.object(codec, "orjson", None):
+            assert codec.decode(raw) == _ROWS
+            assert codec.decode(codec.encode(_ROWS)) == _ROWS
+
+    def test_unknown_version_is_rejected(self):
+        with pytest.raises(ValueError, match="Unknown cache payload version"):
+            codec.decode(b"\x7f garbage")
+
+
+class TestOffload:
+    """Large payloads are (de)serialized in a worker thread."""
+
+    @pytest.mark.asyncio
+    async def test_large_payloads_use_worker_thread(self):
+        raw = codec.encode(_ROWS)
+        with (
+            patch.object(codec, "OFFLOAD_MIN_BYTES", 1024),
+            patch.object(codec, "OFFLOAD_MIN_ROWS", 100),
+            patch("asyncio.to_thread", wraps=asyncio.to_thread) as to_thread,
+        ):
+            assert await codec.decode_async(raw) == _ROWS
+            assert await codec.encode_async(_ROWS) == raw
+            assert await codec.loads_json_async(json.dumps(_ROWS)) == _ROWS
+
+        assert to_thread.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_small_payloads_stay_on_loop(self):
+        small = {"code": 0, "data": [{"id": 1}]}
+        with patch("asyncio.to_thread") as to_thread:
+            assert await codec.decode_async(codec.encode(small)) == small
+            assert await codec.encode_async(small) == codec.encode(small)
+            assert await codec.loads_json_async(b'{"code": 0}') == {"code": 0}
+
+        to_thread.assert_not_called()
@@ -0,0 +1,260 @@
+"""Unit tests for serving proxy queries from the locally synced tables."""
+
+import json
+from datetime import date, datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy import select
+
+from src.hubserver.core.config import APP_TZ
+from src.hubserver.features.data.service import MODELS, _apply_filters, measure_columns
+from src.hubserver.features.sync.engine import local_store
+from src.hubserver.features.sync.engine.local_store import (
+    AGGREGATED_REPORTS,
+    SYNC_ENDPOINTS,
+    combine_results,
+    extend_coverage,
+    plan_query,
+    synced_span,
+)
+
+_PATCH_BASE = "src.hubserver.features.sync.engine.local_store"
+
+# Rows captured from upstream, per sync endpoint
+_UPSTREAM_SAMPLES = Path(__file__).parents[2] / "scripts" / "data" / "final_payload_samples.json"
+
+
+def _meta(first: str | None, last: str | None) -> MagicMock:
+    meta = MagicMock()
+    meta.sync_params = {"synced_from": first, "synced_through": last} if first else None
+    return meta
+
+
+def _agent(agent_id: int) -> MagicMock:
+    return MagicMock(id=agent_id, owner=f"agent{agent_id}", base_url=f"https://a{agent_id}.example")
+
+
+class TestSyncedSpan:
+    """Coverage is the contiguous span of days the sync queue completed."""
+
+    _STARTED = datetime(2026, 3, 10, 15, 0, tzinfo=APP_TZ)
+
+    def test_span_read_from_coverage_only(self):
+        assert synced_span(_meta("2026-02-01", "2026-03-09")) == ("2026-02-01", "2026-03-09")
+        envelope = MagicMock(sync_params={"first_data_date": "2026-02-01", "last_data_date": "2026-03-09"})
+        assert synced_span(envelope) is None
+        assert synced_span(_meta(None, None)) is None
+
+    def test_adjacent_days_extend_the_span(self):
+        params = {"synced_from": "2026-03-01", "synced_through": "2026-03-05"}
+
+        assert extend_coverage(params, date(2026, 3, 6), self._STARTED) == {"synced_through": "2026-03-06"}
+        assert extend_coverage(params, date(2026, 2, 28), self._STARTED) == {"synced_from": "2026-02-28"}
+        assert extend_coverage(params, date(2026, 3, 3), self._STARTED) == {}
+
+    def test_gap_starts_a_new_span(self):
+        params = {"synced_from": "2026-03-01", "synced_through": "2026-03-05"}
+
+        assert extend_coverage(params, date(2026, 3, 8), self._STARTED) == {
+            "synced_from": "2026-03-08", "synced_through": "2026-03-08",
+        }
+
+    def test_day_synced_before_it_was_over_is_not_covered(self):
+        assert extend_coverage({}, date(2026, 3, 10), self._STARTED) == {}
+
+
+class TestPlanQuery:
+    """Synced days are read locally, the rest is planned for upstream."""
+
+    @pytest.fixture
+    def span(self):
+        with (
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=[_agent(1), _agent(2)])),
+            patch(
+                f"{_PATCH_BASE}._common_span", new=AsyncMock(return_value=("2026-01-01", "2026-01-31")),
+            ) as mock_span,
+        ):
+            yield mock_span
+
+    @pytest.mark.asyncio
+    async def test_fully_synced_range_is_local_only(self, mock_db, span):
+        rows = [{"id": 9, "agent_id": 2, "synced_at": "x"}, {"id": 5, "agent_id": 1}, {"id": 7, "agent_id": 1}]
+        params = {"bet_time": "2026-01-01 | 2026-01-31", "platform_username": "bob"}
+
+        with patch(f"{_PATCH_BASE}.query_rows", new=AsyncMock(return_value=rows)) as mock_query:
+            plan = await plan_query(mock_db, "bet-orders", params, None)
+
+        assert plan.upstream == []
+        assert [r["id"] for r in plan.local["data"]] == [9, 7, 5]
+        assert plan.local["data"][0]["_agent_name"] == "agent2"
+        assert "synced_at" not in plan.local["data"][0]
+        assert mock_query.await_args.args[2:5] == ([1, 2], {"platform_username": "bob"}, "2026-01-01 | 2026-01-31")
+
+    @pytest.mark.asyncio
+    async def test_range_split_around_synced_days(self, mock_db, span):
+        params = {"create_time": "2025-12-30 | 2026-02-02", "username": "bob"}
+
+        with patch(f"{_PATCH_BASE}.query_rows", new=AsyncMock(return_value=[])) as mock_query:
+            plan = await plan_query(mock_db, "bets", params, None)
+
+        assert mock_query.await_args.args[4] == "2026-01-01 | 2026-01-31"
+        assert plan.upstream == [
+            {"create_time": "2025-12-30 | 2025-12-31", "username": "bob"},
+            {"create_time": "2026-02-01 | 2026-02-02", "username": "bob"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_aggregated_report(self, mock_db, span):
+        rows = [{"uid": 1, "lottery_id": 2, "agent_id": 1, "bet_amount": 10.0}]
+
+        with patch(f"{_PATCH_BASE}.aggregate_rows", new=AsyncMock(return_value=rows)) as mock_agg:
+            plan = await plan_query(mock_db, "report-lottery", {"date": "2026-01-01 | 2026-01-31"}, None)
+
+        assert plan.local["count"] == 1
+        assert mock_agg.await_args.args[-1] == ("uid", "lottery_id", "username", "lottery_name", "user_parent_format")
+
+    @pytest.mark.asyncio
+    async def test_report_funds_date_renamed(self, mock_db, span):
+        rows = [{"id": 1, "agent_id": 1, "report_date": datetime(2026, 1, 5).date()}]
+
+        with patch(f"{_PATCH_BASE}.query_rows", new=AsyncMock(return_value=rows)):
+            plan = await plan_query(mock_db, "report-funds", {"date": "2026-01-05 | 2026-01-05"}, None)
+
+        assert plan.local["data"][0]["date"] == "2026-01-05"
+        assert "report_date" not in plan.local["data"][0]
+
+    @pytest.mark.asyncio
+    async def test_unsynced_range_goes_upstream(self, mock_db, span):
+        with patch(f"{_PATCH_BASE}.query_rows", new=AsyncMock()) as mock_query:
+            assert await plan_query(mock_db, "bets", {"create_time": "2026-02-01 | 2026-02-10"}, None) is None
+            span.return_value = None
+            assert await plan_query(mock_db, "bets", {"create_time": "2026-01-01 | 2026-01-10"}, None) is None
+
+        mock_query.assert_not_called()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("endpoint", "params"),
+        [
+            ("members", {}),
+            ("bets", {}),
+            ("withdrawals", {"create_time": "2026-01-01 | 2026-01-31"}),
+            ("bets", {"create_time": "2026-01-01 | 2026-01-31", "issue": "20260101"}),
+            # bet_order rows have no username column
+            ("bet-orders", {"bet_time": "2026-01-01 | 2026-01-31", "username": "bob"}),
+            # the form sends status codes, deposit_withdrawal.status holds labels
+            ("deposits", {"create_time": "2026-01-01 | 2026-01-31", "status": "0"}),
+            ("bets", {"create_time": "2026-01-01 | 2026-01-31", "status": "-9"}),
+        ],
+    )
+    async def test_unsupported_requests_skip_the_database(self, mock_db, span, endpoint, params):
+        with patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock()) as mock_agents:
+            assert await plan_query(mock_db, endpoint, params, None) is None
+
+        mock_agents.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_common_span_of_all_agents(self, mock_db):
+        metas = []
+        for agent_id, first, last in ((1, "2026-01-01", "2026-02-01"), (2, "2026-01-05", "2026-01-20")):
+            meta = _meta(first, last)
+            meta.agent_id = agent_id
+            metas.append(meta)
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = metas
+        mock_db.execute = AsyncMock(return_value=result)
+
+        assert await local_store._common_span(mock_db, "bet_order", [1, 2]) == ("2026-01-05", "2026-01-20")
+        assert await local_store._common_span(mock_db, "bet_order", [1, 2, 3]) is None
+
+
+class TestLocalFilters:
+    """Filters answered locally name real columns; unknown ones are refused."""
+
+    @pytest.mark.parametrize("endpoint", sorted(local_store.LOCAL_FILTERS))
+    def test_local_filters_are_table_columns(self, endpoint):
+        columns = MODELS[endpoint].__table__.columns.keys()
+
+        assert local_store.LOCAL_FILTERS[endpoint] <= set(columns)
+
+    def test_filter_without_column_raises(self):
+        table = MODELS["bet-orders"].__table__
+
+        with (
+            patch.dict("src.hubserver.features.data.service._ALLOWED_FILTERS", {"bet-orders": {"username"}}),
+            pytest.raises(ValueError, match="username"),
+        ):
+            _apply_filters(select(table), table, "bet-orders", {"username": "bob"})
+
+
+class TestLocalRowShape:
+    """Rows served locally carry every field of the upstream row they stand in for."""
+
+    @pytest.fixture(scope="class")
+    @classmethod
+    def upstream_rows(cls):
+        samples = json.loads(_UPSTREAM_SAMPLES.read_text(encoding="utf-8"))
+        return {endpoint: samples[sync_endpoint]["sample"][0] for endpoint, sync_endpoint in SYNC_ENDPOINTS.items()}
+
+    @staticmethod
+    def _local_row(endpoint: str) -> dict:
+        """A row as ``query_rows`` / ``aggregate_rows`` return it for *endpoint*."""
+        if endpoint in AGGREGATED_REPORTS:
+            group_by = AGGREGATED_REPORTS[endpoint] + local_store._REPORT_LABELS[endpoint]
+            names = ["agent_id", *group_by, *measure_columns(endpoint, group_by)]
+        else:
+            names = [col.name for col in MODELS[endpoint].__table__.columns]
+        return dict.fromkeys(names) | {"agent_id": 1}
+
+    @pytest.mark.parametrize("endpoint", sorted(SYNC_ENDPOINTS))
+    def test_local_row_has_upstream_fields(self, endpoint, upstream_rows):
+        local = local_store._merge_local(endpoint, [_agent(1)], [self._local_row(endpoint)])["data"][0]
+
+        assert set(upstream_rows[endpoint]) - set(local) == set()
+
+
+class TestCombineResults:
+    """Local and upstream parts merge into one consistently ordered result."""
+
+    def test_rows_interleaved_newest_first(self):
+        local = {"code": 0, "data": [{"id": 3, "_agent_id": 1}, {"id": 1, "_agent_id": 2}]}
+        upstream = {"code": 0, "data": [{"id": 4, "_agent_id": 2}, {"id": 2, "_agent_id": 1}]}
+
+        result = combine_results("bets", [local, upstream])
+
+        assert [r["id"] for r in result["data"]] == [4, 3, 2, 1]
+        assert result["_source"] == "hybrid"
+
+    def test_report_rows_summed_per_user(self):
+        local = {"code": 0, "data": [
+            {"_agent_id": 1, "uid": 7, "lottery_id": 2, "bet_count": 3, "bet_amount": 100.0, "username": "bob"},
+            {"_agent_id": 1, "uid": 8, "lottery_id": 2, "bet_count": 1, "bet_amount": 5.0, "username": "amy"},
+        ]}
+        upstream = {"code": 0, "data": [
+            {"_agent_id": 1, "uid": 7, "lottery_id": "2", "bet_count": "2", "bet_amount": "50.0000",
+             "username": "bob", "user_parent_format": "112233"},
+            {"_agent_id": 1, "uid": 5, "lottery_id": "2", "bet_count": "1", "bet_amount": "1.0000", "username": "cy"},
+        ]}
+
+        result = combine_results("report-lottery", [local, upstream])
+
+        assert [r["uid"] for r in result["data"]] == [5, 7, 8]
+        bob = result["data"][1]
+        assert (bob["bet_count"], bob["bet_amount"]) == (5, 150.0)
+        assert bob["username"] == "bob"
+
+    def test_failed_upstream_part_is_returned(self):
+        failed = {"code": 1, "msg": "Unknown endpoint", "data": [], "count": 0}
+
+        assert combine_results("bets", [{"code": 0, "data": []}, failed]) is failed
+
+    def test_failed_agents_of_all_parts_reported(self):
+        failed = [{"id": 2, "name": "agent2"}]
+        upstream = {"code": 0, "data": [], "_partial": True, "_agents_failed": failed}
+
+        result = combine_results("bets", [{"code": 0, "data": []}, upstream, dict(upstream)])
+
+        assert result["_partial"] is True
+        assert result["_agents_failed"] == failed
@@ -0,0 +1,110 @@
+"""Unit tests for the async upstream agent login."""
+
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from src.hubserver.features.sync.account import captcha
+from src.hubserver.features.sync.account.captcha import clean_captcha, score_captcha
+from src.hubserver.features.sync.account.login_service import CAPTCHA_CANDIDATES, AsyncAgentLoginService
+
+_PATCH_BASE = "src.hubserver.features.sync.account.login_service"
+
+_PUBLIC_KEY = (
+    rsa.generate_private_key(public_exponent=65537, key_size=1024)
+    .public_key()
+    .public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    .decode()
+)
+
+
+def _upstream(login_codes: list[int], seen_cookies: list[str]) -> httpx.MockTransport:
+    """Fake upstream: init sets a session cookie, login answers *login_codes* in turn."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_cookies.append(request.headers.get("Cookie", ""))
+        if request.url.path == "/captcha":
+            return httpx.Response(200, content=b"png", headers={"Content-Type": "image/png"})
+        body = json.loads(request.content)
+        if body["scene"] == "init":
+            data = {"public_key": _PUBLIC_KEY, "captcha_url": "/captcha"}
+            return httpx.Response(200, json={"data": data}, headers={"Set-Cookie": "PHPSESSID=s1; Path=/"})
+        code = login_codes.pop(0)
+        if code == 1:
+            return httpx.Response(200, json={"code": 1}, headers={"Set-Cookie": "token=t1; Path=/"})
+        return httpx.Response(200, json={"code": 0, "msg": "captcha error"})
+
+    return httpx.MockTransport(handler)
+
+
+class TestAsyncLogin:
+    """The async login runs on a shared client with a private cookie jar."""
+
+    @pytest.fixture(autouse=True)
+    def stats(self):
+        captcha._solve_stats.clear()
+        yield captcha._solve_stats
+        captcha._solve_stats.clear()
+
+    @pytest.mark.asyncio
+    async def test_login_returns_session_cookies(self):
+        seen: list[str] = []
+        async with httpx.AsyncClient(transport=_upstream([1], seen)) as client:
+            svc = AsyncAgentLoginService("https://agent.example/", client)
+            with patch(f"{_PATCH_BASE}.captcha.classify", new=AsyncMock(return_value="12o4")):
+                ok, _, cookies = await svc.login("user", "secret")
+
+        assert ok
+        assert cookies == {"PHPSESSID": "s1", "token": "t1"}
+        assert seen[-1] == "PHPSESSID=s1"
+
+    @pytest.mark.asyncio
+    async def test_wrong_captcha_falls_back_to_next_candidate(self):
+        readings = iter(["1234", "12x4", "12"])
+        submitted: list[str] = []
+        transport = _upstream([0, 1], [])
+
+        def record(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content) if request.content else {}
+            if body.get("scene") == "login":
+                submitted.append(body["captcha"])
+            return transport.handle_request(request)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(record)) as client:
+            svc = AsyncAgentLoginService("https://agent.example", client)
+            with patch(f"{_PATCH_BASE}.captcha.classify", new=AsyncMock(side_effect=lambda _: next(readings))) as ocr:
+                ok, _, _ = await svc.login("user", "secret")
+
+        assert ok
+        assert ocr.await_count == CAPTCHA_CANDIDATES
+        assert submitted == ["1234", "12x4"]
+        assert captcha.get_captcha_stats()["https://agent.example"] == {
+            "submitted": 2, "accepted": 1, "accepted_best": 0, "solve_rate": 0.5,
+        }
+
+    @pytest.mark.asyncio
+    async def test_login_redirect_means_expired(self):
+        transport = httpx.MockTransport(lambda _: httpx.Response(302, headers={"Location": "/agent/login"}))
+        async with httpx.AsyncClient(transport=transport) as client:
+            svc = AsyncAgentLoginService("https://agent.example", client)
+            is_valid, _ = await svc.check_cookies_live({"token": "old"})
+
+        assert not is_valid
+
+
+class TestCaptchaScore:
+    """OCR readings are ranked by length, charset and look-alike mapping."""
+
+    def test_look_alikes_mapped_to_digits(self):
+        assert clean_captcha("o1Z3-sb ") == "012356"
+
+    def test_confidence_ranks_readings(self):
+        exact, mapped, letter, short = (score_captcha(raw)[1] for raw in ("1234", "12o4", "12x4", "123"))
+
+        assert score_captcha("1234") == ("1234", 1.0)
+        assert exact > mapped > letter > short
+        assert score_captcha("- ") == ("", 0.0)
@@ -0,0 +1,218 @@
+"""Unit tests for the server-side sync job queue."""
+
+import asyncio
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.hubserver.core.config import APP_TZ
+from src.hubserver.features.sync.engine import orchestrator
+from src.hubserver.features.sync.engine.orchestrator import sync_days
+from src.hubserver.features.sync.model import SyncJob, SyncTask
+
+_PATCH_BASE = "src.hubserver.features.sync.engine.orchestrator"
+
+
+def _session(db):
+    """``local_session`` stand-in whose sessions are all *db*."""
+    session_cm = MagicMock(__aenter__=AsyncMock(return_value=db), __aexit__=AsyncMock(return_value=False))
+    return MagicMock(return_value=session_cm)
+
+
+def _task(**kwargs) -> SyncTask:
+    task = SyncTask(job_id="j1", agent_id=3, endpoint="report_lottery", day=date(2026, 1, 2), **kwargs)
+    task.id = 7
+    return task
+
+
+class TestPlanning:
+    """Jobs are split into one task per agent, endpoint and day."""
+
+    def test_days_inclusive_oldest_first(self):
+        days = sync_days(date(2026, 1, 30), date(2026, 2, 1))
+
+        assert days == [date(2026, 1, 30), date(2026, 1, 31), date(2026, 2, 1)]
+
+    @pytest.mark.asyncio
+    async def test_incremental_sync_continues_from_checkpoint(self, mock_db):
+        params = {"last_data_date": "2026-01-03", "checkpoint": {"job_id": "j0", "day": "2026-01-05"}}
+        with (
+            patch(f"{_PATCH_BASE}.crud_sync_metadata.get", new=AsyncMock(return_value={"sync_params": params})),
+            patch(f"{_PATCH_BASE}.datetime") as clock,
+        ):
+            clock.now.return_value.date.return_value = date(2026, 1, 6)
+            job = SyncJob(id="j1", endpoints=["members", "bet_order"], agent_ids=[3])
+            tasks = await orchestrator._plan(mock_db, job)
+
+        assert [(t.endpoint, t.day) for t in tasks] == [
+            ("members", None), ("bet_order", date(2026, 1, 5)), ("bet_order", date(2026, 1, 6)),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_second_job_rejected_while_one_is_unfinished(self, mock_db):
+        mock_db.scalar = AsyncMock(return_value=True)
+
+        with pytest.raises(orchestrator.SyncJobConflict):
+            await orchestrator.start_job(mock_db, ["members"], [1])
+        mock_db.add.assert_not_called()
+
+
+class TestRunTask:
+    """A worker pulls one day, then checkpoints it or schedules a retry."""
+
+    @pytest.mark.asyncio
+    async def test_report_day_stored_and_checkpointed(self, mock_db):
+        task = _task(status="running", attempts=1, claimed_at=datetime(2026, 1, 3, 9, 0, tzinfo=APP_TZ))
+        covered = {"synced_from": "2025-12-20", "synced_through": "2026-01-01"}
+        mock_db.get = AsyncMock(side_effect=lambda model, _id: task if model is SyncTask else MagicMock(id=3))
+        mock_db.scalar = AsyncMock(return_value=False)  # no other day of the series left
+        upsert = AsyncMock(return_value=1)
+        meta = AsyncMock()
+
+        fetch = AsyncMock(return_value={3: [{"uid": 1, "lottery_id": 2}]})
+
+        with (
+            patch(f"{_PATCH_BASE}.local_session", new=_session(mock_db)),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=fetch),
+            patch(f"{_PATCH_BASE}.bulk_upsert", new=upsert),
+            patch(f"{_PATCH_BASE}.update_sync_meta", new=meta),
+            patch(f"{_PATCH_BASE}._finish_job", new=AsyncMock()),
+            patch(f"{_PATCH_BASE}.crud_sync_metadata.get", new=AsyncMock(return_value={"sync_params": covered})),
+        ):
+            await orchestrator._run_task(task.id)
+
+        assert fetch.await_args.kwargs == {"policy": orchestrator.SYNC_FETCH}
+        assert orchestrator.SYNC_FETCH.max_rows is None  # a capped day would be served locally as complete
+        assert upsert.await_args.args[2][0]["report_date"] == "2026-01-02"
+        assert (task.status, task.rows) == ("completed", 1)
+        assert meta.await_args.kwargs == {
+            "status": "completed",
+            "params": {"checkpoint": {"job_id": "j1", "day": "2026-01-02"}, "synced_through": "2026-01-02"},
+        }
+        mock_db.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_day_retried_later(self, mock_db):
+        task = _task(status="running", attempts=1)
+        mock_db.get = AsyncMock(side_effect=lambda model, _id: task if model is SyncTask else MagicMock(id=3))
+
+        with (
+            patch(f"{_PATCH_BASE}.local_session", new=_session(mock_db)),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={3: None})),
+            patch(f"{_PATCH_BASE}._finish_job", new=AsyncMock()),
+        ):
+            await orchestrator._run_task(task.id)
+
+        assert task.status == "pending"
+        assert "failed upstream" in task.error
+        mock_db.rollback.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_missing_agent_fails_without_retry(self, mock_db):
+        task = _task(status="running", attempts=1)
+        mock_db.get = AsyncMock(side_effect=lambda model, _id: task if model is SyncTask else None)
+
+        with (
+            patch(f"{_PATCH_BASE}.local_session", new=_session(mock_db)),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock()) as fetch,
+            patch(f"{_PATCH_BASE}.record_sync_error", new=AsyncMock()),
+            patch(f"{_PATCH_BASE}._finish_job", new=AsyncMock()),
+        ):
+            await orchestrator._run_task(task.id)
+
+        fetch.assert_not_called()
+        assert (task.status, task.error) == ("failed", "agent 3 is missing or inactive")
+
+    @pytest.mark.asyncio
+    async def test_last_attempt_fails_and_skips_later_days(self, mock_db):
+        task = _task(status="running", attempts=orchestrator.SYNC_TASK_ATTEMPTS)
+
+        with (
+            patch(f"{_PATCH_BASE}.update_sync_meta", new=AsyncMock()) as meta,
+            patch(f"{_PATCH_BASE}.record_sync_error", new=AsyncMock()) as record_error,
+        ):
+            await orchestrator._fail(mock_db, task, "boom")
+
+        assert (task.status, task.error) == ("failed", "boom")
+        skip = mock_db.execute.await_args.args[0]
+        assert skip.compile().params["status"] == "skipped"
+        record_error.assert_awaited_once_with(mock_db, 3, "report_lottery", "boom")
+        meta.assert_not_called()  # a failure must not advance last_sync_at
+
+
+class TestJobSummary:
+    """Progress is aggregated from the job's task rows."""
+
+    @pytest.mark.asyncio
+    async def test_endpoint_progress_and_failed_agents(self, mock_db):
+        job = SyncJob(id="j1", endpoints=["members", "bet_order"], agent_ids=[1, 2], status="running")
+        rows = [
+            (1, "members", "completed", 1, 10, None),
+            (2, "members", "completed", 1, 5, None),
+            (1, "bet_order", "completed", 2, 40, None),
+            (1, "bet_order", "pending", 1, 0, None),
+            (2, "bet_order", "failed", 1, 0, "timeout"),
+            (2, "bet_order", "skipped", 2, 0, None),
+        ]
+        mock_db.execute = AsyncMock(return_value=MagicMock(all=MagicMock(return_value=rows)))
+
+        summary = await orchestrator.job_summary(mock_db, job)
+
+        assert summary["endpoints"]["members"] == {
+            "status": "completed", "done": 2, "total": 2, "rows": 15, "agents_failed": [],
+        }
+        assert summary["endpoints"]["bet_order"] == {
+            "status": "running", "done": 5, "total": 6, "rows": 40, "agents_failed": [2],
+        }
+        assert summary["progress"] == 87.5
+        assert {"agent_id": 2, "endpoint": "bet_order", "status": "failed", "done": 3, "total": 3,
+                "rows": 0, "error": "timeout"} in summary["agents"]
+
+
+class TestWorkers:
+    """Workers hand their task back to the queue when stopped."""
+
+    @pytest.mark.asyncio
+    async def test_stopped_worker_releases_its_task(self):
+        started = asyncio.Event()
+
+        async def hang(_task_id):
+            started.set()
+            await asyncio.sleep(10)
+
+        release = AsyncMock()
+        with (
+            patch(f"{_PATCH_BASE}._claim", new=AsyncMock(return_value=7)),
+            patch(f"{_PATCH_BASE}._run_task", new=hang),
+            patch(f"{_PATCH_BASE}._release", new=release),
+        ):
+            orchestrator.start_sync_workers(1)
+            await started.wait()
+            await orchestrator.stop_sync_workers()
+
+        release.assert_awaited_once_with(7)
+        assert orchestrator._workers == []
+
+    @pytest.mark.asyncio
+    async def test_running_task_lease_renewed(self, mock_db):
+        renewed = asyncio.Event()
+        mock_db.commit = AsyncMock(side_effect=lambda: renewed.set())
+
+        async def hang(_task_id):
+            await asyncio.sleep(10)
+
+        with (
+            patch(f"{_PATCH_BASE}.TASK_HEARTBEAT", timedelta(seconds=0.01)),
+            patch(f"{_PATCH_BASE}.local_session", new=_session(mock_db)),
+            patch(f"{_PATCH_BASE}._claim", new=AsyncMock(return_value=7)),
+            patch(f"{_PATCH_BASE}._run_task", new=hang),
+            patch(f"{_PATCH_BASE}._release", new=AsyncMock()),
+        ):
+            orchestrator.start_sync_workers(1)
+            await renewed.wait()
+            await orchestrator.stop_sync_workers()
+
+        renewal = mock_db.execute.await_args.args[0].compile()
+        assert "claimed_at" in renewal.params
+        assert renewal.params["status_1"] == "running"
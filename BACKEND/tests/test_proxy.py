@@ -0,0 +1,259 @@
+"""Unit tests for the upstream proxy fan-out helpers."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from src.hubserver.features.sync.engine import proxy
+from src.hubserver.features.sync.engine.proxy import merge_agent_rows
+
+_PATCH_BASE = "src.hubserver.features.sync.engine.proxy"
+
+
+def _rows(*ids: int, agent: int = 1) -> list[dict]:
+    return [{"id": i, "_agent_id": agent} for i in ids]
+
+
+class TestMergeAgentRows:
+    """Per-agent slices are merged newest first."""
+
+    def test_interleaves_sorted_slices(self):
+        result = merge_agent_rows([_rows(9, 4, 1), _rows(8, 7, 2, agent=2), []])
+
+        assert [r["id"] for r in result["data"]] == [9, 8, 7, 4, 2, 1]
+        assert result["count"] == 6
+
+    def test_out_of_order_slice_sorted_first(self):
+        first = _rows(1, 5, 3)
+
+        result = merge_agent_rows([first, _rows(4, agent=2)])
+
+        assert [r["id"] for r in result["data"]] == [5, 4, 3, 1]
+        assert [r["id"] for r in first] == [1, 5, 3]
+
+    def test_rows_without_id_keep_agent_order(self):
+        reports = [[{"uid": 1}, {"uid": 2}], [{"uid": 3}]]
+
+        result = merge_agent_rows(reports)
+
+        assert [r["uid"] for r in result["data"]] == [1, 2, 3]
+
+
+def _agent(agent_id: int) -> MagicMock:
+    return MagicMock(id=agent_id, owner=f"agent{agent_id}", base_url=f"https://a{agent_id}.example")
+
+
+class TestHedged:
+    """A slow attempt is raced by a second copy; the first success wins."""
+
+    @pytest.mark.asyncio
+    async def test_slow_attempt_is_hedged(self):
+        delays = [1.0, 0.0]
+
+        async def attempt():
+            await asyncio.sleep(delays.pop(0))
+            return {"code": 0}
+
+        assert await proxy._hedged(attempt, 0.01) == {"code": 0}
+        assert delays == []
+
+    @pytest.mark.asyncio
+    async def test_fast_failure_is_not_hedged(self):
+        attempt = AsyncMock(side_effect=httpx.ConnectError("refused"))
+
+        with pytest.raises(httpx.ConnectError):
+            await proxy._hedged(attempt, 0.05)
+
+        attempt.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_copy_waits_for_the_other(self):
+        outcomes = [(0.05, None), (0.0, httpx.ReadError("reset"))]
+
+        async def attempt():
+            delay, error = outcomes.pop(0)
+            await asyncio.sleep(delay)
+            if error:
+                raise error
+            return {"code": 0}
+
+        assert await proxy._hedged(attempt, 0.01) == {"code": 0}
+
+
+class TestFetchAllAgents:
+    """Agents that fail or time out are dropped and reported."""
+
+    @pytest.mark.asyncio
+    async def test_slow_agent_times_out(self, mock_db):
+        client = MagicMock()
+
+        async def post(url, **_kwargs):
+            if "a2" in url:
+                await asyncio.sleep(1)
+            return MagicMock(content=b'{"code": 0, "data": [{"id": 1}]}')
+
+        client.post = post
+        policy = proxy.FetchPolicy(timeout=0.05, hedge_delay=0, breaker=True)
+        with (
+            patch.object(proxy, "get_client", new=AsyncMock(return_value=client)),
+            patch.object(proxy, "ensure_sessions", new=AsyncMock()),
+        ):
+            results = await proxy.fetch_agents(mock_db, "bets", {}, [_agent(1), _agent(2)], policy=policy)
+
+        assert [r["id"] for r in results[1]] == [1]
+        assert results[2] is None
+
+    @pytest.mark.asyncio
+    async def test_failed_agents_marked_partial(self, mock_db):
+        agents = [_agent(1), _agent(2)]
+
+        with (
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=agents)),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={1: _rows(4), 2: None})),
+        ):
+            result = await proxy.fetch_all_agents(mock_db, "bets", {})
+
+        assert [r["id"] for r in result["data"]] == [4]
+        assert result["_partial"] is True
+        assert result["_agents_failed"] == [{"id": 2, "name": "agent2"}]
+
+
+class TestSessionExpiry:
+    """A login redirect invalidates the cookie and the agent is retried once."""
+
+    @pytest.mark.asyncio
+    async def test_login_redirect_invalidates_cookie(self):
+        agent = _agent(1)
+        client = MagicMock()
+        client.post = AsyncMock(return_value=httpx.Response(302, headers={"Location": "/agent/login"}))
+
+        with patch(f"{_PATCH_BASE}.invalidate_cookie") as mock_invalidate:
+            _, result = await proxy._fetch_one(client, agent, "/x", {})
+
+        assert result is proxy._SESSION_EXPIRED
+        mock_invalidate.assert_called_once_with(1)
+
+    @pytest.mark.asyncio
+    async def test_expired_agent_relogged_and_retried(self, mock_db):
+        agent = _agent(1)
+        responses = [(agent, proxy._SESSION_EXPIRED), (agent, {"code": 0, "data": [{"id": 1}]})]
+
+        with (
+            patch.object(proxy, "get_client", new=AsyncMock()),
+            patch.object(proxy, "ensure_sessions", new=AsyncMock()) as mock_sessions,
+            patch.object(proxy, "_fetch_one", new=AsyncMock(side_effect=responses)),
+        ):
+            results = await proxy.fetch_agents(mock_db, "bets", {}, [agent])
+
+        assert results == {1: [{"id": 1, "_agent_id": 1, "_agent_name": "agent1", "_agent_base_url": agent.base_url}]}
+        mock_sessions.assert_awaited_with(mock_db, [agent], expired=True)
+
+
+class TestPagination:
+    """Agents with more rows than one upstream page are paged in full."""
+
+    PAGES = {
+        "1": {"code": 0, "data": [{"id": 6}, {"id": 5}], "count": 5},
+        "2": {"code": 0, "data": [{"id": 5}, {"id": 4}], "count": 5},
+        "3": {"code": 0, "data": [{"id": 3}], "count": 5},
+    }
+
+    @staticmethod
+    def _upstream(pages: dict):
+        async def fetch_one(_client, agent, _path, params, *_hedge_delay):
+            return agent, pages.get(params["page"])
+
+        return fetch_one
+
+    @pytest.mark.asyncio
+    async def test_all_pages_joined_in_order(self):
+        with (
+            patch(f"{_PATCH_BASE}.AGENT_FETCH_LIMIT", 2),
+            patch.object(proxy, "_fetch_one", new=AsyncMock(side_effect=self._upstream(self.PAGES))) as mock_fetch,
+        ):
+            result = await proxy._fetch_all_pages(MagicMock(), _agent(1), "bets", {})
+
+        assert [r["id"] for r in result["data"]] == [6, 5, 4, 3]
+        assert mock_fetch.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_rows_capped_at_max(self):
+        with (
+            patch(f"{_PATCH_BASE}.AGENT_FETCH_LIMIT", 2),
+            patch.object(proxy, "_fetch_one", new=AsyncMock(side_effect=self._upstream(self.PAGES))),
+        ):
+            policy = proxy.FetchPolicy(timeout=1, hedge_delay=0, breaker=True, max_rows=4)
+            pages = [page async for page, _ in proxy.stream_pages(MagicMock(), _agent(1), "bets", {}, policy=policy)]
+
+        assert sorted(pages) == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_uncapped_policy_pages_every_row(self):
+        with (
+            patch(f"{_PATCH_BASE}.AGENT_FETCH_LIMIT", 2),
+            patch.object(proxy, "_fetch_one", new=AsyncMock(side_effect=self._upstream(self.PAGES))),
+        ):
+            policy = proxy.FetchPolicy(timeout=1, hedge_delay=0, breaker=False, max_rows=None)
+            pages = [page async for page, _ in proxy.stream_pages(MagicMock(), _agent(1), "bets", {}, policy=policy)]
+
+        assert sorted(pages) == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_failed_page_fails_the_agent(self, mock_db):
+        pages = {**self.PAGES, "3": None}
+
+        with (
+            patch(f"{_PATCH_BASE}.AGENT_FETCH_LIMIT", 2),
+            patch.object(proxy, "get_client", new=AsyncMock()),
+            patch.object(proxy, "ensure_sessions", new=AsyncMock()),
+            patch.object(proxy, "_fetch_one", new=AsyncMock(side_effect=self._upstream(pages))),
+        ):
+            results = await proxy.fetch_agents(mock_db, "bets", {}, [_agent(1)])
+
+        assert results == {1: None}
+
+    @pytest.mark.asyncio
+    async def test_limited_agent_fetches_one_page(self, mock_db):
+        with (
+            patch(f"{_PATCH_BASE}.AGENT_FETCH_LIMIT", 2),
+            patch.object(proxy, "get_client", new=AsyncMock()),
+            patch.object(proxy, "ensure_sessions", new=AsyncMock()),
+            patch.object(proxy, "_fetch_one", new=AsyncMock(side_effect=self._upstream(self.PAGES))) as mock_fetch,
+        ):
+            results = await proxy.fetch_agents(mock_db, "bets", {}, [_agent(1)], limits={1: 2})
+
+        assert [r["id"] for r in results[1]] == [6, 5]
+        assert mock_fetch.await_args.args[3]["limit"] == "2"
+
+    @pytest.mark.asyncio
+    async def test_only_first_page_hedged(self):
+        with (
+            patch(f"{_PATCH_BASE}.AGENT_FETCH_LIMIT", 2),
+            patch.object(proxy, "_fetch_one", new=AsyncMock(side_effect=self._upstream(self.PAGES))) as mock_fetch,
+        ):
+            await proxy._fetch_all_pages(MagicMock(), _agent(1), "bets", {})
+
+        hedged = {call.args[3]["page"]: call.args[4:] for call in mock_fetch.await_args_list}
+        assert hedged == {"1": (proxy.HEDGE_DELAY,), "2": (), "3": ()}
+
+    @pytest.mark.asyncio
+    async def test_deadline_covers_all_pages(self, mock_db):
+        fetch_page = self._upstream(self.PAGES)
+
+        async def slow_later_pages(client, agent, path, params, *_hedge_delay):
+            if params["page"] != "1":
+                await asyncio.sleep(1)
+            return await fetch_page(client, agent, path, params)
+
+        policy = proxy.FetchPolicy(timeout=0.05, hedge_delay=0, breaker=True)
+        with (
+            patch(f"{_PATCH_BASE}.AGENT_FETCH_LIMIT", 2),
+            patch.object(proxy, "get_client", new=AsyncMock()),
+            patch.object(proxy, "ensure_sessions", new=AsyncMock()),
+            patch.object(proxy, "_fetch_one", new=slow_later_pages),
+        ):
+            results = await proxy.fetch_agents(mock_db, "bets", {}, [_agent(1)], policy=policy)
+
+        assert results == {1: None}
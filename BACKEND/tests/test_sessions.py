@@ -0,0 +1,163 @@
+"""Unit tests for upstream agent session checks and re-login coordination."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.hubserver.features.sync.engine import sessions
+
+_PATCH_BASE = "src.hubserver.features.sync.engine.sessions"
+
+
+@pytest.fixture(autouse=True)
+def isolated():
+    sessions._verified_cookies.clear()
+    with patch(f"{_PATCH_BASE}.redis_cache.client", None):
+        yield
+    sessions._verified_cookies.clear()
+
+
+def _agent(agent_id: int, cookie: str = "sid=old") -> MagicMock:
+    return MagicMock(
+        id=agent_id, base_url=f"https://a{agent_id}.example", username=f"u{agent_id}",
+        password_enc="enc", cookie=cookie,
+    )
+
+
+class TestCookieValidity:
+    """Live cookies are trusted for a TTL, keyed by the cookie string."""
+
+    @pytest.mark.asyncio
+    async def test_verified_cookie_skips_liveness_check(self, mock_db):
+        agent = _agent(1)
+
+        with patch(f"{_PATCH_BASE}._check_live", new=AsyncMock(return_value=(True, "ok"))) as mock_check:
+            await sessions.ensure_sessions(mock_db, [agent])
+            await sessions.ensure_sessions(mock_db, [agent])
+            agent.cookie = "sid=new"
+            await sessions.ensure_sessions(mock_db, [agent])
+
+        assert mock_check.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_expired_cookie_skips_check_and_logs_in(self, mock_db):
+        agent = _agent(1)
+        sessions._verified_cookies[1] = ("sid=old", float("inf"))
+
+        with (
+            patch(f"{_PATCH_BASE}._check_live", new=AsyncMock()) as mock_check,
+            patch(f"{_PATCH_BASE}._stored_cookie", new=AsyncMock(return_value="sid=old")),
+            patch(f"{_PATCH_BASE}._login", new=AsyncMock(return_value="sid=new")) as mock_login,
+        ):
+            await sessions.ensure_sessions(mock_db, [agent], expired=True)
+
+        mock_check.assert_not_called()
+        mock_login.assert_awaited_once_with(1, agent.base_url, "u1", "enc")
+        mock_db.refresh.assert_awaited_once_with(agent)
+        assert sessions._verified_cookies[1][0] == "sid=new"
+
+
+class TestLoginCoordination:
+    """At most one login per agent is in flight; waiters reuse its cookie."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_login(self, mock_db):
+        agent = _agent(1)
+
+        async def slow_login(*_args):
+            await asyncio.sleep(0.01)
+            return "sid=new"
+
+        with (
+            patch(f"{_PATCH_BASE}._check_live", new=AsyncMock(return_value=(False, "expired"))),
+            patch(f"{_PATCH_BASE}._stored_cookie", new=AsyncMock(return_value="sid=old")),
+            patch(f"{_PATCH_BASE}._login", new=AsyncMock(side_effect=slow_login)) as mock_login,
+        ):
+            await asyncio.gather(*(sessions.ensure_sessions(mock_db, [agent]) for _ in range(3)))
+
+        mock_login.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_expired_caller_does_not_join_liveness_check(self):
+        agent = _agent(1)
+
+        async def slow_check(*_args):
+            await asyncio.sleep(0.01)
+            return True, "ok"
+
+        with (
+            patch(f"{_PATCH_BASE}._check_live", new=AsyncMock(side_effect=slow_check)),
+            patch(f"{_PATCH_BASE}._stored_cookie", new=AsyncMock(return_value="sid=old")),
+            patch(f"{_PATCH_BASE}._login", new=AsyncMock(return_value="sid=new")) as mock_login,
+        ):
+            check = asyncio.create_task(sessions._renew_shared(agent, expired=False))
+            await asyncio.sleep(0)
+            cookie = await sessions._renew_shared(agent, expired=True)
+            await check
+
+        assert cookie == "sid=new"
+        mock_login.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_check_joins_forced_login(self):
+        agent = _agent(1)
+
+        async def slow_login(*_args):
+            await asyncio.sleep(0.01)
+            return "sid=new"
+
+        with (
+            patch(f"{_PATCH_BASE}._check_live", new=AsyncMock()) as mock_check,
+            patch(f"{_PATCH_BASE}._stored_cookie", new=AsyncMock(return_value="sid=old")),
+            patch(f"{_PATCH_BASE}._login", new=AsyncMock(side_effect=slow_login)),
+        ):
+            login = asyncio.create_task(sessions._renew_shared(agent, expired=True))
+            await asyncio.sleep(0)
+            cookie = await sessions._renew_shared(agent, expired=False)
+
+        assert cookie == await login == "sid=new"
+        mock_check.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_agents_checked_concurrently(self, mock_db):
+        running = peak = 0
+
+        async def check(*_args):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return True, "ok"
+
+        with patch(f"{_PATCH_BASE}._check_live", new=check):
+            await sessions.ensure_sessions(mock_db, [_agent(i) for i in range(4)])
+
+        assert peak == 4
+
+    @pytest.mark.asyncio
+    async def test_other_worker_login_is_reused(self, mock_redis):
+        mock_redis.set = AsyncMock(return_value=None)
+        mock_redis.exists = AsyncMock(return_value=0)
+
+        with (
+            patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis),
+            patch(f"{_PATCH_BASE}._stored_cookie", new=AsyncMock(return_value="sid=new")),
+            patch(f"{_PATCH_BASE}._login", new=AsyncMock()) as mock_login,
+        ):
+            cookie = await sessions._renew(1, "https://a1.example", "u1", "enc", "sid=old", expired=True)
+
+        assert cookie == "sid=new"
+        mock_login.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cookie_renewed_just_before_lock_is_reused(self):
+        with (
+            patch(f"{_PATCH_BASE}._stored_cookie", new=AsyncMock(return_value="sid=fresh")),
+            patch(f"{_PATCH_BASE}._login", new=AsyncMock()) as mock_login,
+        ):
+            cookie = await sessions._renew(1, "https://a1.example", "u1", "enc", "sid=old", expired=True)
+
+        assert cookie == "sid=fresh"
+        mock_login.assert_not_called()
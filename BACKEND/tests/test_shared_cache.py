@@ -0,0 +1,129 @@
+"""Unit tests for the host-wide shared proxy cache."""
+
+import os
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.hubserver.features.sync.engine import swr
+from src.hubserver.features.sync.engine.shared_cache import SharedCache
+from src.hubserver.features.sync.engine.swr import MemoryCache, make_cache_key, swr_fetch
+
+_PAYLOAD = {"code": 0, "data": [{"id": i, "username": f"user{i}"} for i in range(50)], "count": 50}
+
+
+@pytest.fixture
+def shared(tmp_path):
+    return SharedCache(str(tmp_path), max_stale_ttl=3600, max_bytes=10 * 1024 * 1024)
+
+
+class TestSharedCache:
+    """Serialized entries shared through a tmpfs directory."""
+
+    @pytest.mark.asyncio
+    async def test_roundtrip_keeps_age(self, shared):
+        await shared.put("sync:proxy:abc", _PAYLOAD, age=120)
+
+        data, age = await shared.get("sync:proxy:abc")
+
+        assert data == _PAYLOAD
+        assert 119 < age < 125
+
+    @pytest.mark.asyncio
+    async def test_other_instance_sees_entry(self, shared, tmp_path):
+        await shared.put("sync:proxy:abc", _PAYLOAD)
+
+        data, _ = await SharedCache(str(tmp_path), max_stale_ttl=3600, max_bytes=10**7).get("sync:proxy:abc")
+
+        assert data == _PAYLOAD
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_removed(self, shared, tmp_path):
+        await shared.put("sync:proxy:old", _PAYLOAD, age=4000)
+
+        assert await shared.get("sync:proxy:old") == (None, -1)
+        assert not os.path.exists(tmp_path / "old")
+
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self, tmp_path):
+        probe = SharedCache(str(tmp_path / "probe"), max_stale_ttl=3600, max_bytes=10**7)
+        await probe.put("sync:proxy:x", _PAYLOAD)
+        entry_size = probe.stats()["bytes"]
+        cache = SharedCache(str(tmp_path / "lru"), max_stale_ttl=3600, max_bytes=int(entry_size * 2.5))
+
+        await cache.put("sync:proxy:a", _PAYLOAD)
+        await cache.put("sync:proxy:b", _PAYLOAD)
+        past = time.time() - 60
+        os.utime(tmp_path / "lru" / "b", (past, past))
+        await cache.put("sync:proxy:c", _PAYLOAD)
+
+        assert (await cache.get("sync:proxy:b"))[0] is None
+        assert (await cache.get("sync:proxy:a"))[0] == _PAYLOAD
+        assert cache.stats()["entries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_corrupt_entry_is_dropped(self, shared, tmp_path):
+        (tmp_path / "bad").write_bytes(b"\x00" * 8 + b"\x7fjunk")
+
+        assert await shared.get("sync:proxy:bad") == (None, -1)
+        assert not os.path.exists(tmp_path / "bad")
+
+
+    @pytest.mark.asyncio
+    async def test_private_permissions(self, tmp_path):
+        cache = SharedCache(str(tmp_path / "shm"), max_stale_ttl=3600, max_bytes=10**7)
+
+        await cache.put("sync:proxy:abc", _PAYLOAD)
+
+        assert (tmp_path / "shm").stat().st_mode & 0o777 == 0o700
+        assert (tmp_path / "shm" / "abc").stat().st_mode & 0o777 == 0o600
+
+    @pytest.mark.asyncio
+    async def test_byte_total_kept_without_rescanning(self, shared, tmp_path):
+        await shared.put("sync:proxy:a", _PAYLOAD)
+        await shared.put("sync:proxy:a", {"code": 0, "data": []})
+        await shared.put("sync:proxy:b", _PAYLOAD)
+
+        with patch.object(shared, "_scan") as mock_scan:
+            stats = shared.stats()
+
+        mock_scan.assert_not_called()
+        on_disk = sum(os.path.getsize(tmp_path / name) for name in ("a", "b"))
+        assert (stats["entries"], stats["bytes"]) == (2, on_disk)
+
+    @pytest.mark.asyncio
+    async def test_rescan_removes_abandoned_temp_files(self, shared, tmp_path):
+        await shared.put("sync:proxy:a", _PAYLOAD)
+        (tmp_path / "crashed.tmp").write_bytes(b"\x00" * 1024)
+        (tmp_path / "writing.tmp").write_bytes(b"\x00" * 1024)
+        past = time.time() - 3600
+        os.utime(tmp_path / "crashed.tmp", (past, past))
+
+        await shared._resync()
+
+        assert not os.path.exists(tmp_path / "crashed.tmp")
+        assert os.path.exists(tmp_path / "writing.tmp")
+        assert shared.stats()["bytes"] == os.path.getsize(tmp_path / "a")
+
+
+class TestSharedLayer:
+    """swr_fetch serves from the shared layer before Redis/upstream."""
+
+    @pytest.mark.asyncio
+    async def test_warm_worker_serves_shared_entry_with_real_age(self, mock_db, shared):
+        key = make_cache_key("bets", None, {})
+        await shared.put(key, _PAYLOAD, age=30)
+
+        with (
+            patch.object(swr, "_memory", MemoryCache()),
+            patch.object(swr, "_shared", shared),
+            patch.object(swr.redis_cache, "client", None),
+            patch.object(swr, "_fetch_upstream", new=AsyncMock()) as mock_fetch,
+        ):
+            response = await swr_fetch(mock_db, "bets", {"limit": "5"})
+            assert swr._memory.get_age(key) >= 30
+
+        mock_fetch.assert_not_called()
+        assert response["_cache_status"] == "fresh"
+        assert len(response["data"]) == 5
@@ -0,0 +1,759 @@
+"""Unit tests for the proxy SWR cache engine."""
+
+import asyncio
+import json
+from datetime import date
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.hubserver.features.sync.engine import swr
+from src.hubserver.features.sync.engine.swr import MemoryCache, make_cache_key, swr_fetch
+
+_PATCH_BASE = "src.hubserver.features.sync.engine.swr"
+
+# Rows captured from upstream, per sync endpoint
+_UPSTREAM_SAMPLES = Path(__file__).parents[2] / "scripts" / "data" / "final_payload_samples.json"
+
+
+def _result(*ids: int) -> dict:
+    return {"code": 0, "data": [{"id": i} for i in ids], "count": len(ids)}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    """Isolate the module-level caches between tests."""
+    with patch(f"{_PATCH_BASE}._memory", MemoryCache()) as memory, patch(f"{_PATCH_BASE}.redis_cache.client", None):
+        swr._revalidating.clear()
+        yield memory
+    swr._revalidating.clear()
+
+
+@pytest.fixture
+def mock_session():
+    """Patch ``local_session`` used by background revalidation."""
+    session_cm = MagicMock()
+    session_cm.__aenter__ = AsyncMock(return_value=MagicMock())
+    session_cm.__aexit__ = AsyncMock(return_value=False)
+    with patch(f"{_PATCH_BASE}.local_session", return_value=session_cm) as factory:
+        yield factory
+
+
+class TestStaleWhileRevalidate:
+    """Stale entries are served immediately and refreshed in the background."""
+
+    @pytest.mark.asyncio
+    async def test_fresh_hit_does_not_revalidate(self, mock_db, fresh_cache):
+        key = make_cache_key("members", None, {})
+        fresh_cache.put(key, _result(1))
+
+        with patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock()) as mock_fetch:
+            response = await swr_fetch(mock_db, "members", {})
+
+        assert response["_cache_status"] == "fresh"
+        assert not swr._revalidating
+        mock_fetch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stale_hit_schedules_single_refresh(self, mock_db, mock_session):
+        stale_cache = MemoryCache(fresh_ttl=0)
+        key = make_cache_key("members", None, {})
+        stale_cache.put(key, _result(1))
+
+        with (
+            patch(f"{_PATCH_BASE}._memory", stale_cache),
+            patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(return_value=_result(2, 1))) as mock_fetch,
+        ):
+            first = await swr_fetch(mock_db, "members", {})
+            second = await swr_fetch(mock_db, "members", {})
+            assert first["_cache_status"] == second["_cache_status"] == "stale"
+            assert first["data"] == [{"id": 1}]
+            assert list(swr._revalidating) == [key]
+
+            await asyncio.gather(*swr._revalidating.values())
+
+            mock_fetch.assert_awaited_once()
+            assert not swr._revalidating
+            data, _ = stale_cache.get(key)
+            assert data["data"] == [{"id": 2}, {"id": 1}]
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_keeps_stale_entry(self, mock_db, mock_session):
+        stale_cache = MemoryCache(fresh_ttl=0)
+        key = make_cache_key("members", None, {})
+        stale_cache.put(key, _result(1))
+
+        with (
+            patch(f"{_PATCH_BASE}._memory", stale_cache),
+            patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(side_effect=RuntimeError("boom"))),
+        ):
+            await swr_fetch(mock_db, "members", {})
+            await asyncio.gather(*swr._revalidating.values())
+
+        assert not swr._revalidating
+        data, _ = stale_cache.get(key)
+        assert data["data"] == [{"id": 1}]
+
+
+class TestSingleFlight:
+    """Concurrent upstream fetches for one cache key are coalesced."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_fetch(self, mock_db, mock_session):
+        release = asyncio.Event()
+
+        async def slow_fetch(*args, **kwargs):
+            await release.wait()
+            return _result(3, 2, 1)
+
+        with patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(side_effect=slow_fetch)) as mock_fetch:
+            callers = [
+                asyncio.create_task(swr_fetch(mock_db, "bets", {"page": str(page), "limit": "1"}))
+                for page in (1, 2, 3)
+            ]
+            callers.append(asyncio.create_task(swr_fetch(mock_db, "bets", {}, force_fresh=True)))
+            await asyncio.sleep(0)
+            assert len(swr._inflight) == 1
+
+            release.set()
+            responses = await asyncio.gather(*callers)
+
+        mock_fetch.assert_awaited_once()
+        assert [r["data"] for r in responses[:3]] == [[{"id": 3}], [{"id": 2}], [{"id": 1}]]
+        assert all(r["_cache_status"] == "miss" for r in responses)
+        assert not swr._inflight
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_fetch(self, mock_db, mock_session, fresh_cache):
+        release = asyncio.Event()
+
+        async def slow_fetch(*args, **kwargs):
+            await release.wait()
+            return _result(1)
+
+        with patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(side_effect=slow_fetch)):
+            leader = asyncio.create_task(swr_fetch(mock_db, "bets", {}))
+            follower = asyncio.create_task(swr_fetch(mock_db, "bets", {}))
+            await asyncio.sleep(0)
+            leader.cancel()
+            release.set()
+            response = await follower
+
+        assert response["data"] == [{"id": 1}]
+        assert fresh_cache.get(make_cache_key("bets", None, {}))[0] is not None
+
+
+class TestRedisLease:
+    """Only the worker holding the Redis lease fetches upstream."""
+
+    @pytest.mark.asyncio
+    async def test_lease_holder_fetches_and_releases(self, mock_db, mock_session, mock_redis):
+        mock_redis.eval = AsyncMock(return_value=1)
+        key = make_cache_key("bets", None, {})
+
+        with (
+            patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis),
+            patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(return_value=_result(1))) as mock_fetch,
+        ):
+            await swr_fetch(mock_db, "bets", {})
+
+        mock_fetch.assert_awaited_once()
+        lock_call = mock_redis.set.await_args_list[0]
+        assert lock_call.args[0] == f"{key}:lock"
+        assert lock_call.kwargs["nx"] is True
+        token = lock_call.args[1]
+        mock_redis.eval.assert_awaited_once_with(swr._RELEASE_SCRIPT, 1, f"{key}:lock", token)
+
+    @pytest.mark.asyncio
+    async def test_lease_renewed_during_long_fetch(self, mock_db, mock_session, mock_redis):
+        mock_redis.eval = AsyncMock(return_value=1)
+
+        async def slow_fetch(*_args):
+            await asyncio.sleep(0.05)
+            return _result(1)
+
+        with (
+            patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis),
+            patch(f"{_PATCH_BASE}.LEASE_TTL", 0.03),
+            patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(side_effect=slow_fetch)),
+        ):
+            await swr_fetch(mock_db, "bets", {})
+
+        scripts = [call.args[0] for call in mock_redis.eval.await_args_list]
+        assert swr._RENEW_SCRIPT in scripts
+        assert scripts[-1] == swr._RELEASE_SCRIPT
+
+    @pytest.mark.asyncio
+    async def test_waiter_reads_leader_entry(self, mock_db, mock_session, mock_redis, fresh_cache):
+        mock_redis.set = AsyncMock(return_value=None)
+        mock_redis.exists = AsyncMock(side_effect=[1, 0])
+        mock_redis.get = AsyncMock(side_effect=[None, json.dumps(_result(7))])
+
+        with (
+            patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis),
+            patch(f"{_PATCH_BASE}.LEASE_POLL_INTERVAL", 0),
+            patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock()) as mock_fetch,
+        ):
+            response = await swr_fetch(mock_db, "bets", {})
+
+        mock_fetch.assert_not_called()
+        assert response["data"] == [{"id": 7}]
+        assert fresh_cache.get(make_cache_key("bets", None, {}))[0] is not None
+
+    @pytest.mark.asyncio
+    async def test_waiter_falls_back_when_leader_stores_nothing(self, mock_db, mock_session, mock_redis):
+        mock_redis.set = AsyncMock(side_effect=[None, True])
+        mock_redis.exists = AsyncMock(return_value=0)
+
+        with (
+            patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis),
+            patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(return_value=_result(1))) as mock_fetch,
+        ):
+            response = await swr_fetch(mock_db, "bets", {})
+
+        mock_fetch.assert_awaited_once()
+        assert response["data"] == [{"id": 1}]
+
+
+    @pytest.mark.asyncio
+    async def test_waiter_gives_up_on_hung_leader(self, mock_db, mock_session, mock_redis):
+        mock_redis.set = AsyncMock(return_value=None)
+        mock_redis.exists = AsyncMock(return_value=1)  # the lock never goes away
+
+        with (
+            patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis),
+            patch(f"{_PATCH_BASE}.LEASE_POLL_INTERVAL", 0.005),
+            patch(f"{_PATCH_BASE}.LEASE_WAIT_TIMEOUT", 0.05),
+            patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(return_value=_result(1))) as mock_fetch,
+        ):
+            response = await asyncio.wait_for(swr_fetch(mock_db, "bets", {}), timeout=1)
+
+        mock_fetch.assert_awaited_once()
+        assert response["data"] == [{"id": 1}]
+
+
+class TestPerAgentSlices:
+    """The all-agents entry is composed from per-agent cache slices."""
+
+    @staticmethod
+    def _agent(agent_id: int) -> MagicMock:
+        agent = MagicMock()
+        agent.id = agent_id
+        return agent
+
+    @pytest.mark.asyncio
+    async def test_only_missing_slices_are_fetched(self, mock_db, fresh_cache):
+        agents = [self._agent(1), self._agent(2)]
+        fresh_cache.put(make_cache_key("bets", 1, {}), _result(5, 1))
+
+        with (
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=agents)),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={2: [{"id": 3}]})) as mock_fetch,
+        ):
+            result = await swr._fetch_merged(mock_db, "bets", {})
+
+        assert mock_fetch.await_args.args[3] == [agents[1]]
+        assert [row["id"] for row in result["data"]] == [5, 3, 1]
+        assert fresh_cache.get(make_cache_key("bets", 2, {}))[0]["data"] == [{"id": 3}]
+
+    @pytest.mark.asyncio
+    async def test_merged_refresh_leaves_slice_scores_alone(self, mock_db, fresh_cache):
+        key = make_cache_key("bets", 1, {})
+        fresh_cache.put(key, _result(5))
+        entry = fresh_cache._store[key]
+
+        with patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=[self._agent(1)])):
+            await swr._fetch_merged(mock_db, "bets", {})
+
+        assert (entry.hit_count, entry.score) == (0, 0)
+
+    @pytest.mark.asyncio
+    async def test_failed_agent_keeps_stale_slice(self, mock_db):
+        stale_cache = MemoryCache(fresh_ttl=0)
+        stale_cache.put(make_cache_key("bets", 1, {}), _result(4))
+
+        with (
+            patch(f"{_PATCH_BASE}._memory", stale_cache),
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=[self._agent(1)])),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={1: None})),
+        ):
+            result = await swr._fetch_merged(mock_db, "bets", {})
+
+        assert result["data"] == [{"id": 4}]
+
+    @pytest.mark.asyncio
+    async def test_failed_agent_without_slice_marks_partial(self, mock_db, fresh_cache):
+        agents = [self._agent(1), self._agent(2)]
+        agents[1].owner = "agent2"
+
+        with (
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=agents)),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={1: [{"id": 3}], 2: None})),
+        ):
+            result = await swr._fetch_merged(mock_db, "bets", {})
+
+        assert result["data"] == [{"id": 3}]
+        assert result["_partial"] is True
+        assert result["_agents_failed"] == [{"id": 2, "name": "agent2"}]
+
+
+    @pytest.mark.asyncio
+    async def test_single_agent_refreshed_as_delta_slice(self, mock_db, fresh_cache):
+        fresh_cache.put(make_cache_key("bets", 1, {}), swr._slice_entry([{"id": 5}, {"id": 4}]))
+
+        with (
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=[self._agent(1)])),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={1: [{"id": 6}, {"id": 5}]})) as mock_fetch,
+        ):
+            result = await swr._fetch_agent(mock_db, "bets", {}, 1)
+
+        assert mock_fetch.await_args.args[4] == {1: swr.DELTA_FETCH_LIMIT}
+        assert result == swr._slice_entry([{"id": 6}, {"id": 5}, {"id": 4}])
+        assert result["_max_id"] == 6
+
+    @pytest.mark.asyncio
+    async def test_merged_refresh_joins_inflight_slice(self, mock_db, fresh_cache):
+        agents = [self._agent(1), self._agent(2)]
+        slice_fetch = asyncio.get_running_loop().create_future()
+        slice_fetch.set_result(swr._slice_entry([{"id": 9}]))
+
+        with (
+            patch.dict(swr._inflight, {make_cache_key("bets", 1, {}): slice_fetch}),
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=agents)),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={2: [{"id": 3}]})) as mock_fetch,
+        ):
+            result = await swr._fetch_merged(mock_db, "bets", {})
+
+        assert mock_fetch.await_args.args[3] == [agents[1]]
+        assert [row["id"] for row in result["data"]] == [9, 3]
+
+    @pytest.mark.asyncio
+    async def test_slices_being_refreshed_are_shared(self, mock_db, mock_session, fresh_cache):
+        release = asyncio.Event()
+
+        async def slow_fetch(*_args):
+            await release.wait()
+            return {1: [{"id": 3}]}
+
+        with (
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=[self._agent(1)])),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(side_effect=slow_fetch)) as mock_fetch,
+        ):
+            merged = asyncio.create_task(swr._fetch_merged(mock_db, "bets", {}))
+            await asyncio.sleep(0)
+            single = asyncio.create_task(swr_fetch(mock_db, "bets", {}, agent_id=1))
+            await asyncio.sleep(0)
+            release.set()
+            await merged
+            response = await single
+
+        mock_fetch.assert_awaited_once()
+        assert response["data"] == [{"id": 3}]
+
+
+class TestSortedPagination:
+    """Sorted pages are served from the cache entry's sort index."""
+
+    ROWS = [
+        {"id": 4, "money": "10.5", "create_time": "2026-01-02 08:00:00"},
+        {"id": 3, "money": "200", "create_time": "2026-01-01 09:00:00"},
+        {"id": 2, "money": "3", "create_time": "2026-01-03 10:00:00"},
+        {"id": 1, "money": None, "create_time": "2026-01-01 07:00:00"},
+    ]
+
+    @pytest.mark.asyncio
+    async def test_pages_follow_requested_order(self, mock_db, fresh_cache):
+        fresh_cache.put(make_cache_key("bets", None, {}), {"code": 0, "data": self.ROWS, "count": 4})
+
+        desc = await swr_fetch(mock_db, "bets", {"field": "money", "order": "desc", "limit": "2"})
+        asc = await swr_fetch(mock_db, "bets", {"field": "money", "order": "asc", "page": "2", "limit": "2"})
+        by_time = await swr_fetch(mock_db, "bets", {"sort_field": "create_time", "sort_direction": "asc"})
+
+        assert [r["id"] for r in desc["data"]] == [1, 3]
+        assert [r["id"] for r in asc["data"]] == [3, 1]
+        assert [r["id"] for r in by_time["data"]] == [1, 3, 4, 2]
+
+    @pytest.mark.asyncio
+    async def test_index_is_built_once_per_column(self, mock_db, fresh_cache):
+        rows = [{"id": i, "money": str(i % 3)} for i in range(10)]
+
+        with patch(f"{_PATCH_BASE}.build_sort_index", wraps=swr.build_sort_index) as spy:
+            fresh_cache.put(make_cache_key("bets", None, {}), {"code": 0, "data": rows, "count": 10})
+            for page in (1, 2, 3):
+                await swr_fetch(mock_db, "bets", {"field": "money", "order": "asc", "page": str(page)})
+
+        spy.assert_called_once()
+
+    def test_put_builds_no_index(self, fresh_cache):
+        with patch(f"{_PATCH_BASE}.build_sort_index") as spy:
+            fresh_cache.put(make_cache_key("bets", None, {}), {"code": 0, "data": self.ROWS, "count": 4})
+
+        spy.assert_not_called()
+        assert fresh_cache.stats()["bytes"] == swr.estimate_size({"code": 0, "data": self.ROWS, "count": 4})
+
+    def test_index_not_kept_over_budget(self):
+        payload = {"code": 0, "data": self.ROWS, "count": 4}
+        cache = MemoryCache(max_bytes=swr.estimate_size(payload) + 1)
+        cache.put("k", payload)
+
+        index = cache.sort_index("k", "money", self.ROWS)
+
+        assert list(index) == [2, 0, 1, 3]
+        assert cache.stats()["bytes"] <= cache.stats()["max_bytes"]
+        assert cache._store["k"].sort_indexes == {}
+
+    def test_unindexed_sort_is_left_for_upstream(self):
+        layui = {"field": "status", "order": "asc"}
+        form = {"sort_field": "login_time", "sort_direction": "asc"}
+        other_endpoint = {"field": "money", "order": "asc"}
+
+        assert swr._pop_sort("bets", layui) is None
+        assert swr._pop_sort("members", form) is None
+        assert swr._pop_sort("report-funds", other_endpoint) is None
+        assert layui == {"field": "status", "order": "asc"}
+        assert form == {"sort_field": "login_time", "sort_direction": "asc"}
+        assert other_endpoint == {"field": "money", "order": "asc"}
+
+
+class TestReportTotals:
+    """Report totals cover every cached row and are computed once per entry."""
+
+    ROWS = [
+        {"username": "a", "bet_amount": "10", "_agent_id": 1},
+        {"username": "b", "bet_amount": "2.5", "_agent_id": 1},
+        {"username": "a", "bet_amount": "7.5", "_agent_id": 2},
+    ]
+
+    def test_numeric_summed_text_counted(self):
+        assert swr.compute_totals(self.ROWS) == {"username": 2, "bet_amount": 20.0}
+
+    @pytest.mark.asyncio
+    async def test_totals_over_all_rows_built_once(self, mock_db, fresh_cache):
+        fresh_cache.put(make_cache_key("report-lottery", None, {}), {"code": 0, "data": self.ROWS, "count": 3})
+
+        with patch(f"{_PATCH_BASE}.compute_totals", wraps=swr.compute_totals) as spy:
+            pages = [
+                await swr_fetch(mock_db, "report-lottery", {"page": str(page), "limit": "1"}, with_totals=True)
+                for page in (1, 2)
+            ]
+
+        assert [len(p["data"]) for p in pages] == [1, 1]
+        assert pages[1]["_totals"]["bet_amount"] == 20.0
+        spy.assert_called_once()
+
+
+class TestSupersetFiltering:
+    """Filtered requests are answered from a cached broader entry."""
+
+    ROWS = [
+        {"id": 3, "username": "Alice01", "serial_no": "A1", "lottery_id": 32, "status": 0},
+        {"id": 2, "username": "bob", "serial_no": "B2", "lottery_id": 45, "status": 1},
+        {"id": 1, "username": "alice02", "serial_no": "A3", "lottery_id": 45, "status": 1},
+    ]
+    DATE = {"create_time": "2026-01-01 | 2026-01-31"}
+
+    @pytest.mark.asyncio
+    async def test_filters_applied_in_memory(self, mock_db, fresh_cache):
+        fresh_cache.put(make_cache_key("bets", None, self.DATE), {"code": 0, "data": self.ROWS, "count": 3})
+
+        with patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock()) as mock_fetch:
+            like = await swr_fetch(mock_db, "bets", {**self.DATE, "username": "ALICE"})
+            both = await swr_fetch(mock_db, "bets", {**self.DATE, "username": "alice", "lottery_id": "45"})
+
+        mock_fetch.assert_not_called()
+        assert [r["id"] for r in like["data"]] == [3, 1]
+        assert like["count"] == 2
+        assert like["_cache_status"] == "fresh"
+        assert [r["id"] for r in both["data"]] == [1]
+
+    @pytest.mark.parametrize(
+        ("endpoint", "sample"), [("members", "members"), ("bets", "bet_lottery"), ("report-lottery", "report_lottery")],
+    )
+    def test_username_matches_like_upstream(self, fresh_cache, endpoint, sample):
+        """Same rows as upstream's case-insensitive substring match, on captured upstream rows."""
+        rows = json.loads(_UPSTREAM_SAMPLES.read_text(encoding="utf-8"))[sample]["sample"]
+        fresh_cache.put(make_cache_key(endpoint, None, {}), {"code": 0, "data": rows, "count": len(rows)})
+
+        for name in {row["username"] for row in rows}:
+            fragment = name[1:-1].upper()
+            _, _, result, _ = swr._find_superset(endpoint, None, {"username": fragment})
+
+            assert result["data"] == [row for row in rows if fragment.lower() in row["username"].lower()]
+
+    def test_members_status_filtered_in_memory(self, fresh_cache):
+        rows = [{"id": 2, "username": "a", "status": 1}, {"id": 1, "username": "b", "status": 2}]
+        fresh_cache.put(make_cache_key("members", None, {}), {"code": 0, "data": rows, "count": 2})
+
+        _, _, result, _ = swr._find_superset("members", None, {"status": "2"})
+
+        assert result["data"] == [rows[1]]
+
+    def test_unverified_filters_go_upstream(self, fresh_cache):
+        fresh_cache.put(make_cache_key("bets", None, self.DATE), {"code": 0, "data": self.ROWS, "count": 3})
+        fresh_cache.put(make_cache_key("bet-orders", None, self.DATE), {"code": 0, "data": self.ROWS, "count": 3})
+
+        assert swr._find_superset("bets", None, {**self.DATE, "status": "1"}) is None
+        assert swr._find_superset("bet-orders", None, {**self.DATE, "username": "bob"}) is None
+
+    def test_narrowest_superset_wins(self, fresh_cache):
+        fresh_cache.put(make_cache_key("bets", None, {}), {"code": 0, "data": self.ROWS, "count": 3})
+        narrower = {"code": 0, "data": self.ROWS[1:], "count": 2}
+        fresh_cache.put(make_cache_key("bets", None, {"lottery_id": "45"}), narrower)
+
+        base_key, base_params, result, _ = swr._find_superset("bets", None, {"lottery_id": "45", "username": "bob"})
+
+        assert base_params == {"lottery_id": "45"}
+        assert base_key == make_cache_key("bets", None, {"lottery_id": "45"})
+        assert result["data"] == [self.ROWS[1]]
+
+    def test_probe_leaves_hit_score_and_lru_alone(self, fresh_cache):
+        fresh_cache.put(make_cache_key("bets", None, {}), {"code": 0, "data": self.ROWS, "count": 3})
+        fresh_cache.put(make_cache_key("bets", None, {"username": "a"}), {"code": 0, "data": [], "count": 0})
+        order = list(fresh_cache._store)
+
+        swr._find_superset("bets", None, {"lottery_id": "45", "username": "a"})
+
+        assert list(fresh_cache._store) == order
+        assert all(entry.hit_count == 0 for entry in fresh_cache._store.values())
+
+    def test_other_date_range_is_not_a_superset(self, fresh_cache):
+        fresh_cache.put(make_cache_key("bets", None, self.DATE), {"code": 0, "data": self.ROWS, "count": 3})
+
+        assert swr._find_superset("bets", None, {"create_time": "2026-02-01 | 2026-02-28", "username": "bob"}) is None
+
+    def test_missing_column_falls_through(self, fresh_cache):
+        rows = [{"id": 1, "username": "bob"}]
+        fresh_cache.put(make_cache_key("bets", None, {}), {"code": 0, "data": rows, "count": 1})
+
+        assert swr._find_superset("bets", None, {"serial_no": "X1"}) is None
+
+
+class TestMemoryBudget:
+    """MemoryCache evicts by approximate byte size."""
+
+    @staticmethod
+    def _payload(rows: int) -> dict:
+        return {"code": 0, "data": [{"id": i, "username": f"user{i}"} for i in range(rows)]}
+
+    def test_size_estimate_scales_with_rows(self):
+        small, large = swr.estimate_size(self._payload(10)), swr.estimate_size(self._payload(1000))
+
+        assert 50 * small < large < 150 * small
+
+    def test_evicts_lru_entries_over_budget(self):
+        entry_size = swr.estimate_size(self._payload(100))
+        cache = MemoryCache(max_bytes=int(entry_size * 2.5))
+
+        cache.put("a", self._payload(100))
+        cache.put("b", self._payload(100))
+        cache.get("a")
+        cache.put("c", self._payload(100))
+
+        assert cache.get("b") == (None, False)
+        assert cache.get("a")[0] is not None and cache.get("c")[0] is not None
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["evicted_bytes"] == entry_size
+        assert stats["bytes"] == 2 * entry_size
+
+    def test_oversized_entry_is_not_cached(self):
+        cache = MemoryCache(max_bytes=1024)
+
+        cache.put("huge", self._payload(1000))
+
+        assert cache.get("huge") == (None, False)
+        assert cache.stats()["rejected"] == 1
+        assert cache.stats()["bytes"] == 0
+
+    def test_replacing_entry_updates_byte_count(self):
+        cache = MemoryCache()
+
+        cache.put("k", self._payload(100))
+        cache.put("k", self._payload(10))
+
+        assert cache.stats()["bytes"] == swr.estimate_size(self._payload(10))
+
+
+class TestTTLPolicy:
+    """TTLs depend on the endpoint and on whether the date range is over."""
+
+    def test_endpoint_policies(self):
+        assert swr.ttl_policy("banks", {}).fresh > swr.MEMORY_FRESH_TTL
+        assert swr.ttl_policy("bets", {}).fresh < swr.MEMORY_FRESH_TTL
+        assert swr.ttl_policy("members", {}) == swr.DEFAULT_TTL
+
+    def test_past_range_is_historical(self):
+        params = {"date": "2024-01-01 | 2024-01-31"}
+
+        assert swr.ttl_policy("report-lottery", params) == swr.HISTORICAL_TTL
+        assert swr.ttl_policy("bets", {"create_time": "2024-01-01 | 2024-01-31"}) == swr.HISTORICAL_TTL
+
+    def test_range_ending_today_is_not_historical(self):
+        today = date.today().isoformat()
+
+        assert swr.ttl_policy("report-lottery", {"date": f"2024-01-01 | {today}"}) == swr.DEFAULT_TTL
+
+    def test_entry_uses_its_own_policy(self):
+        cache = MemoryCache(fresh_ttl=0)
+
+        cache.put("default", _result(1))
+        cache.put("historical", _result(1), ttl=swr.HISTORICAL_TTL)
+
+        assert cache.get("default")[1] is False
+        assert cache.get("historical")[1] is True
+
+    @pytest.mark.asyncio
+    async def test_redis_expiry_follows_policy(self, mock_db, mock_redis, mock_session):
+        mock_redis.eval = AsyncMock(return_value=1)
+        params = {"date": "2024-01-01 | 2024-01-31"}
+        with (
+            patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis),
+            patch(f"{_PATCH_BASE}._fetch_upstream", new=AsyncMock(return_value=_result(1))),
+        ):
+            await swr_fetch(mock_db, "report-lottery", dict(params))
+
+        assert mock_redis.set.await_args_list[-1].kwargs["ex"] == swr.HISTORICAL_TTL.redis
+
+    @pytest.mark.asyncio
+    async def test_fresh_historical_redis_hit_not_revalidated(self, mock_db, mock_redis):
+        mock_redis.get = AsyncMock(return_value=json.dumps(_result(1)))
+        mock_redis.ttl = AsyncMock(return_value=int(swr.HISTORICAL_TTL.redis) - 3600)  # written an hour ago
+
+        with patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis):
+            response = await swr_fetch(mock_db, "report-lottery", {"date": "2024-01-01 | 2024-01-31"})
+
+        assert response["_cache_status"] == "fresh"
+        assert not swr._revalidating
+
+    @pytest.mark.asyncio
+    async def test_aged_redis_hit_revalidated(self, mock_db, mock_redis, mock_session):
+        mock_redis.get = AsyncMock(return_value=json.dumps(_result(1)))
+        mock_redis.ttl = AsyncMock(return_value=int(swr.DEFAULT_TTL.redis - swr.DEFAULT_TTL.fresh) - 1)
+
+        with (
+            patch(f"{_PATCH_BASE}.redis_cache.client", mock_redis),
+            patch(f"{_PATCH_BASE}._fetch_and_store", new=AsyncMock(return_value=_result(2))) as mock_fetch,
+        ):
+            response = await swr_fetch(mock_db, "members", {})
+            await asyncio.gather(*swr._revalidating.values())
+
+        assert response["_cache_status"] == "stale"
+        mock_fetch.assert_awaited_once()
+
+
+class TestHybridSources:
+    """Synced days come from the local tables, the rest from upstream."""
+
+    @pytest.mark.asyncio
+    async def test_local_and_upstream_parts_combined(self, mock_db):
+        local = {"code": 0, "data": [{"id": 1, "_agent_id": 1}], "count": 1}
+        today = {"create_time": "2026-02-01 | 2026-02-01"}
+        mock_plan = MagicMock(local=local, upstream=[today])
+
+        with (
+            patch(f"{_PATCH_BASE}.plan_query", new=AsyncMock(return_value=mock_plan)),
+            patch(f"{_PATCH_BASE}._fetch_merged", new=AsyncMock(return_value=_result(5))) as mock_remote,
+        ):
+            result = await swr._fetch_upstream(mock_db, "bets", {"create_time": "2026-01-01 | 2026-02-01"}, None)
+
+        mock_remote.assert_awaited_once_with(mock_db, "bets", today)
+        assert [r["id"] for r in result["data"]] == [5, 1]
+        assert result["_source"] == "hybrid"
+
+    @pytest.mark.asyncio
+    async def test_unplanned_request_goes_upstream(self, mock_db):
+        with (
+            patch(f"{_PATCH_BASE}.plan_query", new=AsyncMock(return_value=None)),
+            patch(f"{_PATCH_BASE}._fetch_agent", new=AsyncMock(return_value=_result(2))) as mock_fetch,
+        ):
+            result = await swr._fetch_upstream(mock_db, "bets", {}, 3)
+
+        mock_fetch.assert_awaited_once_with(mock_db, "bets", {}, 3)
+        assert result == _result(2)
+
+
+class TestPartialResults:
+    """Results missing some agents are never shared across workers."""
+
+    @pytest.mark.asyncio
+    async def test_partial_result_kept_in_memory_only(self, fresh_cache):
+        partial = {**_result(1), "_partial": True, "_agents_failed": [{"id": 2, "name": "b"}]}
+        shared = AsyncMock()
+
+        with (
+            patch(f"{_PATCH_BASE}._shared", shared),
+            patch(f"{_PATCH_BASE}._redis_put", new=AsyncMock()) as mock_redis_put,
+        ):
+            await swr._store("k", partial, ("bets", {}, None))
+
+        data, is_fresh = fresh_cache.get("k")
+        assert data["_partial"] is True
+        assert not is_fresh
+        shared.put.assert_not_called()
+        mock_redis_put.assert_not_called()
+
+
+class TestDeltaRefresh:
+    """Stale bet slices are refreshed with a newest-rows delta."""
+
+    @staticmethod
+    def _agent(agent_id: int) -> MagicMock:
+        agent = MagicMock()
+        agent.id = agent_id
+        return agent
+
+    @pytest.mark.asyncio
+    async def test_delta_merged_above_watermark(self, mock_db):
+        stale_cache = MemoryCache(fresh_ttl=0)
+        key = make_cache_key("bets", 1, {})
+        stale_cache.put(key, swr._slice_entry([{"id": 10, "status": 0}, {"id": 9}, {"id": 8}]))
+        delta = [{"id": 12}, {"id": 11}, {"id": 10, "status": 1}]
+
+        with (
+            patch(f"{_PATCH_BASE}._memory", stale_cache),
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=[self._agent(1)])),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={1: delta})) as mock_fetch,
+        ):
+            result = await swr._fetch_merged(mock_db, "bets", {})
+
+        assert mock_fetch.await_args.args[4] == {1: swr.DELTA_FETCH_LIMIT}
+        assert [r["id"] for r in result["data"]] == [12, 11, 10, 9, 8]
+        assert result["data"][2]["status"] == 1
+        assert stale_cache.get(key)[0]["_max_id"] == 12
+
+    @pytest.mark.asyncio
+    async def test_delta_gap_falls_back_to_full_fetch(self, mock_db):
+        stale_cache = MemoryCache(fresh_ttl=0)
+        stale_cache.put(make_cache_key("bets", 1, {}), swr._slice_entry([{"id": 10}]))
+        full = [{"id": 14}, {"id": 13}, {"id": 12}, {"id": 11}, {"id": 10}]
+
+        with (
+            patch(f"{_PATCH_BASE}._memory", stale_cache),
+            patch(f"{_PATCH_BASE}.DELTA_FETCH_LIMIT", 2),
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=[self._agent(1)])),
+            patch(
+                f"{_PATCH_BASE}.fetch_agents",
+                new=AsyncMock(side_effect=[{1: [{"id": 14}, {"id": 13}]}, {1: full}]),
+            ) as mock_fetch,
+        ):
+            result = await swr._fetch_merged(mock_db, "bets", {})
+
+        assert mock_fetch.await_count == 2
+        assert mock_fetch.await_args_list[1].args[4] == {}
+        assert [r["id"] for r in result["data"]] == [14, 13, 12, 11, 10]
+
+    @pytest.mark.asyncio
+    async def test_non_delta_endpoint_fetches_full(self, mock_db):
+        stale_cache = MemoryCache(fresh_ttl=0)
+        stale_cache.put(make_cache_key("members", 1, {}), swr._slice_entry([{"id": 3}]))
+
+        with (
+            patch(f"{_PATCH_BASE}._memory", stale_cache),
+            patch(f"{_PATCH_BASE}.get_active_agents", new=AsyncMock(return_value=[self._agent(1)])),
+            patch(f"{_PATCH_BASE}.fetch_agents", new=AsyncMock(return_value={1: [{"id": 4}]})) as mock_fetch,
+        ):
+            result = await swr._fetch_merged(mock_db, "members", {})
+
+        assert mock_fetch.await_args.args[4] == {}
+        assert result["data"] == [{"id": 4}]
@@ -0,0 +1,127 @@
+"""Unit tests for predictive proxy cache warming."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.hubserver.features.sync.engine import swr, warmer
+from src.hubserver.features.sync.engine.swr import MemoryCache
+
+_PATCH_BASE = "src.hubserver.features.sync.engine.warmer"
+
+
+def _result(*ids: int) -> dict:
+    return {"code": 0, "data": [{"id": i} for i in ids], "count": len(ids)}
+
+
+def _hit(cache: MemoryCache, key: str, times: int) -> None:
+    for _ in range(times):
+        cache.get(key)
+
+
+class TestHotKeys:
+    """Keys are ranked by decayed hit score and carry their request origin."""
+
+    def test_ranked_by_hits(self):
+        cache = MemoryCache()
+        for name, hits in (("a", 1), ("b", 5), ("c", 3)):
+            cache.put(name, _result(1), origin=("members", {}, None))
+            _hit(cache, name, hits)
+
+        assert [key for key, _ in cache.hot_keys(2)] == ["b", "c"]
+
+    def test_skips_unhit_and_originless_entries(self):
+        cache = MemoryCache()
+        cache.put("cold", _result(1), origin=("members", {}, None))
+        cache.put("unknown", _result(1))
+        _hit(cache, "unknown", 3)
+
+        assert cache.hot_keys(10) == []
+
+    def test_lead_time_filters_after_ranking(self):
+        cache = MemoryCache()
+        cache.put("old", _result(1), origin=("members", {}, None), age=280)
+        cache.put("new", _result(1), origin=("members", {}, None))
+        _hit(cache, "old", 1)
+        _hit(cache, "new", 5)
+
+        assert [key for key, _ in cache.hot_keys(1, lead_time=60)] == []
+        assert [key for key, _ in cache.hot_keys(2, lead_time=60)] == ["old"]
+
+    def test_lead_time_capped_for_short_ttls(self):
+        cache = MemoryCache()
+        cache.put("bets", _result(1), origin=("bets", {}, None), ttl=swr.TTLPolicy(60, 600, 600))
+        _hit(cache, "bets", 1)
+
+        assert cache.hot_keys(1, lead_time=60) == []
+
+    def test_score_and_origin_survive_refresh(self):
+        cache = MemoryCache()
+        origin = ("bets", {"create_time": "2026-10-01"}, 7)
+        cache.put("k", _result(1), origin=origin)
+        _hit(cache, "k", 4)
+
+        cache.put("k", _result(1, 2))
+
+        assert cache.hot_keys(1) == [("k", origin)]
+
+
+class TestWarmOnce:
+    """Due hot keys are refreshed through the single-flight path."""
+
+    @pytest.fixture(autouse=True)
+    def isolated(self):
+        with patch.object(swr, "_memory", MemoryCache()) as memory:
+            warmer._agent_slots.clear()
+            yield memory
+
+    @pytest.mark.asyncio
+    async def test_refreshes_only_due_keys(self, isolated):
+        isolated.put("due", _result(1), origin=("members", {}, None), age=swr.MEMORY_FRESH_TTL - 10)
+        isolated.put("young", _result(1), origin=("members", {}, None))
+        _hit(isolated, "due", 1)
+        _hit(isolated, "young", 1)
+
+        with patch.object(swr, "_fetch_shared", new=AsyncMock(return_value=_result(1))) as mock_fetch:
+            due = await warmer.warm_once(top_n=10)
+
+        assert due == 1
+        mock_fetch.assert_awaited_once_with("due", "members", {}, None)
+
+    @pytest.mark.asyncio
+    async def test_skips_keys_already_refreshing(self, isolated):
+        isolated.put("k", _result(1), origin=("members", {}, None), age=swr.MEMORY_FRESH_TTL)
+        _hit(isolated, "k", 1)
+
+        with (
+            patch.dict(swr._inflight, {"k": object()}),
+            patch.object(swr, "_fetch_shared", new=AsyncMock()) as mock_fetch,
+        ):
+            await warmer.warm_once(top_n=10)
+
+        mock_fetch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_per_agent_concurrency_is_bounded(self, isolated):
+        for i in range(5):
+            isolated.put(f"k{i}", _result(1), origin=("bets", {"i": i}, 7), age=swr.MEMORY_FRESH_TTL)
+            _hit(isolated, f"k{i}", 1)
+
+        running = peak = 0
+
+        async def slow_fetch(*_args):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return _result(1)
+
+        with (
+            patch(f"{_PATCH_BASE}.WARM_AGENT_CONCURRENCY", 2),
+            patch.object(swr, "_fetch_shared", new=slow_fetch),
+        ):
+            assert await warmer.warm_once(top_n=10) == 5
+
+        assert peak == 2
@@ -1,5 +1,5 @@
 /**
- * Upstream Sync Helpers — fetchAllPages, fetchDateChunked
+ * Upstream Sync Helpers — fetchAllPages
  */
 
 import { stripSensitive } from './upstream-client.js'
@@ -36,43 +36,3 @@ export async function fetchAllPages(listFn, filters = {}, { pageSize = 50, maxPa
   const cleaned = sensitive ? stripSensitive(allData) : allData
   return { data: cleaned, totalData }
 }
-
-/**
- * Fetch data from endpoints with a MAX 7-day date range.
- *
- * @param {Function} listFn
- * @param {string} startDate - "YYYY-MM-DD"
- * @param {string} endDate - "YYYY-MM-DD"
- * @param {object} filters
- * @param {object} [options]
- * @param {number} [options.pageSize=50]
- * @param {boolean} [options.datetime=false]
- * @param {string} [options.dateParam='create_time']
- * @returns {Promise<Array>}
- */
-export async function fetchDateChunked(listFn, startDate, endDate, filters = {}, { pageSize = 50, datetime = false, dateParam = 'create_time' } = {}) {
-  const allData = []
-  const start = new Date(startDate)
-  const end = new Date(endDate)
-  const MAX_DAYS = 6
-
-  let chunkStart = new Date(start)
-  while (chunkStart <= end) {
-    const chunkEnd = new Date(chunkStart)
-    chunkEnd.setDate(chunkEnd.getDate() + MAX_DAYS)
-    if (chunkEnd > end) chunkEnd.setTime(end.getTime())
-
-    const fmt = (d) => d.toISOString().slice(0, 10)
-    const dateValue = datetime
-      ? `${fmt(chunkStart)} 00:00:00|${fmt(chunkEnd)} 23:59:59`
-      : `${fmt(chunkStart)}|${fmt(chunkEnd)}`
-
-    const { data } = await fetchAllPages(listFn, { ...filters, [dateParam]: dateValue }, { pageSize })
-    allData.push(...data)
-
-    chunkStart.setDate(chunkStart.getDate() + MAX_DAYS + 1)
-  }
-
-  return allData
-}
-
@@ -83,6 +83,8 @@ export const SYNC_API = {
   REPORT_FUNDS: '/api/v1/sync/reports/funds',
   REPORT_THIRD_GAME: '/api/v1/sync/reports/third-game',
   CONFIG: '/api/v1/sync/config',
+  JOBS: '/api/v1/sync/jobs',
+  JOB: (id) => `/api/v1/sync/jobs/${id}`,
   VERIFY: (ep) => `/api/v1/sync/verify/${ep}`
 }
 
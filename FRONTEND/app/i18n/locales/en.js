@@ -302,6 +302,7 @@ export default {
   // ── Table ──
   'table.no_data': 'No data',
   'table.no_data_check': 'No data — check connection',
+  'table.partial_agents': 'Some agents did not respond: {names}',
   'table.summary': 'Summary',
   'table.rebate_settings': 'Rebate Settings',
 
@@ -435,21 +436,11 @@ export default {
   'col.tiers.name': 'Tier Name',
   'col.tiers.created_at': 'Created At',
 
-  // ── Sync service progress ──
-  'sync.svc.fetching_members': 'Fetching all members...',
-  'sync.svc.uploading_members': 'Uploading {count} members...',
-  'sync.svc.verifying_samples': 'Verifying random samples...',
-  'sync.svc.up_to_date': 'Up to date (last: {date})',
-  'sync.svc.fetching_range': 'Fetching {name} from {start} to {end}...',
-  'sync.svc.uploading_records': 'Uploading {count} records...',
-  'sync.svc.verifying': 'Verifying...',
-  'sync.svc.fetching_daily': 'Fetching {name} day by day from {start}...',
-  'sync.svc.day_count': '{date}: {count} records (total: {total})',
-  'sync.svc.fetching_config': 'Fetching config data...',
-  'sync.svc.uploading_config': 'Uploading config...',
-  'sync.svc.starting': 'Starting {name}...',
-  'sync.svc.done_records': 'Done: {count} records',
-  'sync.svc.complete': 'All sync complete in {elapsed}s',
+  // ── Server-side sync jobs ──
+  'sync.job.progress': '{done}/{total} days — {rows} records',
+  'sync.job.agents_failed': 'failed for agent(s) {ids}',
+  'sync.job.following': 'A sync is already running on the server — following it',
+  'sync.job.server': 'Running on the server — you can close this page',
 
   // ── Invite actions ──
   'invite.link_copied': 'Link copied!',
@@ -302,6 +302,7 @@ export default {
   // ── Table ──
   'table.no_data': 'Không có dữ liệu',
   'table.no_data_check': 'Không có dữ liệu — kiểm tra kết nối',
+  'table.partial_agents': 'Một số đại lý không phản hồi: {names}',
   'table.summary': 'Tổng kết',
   'table.rebate_settings': 'Cài đặt hoàn trả',
 
@@ -435,21 +436,11 @@ export default {
   'col.tiers.name': 'Tên cấp bậc',
   'col.tiers.created_at': 'Ngày tạo',
 
-  // ── Sync service progress ──
-  'sync.svc.fetching_members': 'Đang tải tất cả hội viên...',
-  'sync.svc.uploading_members': 'Đang tải lên {count} hội viên...',
-  'sync.svc.verifying_samples': 'Đang xác minh mẫu ngẫu nhiên...',
-  'sync.svc.up_to_date': 'Đã cập nhật (lần cuối: {date})',
-  'sync.svc.fetching_range': 'Đang tải {name} từ {start} đến {end}...',
-  'sync.svc.uploading_records': 'Đang tải lên {count} bản ghi...',
-  'sync.svc.verifying': 'Đang xác minh...',
-  'sync.svc.fetching_daily': 'Đang tải {name} theo ngày từ {start}...',
-  'sync.svc.day_count': '{date}: {count} bản ghi (tổng: {total})',
-  'sync.svc.fetching_config': 'Đang tải dữ liệu cấu hình...',
-  'sync.svc.uploading_config': 'Đang tải lên cấu hình...',
-  'sync.svc.starting': 'Bắt đầu {name}...',
-  'sync.svc.done_records': 'Xong: {count} bản ghi',
-  'sync.svc.complete': 'Hoàn tất đồng bộ trong {elapsed}s',
+  // ── Server-side sync jobs ──
+  'sync.job.progress': '{done}/{total} ngày — {rows} bản ghi',
+  'sync.job.agents_failed': 'lỗi ở đại lý {ids}',
+  'sync.job.following': 'Máy chủ đang đồng bộ — đang theo dõi tiến trình',
+  'sync.job.server': 'Đang chạy trên máy chủ — có thể đóng trang này',
 
   // ── Invite actions ──
   'invite.link_copied': 'Đã copy đường link!',
@@ -302,6 +302,7 @@ export default {
   // ── Table ──
   'table.no_data': '暂无数据',
   'table.no_data_check': '暂无数据 — 请检查连接',
+  'table.partial_agents': '部分代理未响应：{names}',
   'table.summary': '汇总',
   'table.rebate_settings': '返水设置',
 
@@ -435,21 +436,11 @@ export default {
   'col.tiers.name': '等级名称',
   'col.tiers.created_at': '创建时间',
 
-  // ── Sync service progress ──
-  'sync.svc.fetching_members': '正在加载所有会员...',
-  'sync.svc.uploading_members': '正在上传 {count} 个会员...',
-  'sync.svc.verifying_samples': '正在验证随机样本...',
-  'sync.svc.up_to_date': '已更新（最后：{date}）',
-  'sync.svc.fetching_range': '正在加载 {name} 从 {start} 到 {end}...',
-  'sync.svc.uploading_records': '正在上传 {count} 条记录...',
-  'sync.svc.verifying': '正在验证...',
-  'sync.svc.fetching_daily': '正在按天加载 {name} 从 {start}...',
-  'sync.svc.day_count': '{date}：{count} 条记录（共：{total}）',
-  'sync.svc.fetching_config': '正在加载配置数据...',
-  'sync.svc.uploading_config': '正在上传配置...',
-  'sync.svc.starting': '开始 {name}...',
-  'sync.svc.done_records': '完成：{count} 条记录',
-  'sync.svc.complete': '全部同步完成，耗时 {elapsed}s',
+  // ── Server-side sync jobs ──
+  'sync.job.progress': '{done}/{total} 天 — {rows} 条记录',
+  'sync.job.agents_failed': '代理 {ids} 失败',
+  'sync.job.following': '服务器正在同步 — 正在跟踪进度',
+  'sync.job.server': '在服务器上运行 — 可以关闭此页面',
 
   // ── Invite actions ──
   'invite.link_copied': '链接已复制！',
@@ -120,6 +120,10 @@ const loadTable = (endpoint, hash) => {
             moduleState.swrReloading = true
             swrSilentRefresh(upstreamUrl, endpoint)
           }
+          if (res._partial && res._agents_failed) {
+            const names = res._agents_failed.map(a => a.name).join(', ')
+            layer.msg(t('table.partial_agents', { names }), { icon: 0, time: 3000 })
+          }
 
           return {
             code: 0,
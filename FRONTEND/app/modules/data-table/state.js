@@ -12,6 +12,8 @@ export const moduleState = {
   currentHash: null,
   /** @type {boolean} User requested abort of sync operations */
   syncAbort: false,
+  /** @type {string|null} Server-side sync job this page is following */
+  syncJobId: null,
   /** @type {boolean} SWR silent refresh in progress */
   swrReloading: false,
   /** @type {Object} Current search/filter params for SWR */
@@ -31,6 +33,7 @@ export const resetState = () => {
   moduleState.currentEndpoint = null
   moduleState.currentHash = null
   moduleState.syncAbort = true
+  moduleState.syncJobId = null
   moduleState.swrReloading = false
   moduleState.swrCurrentWhere = {}
   moduleState.swrPage = 1
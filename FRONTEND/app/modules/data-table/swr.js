@@ -1,7 +1,8 @@
 /**
  * SWR (Stale-While-Revalidate) silent background refresh.
- * When the cache returns stale data, this fetches fresh data in the
- * background and patches the DOM without a full table reload.
+ * When the cache returns stale data, the server revalidates that entry in
+ * the background; this re-reads it with a short backoff until the server
+ * reports it fresh, then patches the DOM without a full table reload.
  * @module data-table/swr
  */
 
@@ -9,32 +10,51 @@ import { moduleState } from './state.js'
 import { authHeaders } from './helpers.js'
 import { renderTotalSummary } from './total-summary.js'
 
+/** Waits before each re-read — doubling, so a slow revalidation is polled a few times at most */
+const REVALIDATE_DELAYS_MS = [1000, 2000, 4000, 8000]
+
+/**
+ * Re-read the current table page from the cache.
+ * @param {string} upstreamUrl - The upstream POST URL
+ * @returns {Promise<Object>} The cached response, with `_cache_status`
+ */
+const readCurrentPage = async (upstreamUrl) => {
+  const formBody = new URLSearchParams()
+  Object.entries(moduleState.swrCurrentWhere).forEach(([k, v]) => {
+    if (v !== undefined && v !== null && v !== '') formBody.append(k, String(v))
+  })
+  formBody.append('page', String(moduleState.swrPage))
+  formBody.append('limit', String(moduleState.swrLimit))
+
+  const resp = await fetch(upstreamUrl, {
+    method: 'POST',
+    headers: authHeaders({ 'Content-Type': 'application/x-www-form-urlencoded' }),
+    body: formBody.toString()
+  })
+  return resp.json()
+}
+
 /**
- * Silently refresh table data from upstream and patch DOM cells in-place.
+ * Silently re-read revalidated table data and patch DOM cells in-place.
+ * Gives up if the entry is still not fresh after the last re-read.
  * @param {string} upstreamUrl - The upstream POST URL
  * @param {string} endpoint - Current endpoint key (used to guard against stale callbacks)
  */
 export const swrSilentRefresh = async (upstreamUrl, endpoint) => {
-  await new Promise((r) => setTimeout(r, 200))
   try {
-    if (moduleState.currentEndpoint !== endpoint) return
-
-    const formBody = new URLSearchParams()
-    Object.entries(moduleState.swrCurrentWhere).forEach(([k, v]) => {
-      if (v !== undefined && v !== null && v !== '') formBody.append(k, String(v))
-    })
-    formBody.append('page', String(moduleState.swrPage))
-    formBody.append('limit', String(moduleState.swrLimit))
-
-    const resp = await fetch(upstreamUrl + '?_fresh=1', {
-      method: 'POST',
-      headers: authHeaders({ 'Content-Type': 'application/x-www-form-urlencoded' }),
-      body: formBody.toString()
-    })
-    const freshRes = await resp.json()
+    let freshRes = null
+    for (const delay of REVALIDATE_DELAYS_MS) {
+      await new Promise((r) => setTimeout(r, delay))
+      if (moduleState.currentEndpoint !== endpoint) return
+      const res = await readCurrentPage(upstreamUrl)
+      if (res._cache_status === 'fresh') {
+        freshRes = res
+        break
+      }
+    }
     moduleState.swrReloading = false
 
-    if (moduleState.currentEndpoint !== endpoint) return
+    if (!freshRes || moduleState.currentEndpoint !== endpoint) return
     if (!freshRes.data || !freshRes.data.length) return
 
     const view = document.querySelector('#dataTable')?.closest('.layui-table-view')
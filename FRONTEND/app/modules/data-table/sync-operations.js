@@ -12,86 +12,102 @@ import { addLog, setCardStatus, setOverall, setSyncBtnsDisabled, getSpeed, getSy
 const delay = (ms) => new Promise((r) => setTimeout(r, ms))
 
 /**
- * Run full sync across all endpoints (incremental or hard).
+ * Show one endpoint's server-side progress on its card; log it once when it ends.
+ * @param {string} ep - Sync endpoint key
+ * @param {Object} state - Endpoint entry of the job state
+ * @param {Set<string>} logged - Endpoints already logged as finished
+ */
+const showEndpointProgress = (ep, state, logged) => {
+  const { status, done, total, rows } = state
+  if (status === 'pending') {
+    setCardStatus(ep, 'pending', t('sync.waiting'), 0)
+  } else if (status === 'running') {
+    const pct = total ? Math.round((done / total) * 100) : 10
+    setCardStatus(ep, 'syncing', t('sync.job.progress', { done, total, rows }), Math.max(pct, 10))
+  } else if (status === 'completed') {
+    setCardStatus(ep, 'done', t('sync.status.done', { count: rows }), 100)
+  } else if (status === 'failed') {
+    const message = t('sync.job.agents_failed', { ids: state.agents_failed.join(', ') })
+    setCardStatus(ep, 'error', `${t('sync.badge.error')}: ${message}`, 100)
+  } else {
+    setCardStatus(ep, 'skipped', t('sync.status.stopped'), 0)
+  }
+
+  if (logged.has(ep) || !['completed', 'failed', 'cancelled'].includes(status)) return
+  logged.add(ep)
+  if (status === 'completed') {
+    addLog(t('sync.log.ep_done', { ep: getSyncEpLabel(ep), count: rows }), 'success')
+  } else if (status === 'failed') {
+    const message = t('sync.job.agents_failed', { ids: state.agents_failed.join(', ') })
+    addLog(t('sync.log.ep_error', { ep: getSyncEpLabel(ep), message }), 'error')
+  } else {
+    addLog(t('sync.log.ep_skipped_user', { ep: getSyncEpLabel(ep) }), 'warning')
+  }
+}
+
+/**
+ * Start a server-side sync job (incremental or hard) and follow its progress.
+ * If a job is already running on the server, follow that one instead.
  * @param {boolean} hard - If true, force full re-sync
  * @param {Object} layer - Layui layer instance
  * @param {Object} table - Layui table instance
  */
 export const runSyncAll = async (hard, layer, table) => {
-  const { syncEndpoint } = await import('../../services/sync.js')
+  const { startSyncJob, findRunningJob, followSyncJob } = await import('../../services/sync.js')
 
   moduleState.syncAbort = false
   setSyncBtnsDisabled(true)
   SYNC_ORDER.forEach((ep) => setCardStatus(ep, 'pending', t('sync.waiting'), 0))
 
   const total = SYNC_ORDER.length
-  let completed = 0
-  const results = []
-
   const modeLabel = hard ? t('sync.log.mode_full') : t('sync.log.mode_incremental')
-  addLog(t('sync.log.start', { mode: modeLabel, total }), 'sync')
-  setOverall(true, `<i class="hub-icon hub-icon-sync hub-icon-spin"></i> ${modeLabel}...`, `0 / ${total}`, 0)
-
-  const startTime = Date.now()
-
-  for (const ep of SYNC_ORDER) {
-    if (moduleState.syncAbort) {
-      setCardStatus(ep, 'skipped', t('sync.status.stopped'), 0)
-      addLog(t('sync.log.ep_skipped_user', { ep: getSyncEpLabel(ep) }), 'warning')
-      continue
+  const running = `<i class="hub-icon hub-icon-sync hub-icon-spin"></i> ${modeLabel}...`
+
+  let job
+  try {
+    job = await startSyncJob({ full: hard })
+    addLog(t('sync.log.start', { mode: modeLabel, total }), 'sync')
+  } catch (e) {
+    job = e.response?.status === 409 ? await findRunningJob().catch(() => null) : null
+    if (!job) {
+      addLog(t('sync.log.ep_error', { ep: modeLabel, message: e.response?.data?.detail || e.message }), 'error')
+      setSyncBtnsDisabled(false)
+      return
     }
+    addLog(t('sync.job.following'), 'warning')
+  }
+  addLog(t('sync.job.server'), 'info')
+  setOverall(true, running, '0%', 0)
 
-    setCardStatus(ep, 'syncing', t('sync.status.loading'), 10)
-    addLog(t('sync.log.ep_start', { ep: getSyncEpLabel(ep) }), 'sync')
-
-    try {
-      const result = await syncEndpoint(ep, (progress) => {
-        if (!progress) return
-        const { step, message } = progress
-
-        if (step === 'fetch') {
-          setCardStatus(ep, 'syncing', message || t('sync.status.fetching'), 30)
-        } else if (step === 'upload') {
-          setCardStatus(ep, 'uploading', message || t('sync.status.uploading'), 60)
-        } else if (step === 'verify') {
-          setCardStatus(ep, 'verifying', message || t('sync.status.verifying'), 85)
-        }
-
-        if (message) addLog(`${getSyncEpLabel(ep)}: ${message}`, step === 'error' ? 'error' : 'info')
-      })
-
-      results.push(result)
+  moduleState.syncJobId = job.id
+  const logged = new Set()
+  const startTime = Date.now()
 
-      if (result.skipped) {
-        setCardStatus(ep, 'skipped', t('sync.status.updated', { date: result.lastDate || '' }), 100)
-        addLog(t('sync.log.ep_skipped', { ep: getSyncEpLabel(ep) }), 'warning')
-      } else {
-        const count = result.fetched || result.processed || 0
-        setCardStatus(ep, 'done', t('sync.status.done', { count }), 100)
-        addLog(t('sync.log.ep_done', { ep: getSyncEpLabel(ep), count }), 'success')
+  try {
+    job = await followSyncJob(job.id, (state) => {
+      for (const ep of SYNC_ORDER) {
+        if (state.endpoints[ep]) showEndpointProgress(ep, state.endpoints[ep], logged)
       }
-    } catch (e) {
-      setCardStatus(ep, 'error', `${t('sync.badge.error')}: ${e.message}`, 0)
-      addLog(t('sync.log.ep_error', { ep: getSyncEpLabel(ep), message: e.message }), 'error')
-      results.push({ endpoint: ep, error: e.message })
-    }
-
-    completed++
-    const pct = Math.round((completed / total) * 100)
-    setOverall(true, `<i class="hub-icon hub-icon-sync hub-icon-spin"></i> ${modeLabel}...`, `${completed} / ${total}`, pct)
-
-    const spd = getSpeed()
-    if (spd > 0 && completed < total && !moduleState.syncAbort) await delay(spd)
+      setOverall(true, running, `${state.progress}%`, state.progress)
+    }, () => moduleState.syncJobId === job.id)
+  } catch (e) {
+    addLog(t('sync.log.ep_error', { ep: modeLabel, message: e.message }), 'error')
+    setSyncBtnsDisabled(false)
+    return
   }
 
+  // Page left while the job runs on — nothing more to show
+  if (moduleState.syncJobId !== job.id) return
+  moduleState.syncJobId = null
+
   const elapsed = ((Date.now() - startTime) / 1000).toFixed(1)
-  const errors = results.filter((r) => r.error).length
+  const errors = Object.values(job.endpoints).filter((ep) => ep.status === 'failed').length
 
-  if (moduleState.syncAbort) {
-    setOverall(true, `<i class="hub-icon hub-icon-warning"></i> ${t('sync.log.overall_stopped')}`, `${completed} / ${total}`, Math.round((completed / total) * 100))
+  if (job.status === 'cancelled') {
+    setOverall(true, `<i class="hub-icon hub-icon-warning"></i> ${t('sync.log.overall_stopped')}`, `${job.progress}%`, job.progress)
     addLog(t('sync.log.stopped', { elapsed, errors }), 'warning')
   } else {
-    setOverall(true, `<i class="hub-icon hub-icon-ok"></i> ${t('sync.log.overall_done')}`, `${total} / ${total}`, 100)
+    setOverall(true, `<i class="hub-icon hub-icon-ok"></i> ${t('sync.log.overall_done')}`, '100%', 100)
     addLog(t('sync.log.done', { elapsed, errors }), errors > 0 ? 'warning' : 'done')
   }
 
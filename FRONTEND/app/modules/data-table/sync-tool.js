@@ -226,9 +226,13 @@ export const initSyncTool = (form, layer, table) => {
 
   const stopBtn = document.getElementById('stopSyncBtn')
   if (stopBtn) {
-    stopBtn.addEventListener('click', () => {
+    stopBtn.addEventListener('click', async () => {
       moduleState.syncAbort = true
       addLog(t('sync.user_stopped'), 'warning')
+      if (moduleState.syncJobId) {
+        const { cancelSyncJob } = await import('../../services/sync.js')
+        cancelSyncJob(moduleState.syncJobId).catch((e) => addLog(e.message, 'error'))
+      }
     })
   }
 
@@ -1,24 +1,12 @@
 /**
  * Sync Helpers — shared utilities for sync service.
- * Status cache, batch upload, verification, date helpers.
+ * Status cache and verification.
  */
 
 import http from '../api/http.js'
 import { SYNC_API } from '../constants/index.js'
 
-const BATCH_SIZE = 5000
 const VERIFY_SAMPLE_SIZE = 5
-export const DEFAULT_AGENT_ID = 1
-
-// --------------- Date helpers ---------------
-
-export const today = () => new Date().toISOString().slice(0, 10)
-
-export const daysAgo = (n) => {
-  const d = new Date()
-  d.setDate(d.getDate() - n)
-  return d.toISOString().slice(0, 10)
-}
 
 // --------------- Sync status ---------------
 
@@ -42,30 +30,6 @@ export function getLastDataDate(name) {
   return st?.sync_params?.last_data_date || null
 }
 
-export function isStatusCached() {
-  return _statusCache !== null
-}
-
-// --------------- Batch upload ---------------
-
-export async function postBatched(url, records, agentId = DEFAULT_AGENT_ID, onProgress) {
-  let totalProcessed = 0
-  const batches = Math.ceil(records.length / BATCH_SIZE)
-
-  for (let i = 0; i < records.length; i += BATCH_SIZE) {
-    const batch = records.slice(i, i + BATCH_SIZE)
-    const batchNum = Math.floor(i / BATCH_SIZE) + 1
-    onProgress?.({
-      step: 'upload',
-      message: `Batch ${batchNum}/${batches} (${batch.length} records)`,
-    })
-    const res = await http.post(url, { data: batch, agent_id: agentId })
-    totalProcessed += res.processed || 0
-  }
-
-  return totalProcessed
-}
-
 // --------------- Verification ---------------
 
 export async function verifyRandom(endpoint, fetchedRecords, n = VERIFY_SAMPLE_SIZE) {